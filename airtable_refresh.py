@@ -0,0 +1,135 @@
+"""
+Refresco en segundo plano de los datos de Airtable de la pestaña Revenue Recovery.
+
+Descargar la tabla de Airtable y buscar las suscripciones en Stripe tarda bastante, así que no se
+hace al importar ni dentro de un request. Un solo proceso por máquina (el que obtiene el lock de
+AIRTABLE_REFRESH_LOCK_PATH) arma el snapshot cada AIRTABLE_REFRESH_INTERVAL_S segundos y lo guarda en un
+DatasetStore propio bajo AIRTABLE_SNAPSHOT_DIR, sin TTL, para que el sweep de los datasets de los usuarios no
+lo borre. Cada snapshot se escribe con un id nuevo y recién después se reemplaza el archivo 'current', que
+apunta al snapshot vigente: un worker que lee nunca mezcla frames de dos refrescos. Todos los workers leen
+el último snapshot publicado. Si el proceso que refresca termina, otro worker toma el lock en su siguiente
+lectura.
+
+Para correr un refresco a mano:
+    python airtable_refresh.py
+"""
+import fcntl
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+import pandas as pd
+from config import AIRTABLE_REFRESH_INTERVAL_S, AIRTABLE_REFRESH_LOCK_PATH, AIRTABLE_SNAPSHOT_DIR
+from dataset_store import DatasetStore
+
+SNAPSHOT_FRAMES = ['records', 'funnel', 'map', 'expired_per_day']
+
+
+class AirtableRefresher:
+    def __init__(self, interval=AIRTABLE_REFRESH_INTERVAL_S, lock_path=AIRTABLE_REFRESH_LOCK_PATH,
+                 snapshot_dir=AIRTABLE_SNAPSHOT_DIR):
+        self.interval = interval
+        self.lock_path = lock_path
+        self.store = DatasetStore(root=snapshot_dir, ttl=None)
+        self.pointer_path = os.path.join(snapshot_dir, 'current')
+        self._thread = None
+        self._lock_file = None
+        self._pid = None
+        self._last_attempt = 0
+        self._stop = threading.Event()
+
+    # ------------------------------ lectura ------------------------------------------------
+    def snapshot(self):
+        """
+        Retorna:
+        dict | None: DataFrames del último snapshot (records, funnel, map, expired_per_day) y
+                     'refreshed_at' (datetime UTC), o None si todavía no hay ninguno
+        """
+        self.start()
+        # Se lee el puntero una sola vez: todos los frames salen del mismo snapshot
+        snapshot_id = self._current_id()
+        meta = self.store.get(snapshot_id, 'meta')
+        if meta is None or meta.empty:
+            return None
+        frames = {name: self.store.get(snapshot_id, name) for name in SNAPSHOT_FRAMES}
+        if any(frame is None for frame in frames.values()):
+            return None
+        frames['refreshed_at'] = meta['refreshed_at'].iloc[0].to_pydatetime()
+        return frames
+
+    def _current_id(self):
+        try:
+            with open(self.pointer_path) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    # ------------------------------ refresco -----------------------------------------------
+    def start(self):
+        """Arranca el hilo de refresco si este proceso obtiene el lock (reintenta una vez por intervalo)."""
+        if self._pid != os.getpid():
+            # Después de un fork el hilo y el lock del padre no valen en el hijo
+            self._pid = os.getpid()
+            self._thread = None
+            self._lock_file = None
+            self._last_attempt = 0
+        if self._thread is not None or time.time() - self._last_attempt < self.interval:
+            return
+        self._last_attempt = time.time()
+        lock_file = open(self.lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # Otro proceso ya refresca; este solo lee el snapshot
+            lock_file.close()
+            return
+        self._lock_file = lock_file
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='airtable-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Airtable refresh: error al refrescar ({e}); se mantiene el snapshot anterior")
+            self._stop.wait(self.interval)
+
+    def refresh(self):
+        """Arma un snapshot nuevo, lo guarda con un id nuevo y después lo publica en 'current'."""
+        # Import diferido: components.airtable trae pyairtable y stripe
+        from components.airtable import build_snapshot
+
+        started = time.perf_counter()
+        frames = build_snapshot()
+        frames['meta'] = pd.DataFrame({'refreshed_at': [datetime.utcnow()], 'rows': [len(frames['records'])]})
+        previous_id = self._current_id()
+        snapshot_id = self.store.put_many(frames)
+        self._publish(snapshot_id)
+        self._prune(keep={snapshot_id, previous_id})
+        print(f"Airtable refresh: {len(frames['records'])} registros en {time.perf_counter() - started:.1f}s")
+
+
+    def _publish(self, snapshot_id):
+        tmp_path = f"{self.pointer_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot_id)
+        os.replace(tmp_path, self.pointer_path)
+
+    def _prune(self, keep):
+        """Borra los snapshots viejos. El anterior se conserva: un worker puede estar leyéndolo."""
+        for entry in os.scandir(self.store.root):
+            if entry.is_dir() and entry.name not in keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+airtable_refresher = AirtableRefresher()
+
+
+if __name__ == '__main__':
+    airtable_refresher.refresh()
@@ -4,6 +4,7 @@ import os
 from components.layout import serve_layout
 from callbacks.summary_callbacks import register_summary_callbacks
 from callbacks.tab_callbacks import register_tab_callbacks
+from airtable_refresh import airtable_refresher
 
 # Instanciar la clase
 metrics = SubscriptionMetrics()
@@ -19,6 +20,9 @@ app.layout = serve_layout()
 register_summary_callbacks(app)
 register_tab_callbacks(app)
 
+# Refresco de Airtable en segundo plano (no bloquea el arranque del worker)
+airtable_refresher.start()
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,95 @@
+"""
+Historial del dólar oficial en ARS para pasar a USD los ingresos de Mercado Pago mes a mes.
+
+La primera vez se baja el historial completo de argentinadatos.com y se guarda en ARS_RATES_PATH. Después,
+como mucho cada ARS_RATES_REFRESH_S segundos, se vuelve a pedir y solo se agregan los días posteriores al
+último guardado. Cada mes se convierte con el promedio del valor de venta de sus días; los meses sin datos
+usan el último valor conocido (por ejemplo, los días del mes en curso que todavía no publicó la API).
+"""
+import os
+import threading
+import time
+import pandas as pd
+from config import ARS_RATES_PATH, ARS_RATES_REFRESH_S
+from http_client import http_client
+
+HISTORY_URL = "https://api.argentinadatos.com/v1/cotizaciones/dolares/oficial"
+
+
+class ArsRates:
+    def __init__(self, path=ARS_RATES_PATH, refresh_interval=ARS_RATES_REFRESH_S):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._history = None
+        self._history_mtime = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None, None
+        if mtime != self._history_mtime:
+            self._history = pd.read_parquet(self.path)
+            self._history_mtime = mtime
+        return self._history, mtime
+
+    def _fetch_since(self, last_date):
+        new = pd.DataFrame(http_client.get_json(HISTORY_URL, stale_ok=False), columns=['fecha', 'venta'])
+        new['fecha'] = pd.to_datetime(new['fecha'])
+        new['venta'] = pd.to_numeric(new['venta'], errors='coerce')
+        new = new.dropna()
+        if last_date is not None:
+            new = new[new['fecha'] > last_date]
+        return new
+
+    def _write(self, history):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        history.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+
+    def history(self):
+        """
+        Retorna:
+        pd.DataFrame: columnas fecha (datetime) y venta (ARS por USD), una fila por día publicado
+        """
+        with self._lock:
+            history, mtime = self._read()
+            if history is not None and time.time() - mtime < self.refresh_interval:
+                return history
+            last_date = history['fecha'].max() if history is not None and not history.empty else None
+            try:
+                new = self._fetch_since(last_date)
+            except Exception as e:
+                print(f"Dólar oficial: no se pudo actualizar el historial ({e})")
+                return history if history is not None else pd.DataFrame(columns=['fecha', 'venta'])
+            if history is not None:
+                new = pd.concat([history, new], ignore_index=True)
+            history = new.drop_duplicates('fecha', keep='last').sort_values('fecha', ignore_index=True)
+            # Se reescribe aunque no haya días nuevos para no volver a pedir hasta el próximo intervalo
+            self._write(history)
+            self._read()
+            print(f"Dólar oficial: historial actualizado hasta {history['fecha'].max():%Y-%m-%d}")
+            return history
+
+    def monthly_rates(self, months):
+        """
+        Parámetros:
+        months (pd.Series): meses (Timestamp del primer día del mes) a convertir
+
+        Retorna:
+        pd.Series: ARS por USD de cada mes (mismo índice que months); NaN si no hay historial
+        """
+        history = self.history()
+        months = pd.to_datetime(months)
+        if history.empty:
+            return pd.Series(float('nan'), index=months.index)
+        per_month = history.groupby(history['fecha'].dt.to_period('M').dt.to_timestamp())['venta'].mean()
+        # Los meses sin cotizaciones toman el último valor anterior (o el primero disponible)
+        all_months = per_month.index.union(pd.DatetimeIndex(months.dropna().unique()))
+        per_month = per_month.reindex(all_months).ffill().bfill()
+        return pd.Series(per_month.reindex(months).to_numpy(), index=months.index)
+
+
+ars_rates = ArsRates()
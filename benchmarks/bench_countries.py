@@ -0,0 +1,53 @@
+"""
+Compara getCountry fila por fila contra resolve_countries sobre teléfonos sintéticos.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_countries               100k y 1M teléfonos
+    python -m benchmarks.bench_countries --sizes 50000
+
+La muestra imita la colección subscriptions: mayoría de códigos de Latinoamérica, algo de +1/+34/+44,
+usuarios repetidos y algunos números inválidos.
+"""
+import argparse
+import random
+import time
+import pandas as pd
+from get_country import getCountry, resolve_countries
+
+CALLING_CODES = ['54', '52', '57', '56', '51', '58', '593', '598', '55', '34', '1', '44', '7', '0']
+WEIGHTS = [30, 20, 10, 8, 6, 5, 4, 3, 4, 4, 3, 1, 1, 1]
+
+
+def sample_phones(size, unique_ratio=0.6, seed=0):
+    rng = random.Random(seed)
+    unique_count = max(1, int(size * unique_ratio))
+    uniques = [
+        '+' + code + ''.join(rng.choice('0123456789') for _ in range(rng.randint(8, 11)))
+        for code in rng.choices(CALLING_CODES, weights=WEIGHTS, k=unique_count)
+    ]
+    return pd.Series(rng.choices(uniques, k=size))
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de resolución de países")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        phones = sample_phones(size)
+        expected, t_rows = timed(lambda: phones.map(getCountry))
+        compat, t_compat = timed(lambda: resolve_countries(phones))
+        _, t_fast = timed(lambda: resolve_countries(phones, compat=False))
+        assert compat.equals(expected.rename('country')), "resolve_countries(compat=True) difiere de getCountry"
+        print(f"{size:>9} teléfonos | getCountry {t_rows:7.2f}s | compat {t_compat:6.2f}s "
+              f"({t_rows / t_compat:5.1f}x) | rápido {t_fast:6.2f}s ({t_rows / t_fast:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Compara la carga de CSVs de handle_upload antes (base64 -> str -> pd.read_csv -> concat -> duplicated)
+contra csv_ingest.ingest_csvs: tiempo, throughput y pico de memoria del proceso.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_csv_ingest --rows 1000000                 dos exportaciones sintéticas de MP
+    python -m benchmarks.bench_csv_ingest --files export1.csv export2.csv
+    python -m benchmarks.bench_csv_ingest --rows 1000000 --block-sizes 262144 1048576 4194304
+
+La memoria de Arrow no la ve tracemalloc, así que cada variante corre en un proceso aparte y se mide
+el RSS: el pico (VmHWM, reiniciado antes de parsear) menos el RSS con el contenido base64 ya en memoria.
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from config import CSV_INGEST_BLOCK_SIZE
+
+
+def synthetic_export(path, rows, seed):
+    """Exportación de suscripciones de MP con las columnas del CSV real y texto libre."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 700, rows), 'D')
+    last_charge = start + pd.to_timedelta(rng.integers(0, 300, rows), 'D')
+    pd.DataFrame({
+        'id': [f"2c9380848{i:015x}" for i in rng.integers(0, 2 ** 48, rows)],
+        'payer_email': [f"user{i}@example.com" for i in rng.integers(0, rows, rows)],
+        'reason': rng.choice(['TranscribeMe Plus', 'TranscribeMe Plus 2', 'TranscribeMe Plus discount'], rows),
+        'status': rng.choice(['authorized', 'cancelled', 'paused'], rows, p=[0.6, 0.35, 0.05]),
+        'start_date': start.strftime('%Y-%m-%dT%H:%M:%S.000-04:00'),
+        'last_charge_date': last_charge.strftime('%Y-%m-%dT%H:%M:%S.000-04:00'),
+        'billing_day': rng.integers(1, 28, rows),
+        'transaction_amount': rng.choice([4999.0, 3999.0, 12999.0], rows),
+    }).to_csv(path, index=False)
+
+
+def _content(path):
+    with open(path, 'rb') as f:
+        return 'data:text/csv;base64,' + base64.b64encode(f.read()).decode('ascii')
+
+
+def load_with_pandas(contents):
+    dataframes = []
+    for content in contents:
+        content_type, content_string = content.split(',')
+        decoded = base64.b64decode(content_string)
+        dataframes.append(pd.read_csv(io.StringIO(decoded.decode('utf-8'))))
+    combined_df = pd.concat(dataframes, ignore_index=True)
+    num_dups = combined_df.duplicated().sum()
+    if num_dups > 0:
+        combined_df = combined_df.drop_duplicates()
+    return len(combined_df), int(num_dups)
+
+
+def load_with_ingest(contents, block_size):
+    from csv_ingest import ingest_csvs
+    table, stats = ingest_csvs(contents, 'mp_subscriptions', block_size=block_size)
+    return table.num_rows, stats['duplicates']
+
+
+def _rss_kib(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def run_child(variant, paths, block_size):
+    contents = [_content(path) for path in paths]
+    if variant == 'ingest':
+        import csv_ingest  # noqa: F401  (importar pyarrow no cuenta como memoria de la carga)
+    baseline = _rss_kib('VmRSS')
+    # Reinicia el pico de RSS del proceso (Linux)
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    started = time.perf_counter()
+    if variant == 'pandas':
+        rows, duplicates = load_with_pandas(contents)
+    else:
+        rows, duplicates = load_with_ingest(contents, block_size)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'rows': rows, 'duplicates': duplicates, 'seconds': elapsed,
+        'peak_mib': (_rss_kib('VmHWM') - baseline) / 1024,
+    }))
+
+
+def measure(variant, paths, block_size=0):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_csv_ingest', '--child', variant,
+         '--block-size', str(block_size), '--files', *paths],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de csv_ingest")
+    parser.add_argument('--rows', type=int, default=500000, help="filas de cada exportación sintética")
+    parser.add_argument('--files', nargs='+', help="CSVs a cargar en vez de los sintéticos")
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=[CSV_INGEST_BLOCK_SIZE])
+    parser.add_argument('--child', choices=['pandas', 'ingest'], help=argparse.SUPPRESS)
+    parser.add_argument('--block-size', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.files, args.block_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.files
+        if not paths:
+            # Dos exportaciones que se solapan en un 20% de las filas, como al subir dos meses seguidos
+            paths = [os.path.join(tmp, 'export1.csv'), os.path.join(tmp, 'export2.csv')]
+            synthetic_export(paths[0], args.rows, seed=1)
+            overlap = pd.read_csv(paths[0], nrows=args.rows // 5)
+            synthetic_export(paths[1], args.rows - len(overlap), seed=2)
+            overlap.to_csv(paths[1], mode='a', header=False, index=False)
+        size_mib = sum(os.path.getsize(path) for path in paths) / 2 ** 20
+
+        expected = measure('pandas', paths)
+        print(f"{len(paths)} CSVs, {size_mib:.1f} MiB, {expected['rows']} filas ({expected['duplicates']} duplicadas)")
+        print(f"  base64 + read_csv + duplicated   {expected['seconds']:6.2f}s "
+              f"({size_mib / expected['seconds']:6.1f} MiB/s), pico {expected['peak_mib']:7.1f} MiB")
+        for block_size in args.block_sizes:
+            result = measure('ingest', paths, block_size)
+            assert (result['rows'], result['duplicates']) == (expected['rows'], expected['duplicates']), \
+                "csv_ingest no dio las mismas filas"
+            print(f"  csv_ingest bloque máx {block_size // 1024:>5} KiB {result['seconds']:6.2f}s "
+                  f"({size_mib / result['seconds']:6.1f} MiB/s), pico {result['peak_mib']:7.1f} MiB "
+                  f"({expected['peak_mib'] / max(result['peak_mib'], 0.1):4.1f}x menos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Compara list(aggregate) + pd.DataFrame(docs) + pd.to_datetime contra mongo_loader.aggregate_frame sobre
+mp-payments y stripe-payments: tiempo de carga y pico de memoria (tracemalloc).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_mongo_loader --start 2024-01-01 --end 2025-12-31     contra MONGO_URI
+    python -m benchmarks.bench_mongo_loader --synthetic 200000                      datos sintéticos sin Mongo
+    python -m benchmarks.bench_mongo_loader --batch-sizes 1000 5000 20000
+
+Con --synthetic los documentos salen de un generador que imita al cursor de pymongo (se crean de a uno),
+así que se mide solo el costo del lado del cliente; con una Mongo real se suma la decodificación BSON.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+import pandas as pd
+from config import (
+    MONGO_URI,
+    MONGO_DB_TME_CHARTS,
+    MONGO_COLLECTION_MP_PAYMENTS,
+    MONGO_COLLECTION_STRIPE_PAYMENTS,
+    )
+from mongo_loader import aggregate_frame
+from subs_metrics import MP_PAYMENTS_SCHEMA, STRIPE_SUBSCRIPTION_PAYMENTS_SCHEMA
+
+
+def mp_pipeline(start, end):
+    return [
+        {"$match": {"date_created": {"$gte": start, "$lte": end}}},
+        {"$project": {"_id": 0, **{column: 1 for column in MP_PAYMENTS_SCHEMA}}},
+    ]
+
+
+def stripe_pipeline(start, end):
+    return [
+        {"$match": {"status": 'succeeded', "created": {"$gte": start, "$lt": end}}},
+        {"$project": {"_id": 0, **{column: 1 for column in STRIPE_SUBSCRIPTION_PAYMENTS_SCHEMA}}},
+    ]
+
+
+class SyntheticCursor:
+    """Cursor que arma los documentos de a uno, como el de pymongo (sin lista intermedia)."""
+    def __init__(self, make_doc, size, seed):
+        rng = random.Random(seed)
+        self._docs = (make_doc(rng) for _ in range(size))
+
+    def __iter__(self):
+        return self._docs
+
+    def close(self):
+        pass
+
+
+class SyntheticCollection:
+    def __init__(self, make_doc, size, seed=0):
+        self.make_doc, self.size, self.seed = make_doc, size, seed
+
+    def aggregate(self, pipeline, **kwargs):
+        return SyntheticCursor(self.make_doc, self.size, self.seed)
+
+
+def _day(rng):
+    return f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def synthetic_mp_payment(rng):
+    return {
+        'date_created': f"{_day(rng)}T10:{rng.randint(10, 59)}:00.000-04:00",
+        'date_approved': None if rng.random() < 0.2 else f"{_day(rng)}T10:00:00.000-04:00",
+        'description': rng.choice(['TranscribeMe Plus', 'Plan 3 meses', 'Recarga 100 tokens']),
+        'operation_type': rng.choice(['regular_payment', 'recurring_payment']),
+        'status': rng.choice(['approved', 'approved', 'rejected', 'pending']),
+        'transaction_amount': rng.choice([4999.0, 12999.0, 1500.0]),
+    }
+
+
+def synthetic_stripe_payment(rng):
+    return {
+        'created': f"{_day(rng)} 12:00:00",
+        'statement_descriptor': rng.choice([None, 'TranscribeMe', 'TranscribeGo']),
+        'amount': rng.choice([2.99, 15.0, 19.99, 135.0]),
+        'currency': rng.choice(['usd', 'usd', 'eur', 'mxn']),
+    }
+
+
+def load_with_dicts(collection, pipeline, schema):
+    df = pd.DataFrame(list(collection.aggregate(pipeline)))
+    for column, kind in schema.items():
+        if kind == 'datetime' and column in df:
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de mongo_loader")
+    parser.add_argument('--start', default='2025-01-01')
+    parser.add_argument('--end', default='2025-12-31')
+    parser.add_argument('--synthetic', type=int, help="cantidad de documentos sintéticos por colección (sin Mongo)")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        collections = {
+            MONGO_COLLECTION_MP_PAYMENTS: SyntheticCollection(synthetic_mp_payment, args.synthetic),
+            MONGO_COLLECTION_STRIPE_PAYMENTS: SyntheticCollection(synthetic_stripe_payment, args.synthetic),
+        }
+    else:
+        from mongo_client import get_client
+        collections = get_client(MONGO_URI)[MONGO_DB_TME_CHARTS]
+
+    cases = [
+        (MONGO_COLLECTION_MP_PAYMENTS, mp_pipeline(args.start, args.end), MP_PAYMENTS_SCHEMA),
+        (MONGO_COLLECTION_STRIPE_PAYMENTS, stripe_pipeline(args.start, args.end), STRIPE_SUBSCRIPTION_PAYMENTS_SCHEMA),
+    ]
+    for name, pipeline, schema in cases:
+        collection = collections[name]
+        expected, t_dicts, peak_dicts = measure(lambda: load_with_dicts(collection, pipeline, schema))
+        print(f"{name:16} {len(expected):>9} docs | dicts + DataFrame {t_dicts:6.2f}s, pico {peak_dicts:7.1f} MiB, "
+              f"frame {expected.memory_usage(deep=True).sum() / 2 ** 20:6.1f} MiB")
+        for batch_size in args.batch_sizes:
+            df, t_loader, peak_loader = measure(lambda: aggregate_frame(collection, pipeline, schema, batch_size))
+            assert len(df) == len(expected), "el loader no trajo la misma cantidad de filas"
+            print(f"{'':16} {'':>9}      | loader batch {batch_size:>6} {t_loader:6.2f}s, pico {peak_loader:7.1f} MiB "
+                  f"({peak_dicts / peak_loader:4.1f}x menos)")
+
+
+if __name__ == '__main__':
+    main()
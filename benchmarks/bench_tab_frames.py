@@ -0,0 +1,145 @@
+"""
+Memoria y CPU de los DataFrames de las pestañas Overview y Stripe con columnas object y fechas en string
+(como antes) contra los tipos declarados en los schemas de subs_metrics (category y datetime64).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_tab_frames                    200k suscripciones y pagos sintéticos
+    python -m benchmarks.bench_tab_frames --size 1000000 --repeat 5
+
+"Antes" suma los pd.to_datetime que hacían los métodos, render_tab_content y los charts sobre las
+mismas columnas; "después" usa los frames ya tipados. Los países vienen asignados (la resolución de
+países tiene su propio benchmark) y las cotizaciones son fijas, para medir solo el trabajo sobre los frames.
+"""
+import argparse
+import random
+import time
+from unittest import mock
+import numpy as np
+import pandas as pd
+from ars_rates import ars_rates
+from components.charts import tgo_income_chart, tme_subs_income_chart
+from subs_metrics import (
+    MP_PLANES,
+    SUBS_SCHEMA,
+    STRIPE_UPDATES_SCHEMA,
+    STRIPE_SUBSCRIPTION_PAYMENTS_SCHEMA,
+    SubscriptionMetrics,
+    )
+
+COUNTRIES = ['Argentina', 'Mexico', 'Colombia', 'Chile', 'Peru', 'Spain', 'United States', 'Telegram']
+
+
+def legacy_frames(size, seed=0):
+    """Frames como los armaba pd.DataFrame(docs): strings y fechas sin parsear."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2023-01-01', '2025-12-31').strftime('%Y-%m-%d').to_numpy()
+    subs = pd.DataFrame({
+        'user_id': rng.integers(10 ** 10, 10 ** 11, size).astype(str).astype(object),
+        'provider': rng.choice(np.array(['stripe', None], dtype=object), size),
+        'status': rng.choice(np.array(['active', 'authorized', 'paused', 'past_due', 'incomplete', 'unpaid'], dtype=object), size),
+        'source': rng.choice(np.array(['w', 't'], dtype=object), size),
+        'reason': rng.choice(np.array(MP_PLANES + [None], dtype=object), size),
+        'start_date': rng.choice(days, size).astype(object),
+        'country': rng.choice(np.array(COUNTRIES, dtype=object), size),
+    })
+    updates = pd.DataFrame({
+        'user_id': subs['user_id'].to_numpy()[: size // 2],
+        'source': subs['source'].to_numpy()[: size // 2],
+        'timestamp': rng.choice(days, size // 2).astype(object),
+        'country': subs['country'].to_numpy()[: size // 2],
+    })
+    amounts = np.array([1.5, 30, 100, 2.99, 15, 19.99, 26.99, 135, 179.99, 7.5])
+    payments = pd.DataFrame({
+        'created': (rng.choice(days, size) + 'T12:00:00Z').astype(object),
+        'statement_descriptor': rng.choice(np.array(['TranscribeGo subscript', 'TranscribeMe', 'Recarga'], dtype=object), size),
+        'amount': rng.choice(amounts, size),
+        'currency': rng.choice(np.array(['usd', 'eur', 'mxn'], dtype=object), size),
+        'description': rng.choice(np.array(['Plan Plus', 'Plus-monthly', 'Recarga'], dtype=object), size),
+    })
+    return subs, updates, payments
+
+
+def typed(df, schema):
+    """Aplica a un frame legacy los tipos del schema (lo que hace mongo_loader al cargar)."""
+    df = df.copy()
+    for column, kind in schema.items():
+        if kind == 'category':
+            df[column] = df[column].astype('category')
+        elif kind == 'datetime':
+            df[column] = pd.to_datetime(df[column])
+    if 'country' in df:
+        df['country'] = df['country'].astype('category')
+    return df
+
+
+def overview(metrics, subs, payments, extra, parse):
+    if parse:
+        subs = subs.copy()
+        subs['start_date'] = pd.to_datetime(subs['start_date'])
+        payments = payments.copy()
+        payments['created'] = pd.to_datetime(payments['created'])
+    full = metrics.assign_provider_default(subs.copy())
+    metrics.subs_all(full, status=["active", "authorized"], provider="all", country="all", source="all") \
+        .groupby(['provider', 'country'])['count'].sum()
+    metrics.subs_all(full, provider="all", status=["paused", "incomplete", "past_due", 'unpaid'], country="all",
+                     source="all").groupby(['status', 'country'])['count'].sum()
+    mp = pd.DataFrame({'approved_month': pd.to_datetime(['2025-01-01']), 'transaction_amount': [1.0]})
+    metrics.total_income(mp, payments, extra)
+
+
+def stripe_tab(metrics, updates, payments, parse):
+    if parse:
+        updates = updates.copy()
+        updates['timestamp'] = pd.to_datetime(updates['timestamp'])
+        # El render y cada chart volvían a parsear 'created'
+        for _ in range(3):
+            payments = payments.copy()
+            payments['created'] = pd.to_datetime(payments['created'])
+    stripe_full = updates.rename(columns={'timestamp': 'start_date'})
+    stripe_full['provider'] = 'stripe'
+    metrics.subs_all(stripe_full, group_by='month', country="all", provider="stripe")
+    tgo_income_chart(payments, selector='Total')
+    tme_subs_income_chart(payments, selector='Total')
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        times.append(time.process_time() - started)
+    return min(times)
+
+
+def mib(*frames):
+    return sum(df.memory_usage(deep=True).sum() for df in frames) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tipos de los frames de las pestañas")
+    parser.add_argument('--size', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    metrics = SubscriptionMetrics()
+    subs, updates, payments = legacy_frames(args.size)
+    typed_subs = typed(subs, SUBS_SCHEMA)
+    typed_updates = typed(updates, STRIPE_UPDATES_SCHEMA)
+    typed_payments = typed(payments, {**STRIPE_SUBSCRIPTION_PAYMENTS_SCHEMA, 'description': 'category'})
+    extra = pd.DataFrame({'created': pd.to_datetime(['2025-01-01']), 'income': [1.0]})
+
+    print(f"{args.size} filas | memoria antes {mib(subs, updates, payments):7.1f} MiB, "
+          f"después {mib(typed_subs, typed_updates, typed_payments):7.1f} MiB")
+    with mock.patch.object(ars_rates, 'monthly_rates', lambda months: pd.Series(1000.0, index=months.index)):
+        for name, before, after in [
+            ('Overview', lambda: overview(metrics, subs, payments, extra, parse=True),
+                         lambda: overview(metrics, typed_subs, typed_payments, extra, parse=False)),
+            ('Stripe', lambda: stripe_tab(metrics, updates, payments, parse=True),
+                       lambda: stripe_tab(metrics, typed_updates, typed_payments, parse=False)),
+        ]:
+            t_before, t_after = best_of(args.repeat, before), best_of(args.repeat, after)
+            print(f"  {name:9} CPU antes {t_before:6.2f}s | después {t_after:6.2f}s ({t_before / t_after:4.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 # callbacks/summary_callbacks.py
 
 from dash import Input, Output, html
+from dash.exceptions import PreventUpdate
 from components.charts import colors  # usamos colores en los estilos
-from subs_metrics import SubscriptionMetrics
+from subs_metrics import SubscriptionMetrics, last_month_key
+from live_counters import live_counters
 
 metrics = SubscriptionMetrics()
 
@@ -25,22 +27,34 @@ def register_summary_callbacks(app):
 
     @app.callback(
         Output('subs-summary', 'children'),
-        Output('ingresos-summary', 'children'),
-        Input('dollar-value', 'value'),
-        prevent_initial_call=True  # Evita la llamada inicial sin valor
+        Output('summary-income-store', 'data'),
+        Input('get-dollar-value-button', 'n_clicks'),
+        Input('load-mongo-button', 'n_clicks'),
     )
-    def update_summary_metrics(dolar_value):
+    def load_summary_metrics(dollar_clicks, load_clicks):
+        # No depende del valor del dólar: corre al cargar la página y con los botones de carga
         
-        # Métricas suscripciones
-        active_tme_stripe_subs = metrics.get_tme_active_stripe_subs()
-        active_tgo_stripe_subs = metrics.get_tgo_active_stripe_subs()
-        authorized_mp_subs = metrics.get_total_active_mp_subs()
+        # Contadores en vivo del change stream (None si el watcher no está activo)
+        live = live_counters.snapshot()
+
+        # Métricas suscripciones: un $facet sobre subscriptions y un conteo sobre tgo-subscriptions
+        if live:
+            counts = live
+            active_tgo_stripe_subs = live['tgo_active_stripe_subs']
+        else:
+            counts = metrics.get_subscription_counts()
+            active_tgo_stripe_subs = metrics.get_tgo_active_stripe_subs()
+        active_tme_stripe_subs = counts['tme_active_stripe_subs']
+        authorized_mp_subs = counts['total_active_mp_subs']
         total_active_subs = active_tme_stripe_subs + active_tgo_stripe_subs + authorized_mp_subs
 
-        # Métricas de ingresos
-        ingresos_mp = round (metrics.get_last_month_mp_income(),2)
-        ingresos_stripe=round(metrics.get_last_month_stripe_income(),2)
-        total_ingresos = round(ingresos_mp/dolar_value + ingresos_stripe, 2)
+        # Métricas de ingresos (cacheadas por mes)
+        last_month = last_month_key()
+        if live:
+            ingresos_mp = round(live['mp_income_by_month'].get(last_month, 0), 2)
+        else:
+            ingresos_mp = round(metrics.get_month_mp_income(last_month), 2)
+        ingresos_stripe = round(metrics.get_month_stripe_income(last_month), 2)
 
         return (
             html.Div([
@@ -61,18 +75,35 @@ def register_summary_callbacks(app):
                     html.Span(f"{authorized_mp_subs}")
                 ])
             ]),
+            {'ingresos_mp': ingresos_mp, 'ingresos_stripe': ingresos_stripe},
+        )
+
+
+    @app.callback(
+        Output('ingresos-summary', 'children'),
+        Input('dollar-value', 'value'),
+        Input('summary-income-store', 'data'),
+        prevent_initial_call=True  # Evita la llamada inicial sin valor
+    )
+    def update_summary_income(dolar_value, incomes):
+        # Solo la división por el dólar: no consulta la Mongo ni APIs externas
+        if not dolar_value or not incomes:
+            raise PreventUpdate
+        ingresos_mp = incomes['ingresos_mp']
+        ingresos_stripe = incomes['ingresos_stripe']
+        total_ingresos = round(ingresos_mp/dolar_value + ingresos_stripe, 2)
+
+        return html.Div([
             html.Div([
-                html.Div([
-                    html.Span("Total: ", style={"fontWeight": "bold"}),
-                    html.Span(f"{total_ingresos} USD", style={"fontSize": "24px", "color": colors['stripe']})
-                ], style={"marginBottom": "10px"}),
-                html.Div([
-                    html.Span("Stripe TranscribeMe: ", style={"fontWeight": "bold"}),
-                    html.Span(f"{ingresos_stripe} USD")
-                ], style={"marginBottom": "5px"}),
-                html.Div([
-                    html.Span("Mercado Pago: ", style={"fontWeight": "bold"}),
-                    html.Span(f"{ingresos_mp} ARS")
-                ])
+                html.Span("Total: ", style={"fontWeight": "bold"}),
+                html.Span(f"{total_ingresos} USD", style={"fontSize": "24px", "color": colors['stripe']})
+            ], style={"marginBottom": "10px"}),
+            html.Div([
+                html.Span("Stripe TranscribeMe: ", style={"fontWeight": "bold"}),
+                html.Span(f"{ingresos_stripe} USD")
+            ], style={"marginBottom": "5px"}),
+            html.Div([
+                html.Span("Mercado Pago: ", style={"fontWeight": "bold"}),
+                html.Span(f"{ingresos_mp} ARS")
             ])
-        )
+        ])
@@ -1,75 +1,86 @@
-from config import PERSONAL_ACCESS_TOKEN, BASE_ID, TABLE_ID, STRIPE_API_KEY
-from pyairtable import Table
+from config import PERSONAL_ACCESS_TOKEN, BASE_ID, TABLE_ID
+from pyairtable import Api
 import pandas as pd
-from get_country import getCountry
+from get_country import resolve_countries
 import plotly.graph_objs as go
 import plotly.express as px
 from components.charts import create_stacked_bar_chart
-import stripe
-
-# Conexión a Stripe
-stripe.api_key = STRIPE_API_KEY
-
-# Conectar a la tabla
-table = Table(PERSONAL_ACCESS_TOKEN, BASE_ID, TABLE_ID)
-
-# Obtener todos los registros
-records = table.all()
-# Convertir a DataFrame (los datos están en 'fields')
-df = pd.DataFrame([record['fields'] for record in records])
-
-def determine_country(row):
-    if row['client_reference_id'].startswith('u'):
-        return "TranscribeGo"
-    elif row['client_reference_id'].startswith('t'):
-        return "Telegram"
-    elif row['client_reference_id'].startswith('w'):
-        user_phone = '+' + str(row['client_reference_id'][1:])
-        return getCountry(user_phone)
-
-df['country'] = df.apply(determine_country, axis=1)
+from stripe_subscriptions import subscription_resolver
+from http_client import http_client
+
+
+def fetch_expired_sessions():
+    """
+    Descarga todos los registros de la tabla de Airtable de checkout sessions expiradas.
+
+    Retorna:
+    pd.DataFrame: un registro por fila (los datos están en 'fields') con la columna 'country'
+    """
+    # Conectar a la tabla y obtener todos los registros (por el cliente HTTP compartido)
+    api = Api(PERSONAL_ACCESS_TOKEN, timeout=http_client.timeout_for('api.airtable.com'), retry_strategy=False)
+    api.session = http_client.session('airtable')
+    api.api_key = PERSONAL_ACCESS_TOKEN  # el token se guarda en los headers de la sesión
+    table = api.table(BASE_ID, TABLE_ID)
+    records = table.all()
+    df = pd.DataFrame([record['fields'] for record in records])
+    df['country'] = determine_country(df['client_reference_id'])
+    return df
+
+def determine_country(client_reference_ids):
+    """
+    Determina el país de cada sesión a partir del client_reference_id: 'u' -> TranscribeGo,
+    't' -> Telegram, 'w' -> país del teléfono que sigue a la 'w'.
+    """
+    kind = client_reference_ids.str[0]
+    country = pd.Series(None, index=client_reference_ids.index, dtype=object)
+    country[kind == 'u'] = "TranscribeGo"
+    country[kind == 't'] = "Telegram"
+    web = kind == 'w'
+    country[web] = resolve_countries('+' + client_reference_ids[web].str[1:])
+    return country
 
 # ------------------------- FUNNEL CHART ----------------------------------------------------------
-# Total Expired Checkout Sessions by Country
-total_expired = df['country'].value_counts().reset_index()
-total_expired['stage'] = 'Expired Sessions'
-
-# Users emailed (customer email is not NaN)
-users_emailed = df[~df['customer email'].isna()].copy()
-# TME users emailed
-users_emailed = users_emailed[users_emailed['country']!= 'TranscribeGo'].copy()
-total_emailed = users_emailed['country'].value_counts().reset_index()
-total_emailed['stage'] = 'Emailed'
-
-# Subscribed Users
-subs = []
-for idx, row in users_emailed.iterrows():
-    customer = row['customer ID']
-    expired_session_timestamp = row['created']
-    subscriptions = stripe.Subscription.list(limit=10, customer=customer, created = {'gt': expired_session_timestamp}, status='active')
-    subs.append(subscriptions.data[0].id) if subscriptions.data else subs.append(None)
-users_emailed['sub_id'] = subs
-subscribed_df = users_emailed[~users_emailed['sub_id'].isna()].copy()
-total_subscribed = subscribed_df['country'].value_counts().reset_index()
-total_subscribed['stage'] = 'Subscribed'
-
-# Combining all stages
-final = pd.concat([total_expired, total_emailed, total_subscribed], axis=0)
-
-# Agrupar y sumar los counts por stage
-total = final.groupby('stage')['count'].sum().reset_index()
-
-# Ordena el DataFrame según el orden categorical
-total = total.sort_values('count', ascending=False)
-
-# Ahora sí, el funnel respetará el orden
-total_funnel_fig = px.funnel(total, 
+def funnel_stages(df):
+    """
+    Cuenta por etapa (sesiones expiradas, usuarios emailed, usuarios que se suscribieron) los
+    usuarios de las sesiones expiradas. Las suscripciones se buscan en bloque en Stripe.
+    """
+    # Total Expired Checkout Sessions by Country
+    total_expired = df['country'].value_counts().reset_index()
+    total_expired['stage'] = 'Expired Sessions'
+
+    # Users emailed (customer email is not NaN)
+    users_emailed = df[~df['customer email'].isna()].copy()
+    # TME users emailed
+    users_emailed = users_emailed[users_emailed['country']!= 'TranscribeGo'].copy()
+    total_emailed = users_emailed['country'].value_counts().reset_index()
+    total_emailed['stage'] = 'Emailed'
+
+    # Subscribed Users: suscripción activa creada después de la sesión expirada
+    users_emailed['sub_id'] = subscription_resolver.resolve(users_emailed['customer ID'], users_emailed['created'])
+    subscribed_df = users_emailed[~users_emailed['sub_id'].isna()].copy()
+    total_subscribed = subscribed_df['country'].value_counts().reset_index()
+    total_subscribed['stage'] = 'Subscribed'
+
+    # Combining all stages
+    final = pd.concat([total_expired, total_emailed, total_subscribed], axis=0)
+
+    # Agrupar y sumar los counts por stage
+    total = final.groupby('stage')['count'].sum().reset_index()
+
+    # Ordena el DataFrame según el orden categorical
+    return total.sort_values('count', ascending=False)
+
+def funnel_chart(total):
+    # Ahora sí, el funnel respetará el orden
+    return px.funnel(total, 
                 x='count', 
                 y='stage',
                 title='Subscriptions among emailed users with expired checkout sessions',)
 
 # --------------------- Heat Map Users by Country -------------------------------------------------
-df_map = df.groupby('country').size().reset_index(name='Users')
+def users_by_country(df):
+    return df.groupby('country').size().reset_index(name='Users')
 
 def heat_map_users_by_country(total_users_by_country, title = 'Expired Sessions by Country'):
     fig = go.Figure(data=go.Choropleth(
@@ -105,23 +116,47 @@ def heat_map_users_by_country(total_users_by_country, title = 'Expired Sessions
     
     return fig
 
-map_fig = heat_map_users_by_country(df_map)
-
 # --------------------- Stacked Bar Chart Users by Country Over Time -------------------------
-df = df.rename(columns={'Created (date)': 'date'})
+def expired_sessions_per_day(df):
+    df = df.rename(columns={'Created (date)': 'date'})
 
-df['date'] = pd.to_datetime(df['date'])
+    df['date'] = pd.to_datetime(df['date'])
 
-# Extraer solo la parte de la fecha (sin hora)
-df['date'] = df['date'].dt.date
+    # Extraer solo la parte de la fecha (sin hora)
+    df['date'] = df['date'].dt.date
 
-# Agrupar por fecha y país, y contar las ocurrencias
-expired_per_day = df.groupby(['date', 'country']).size().reset_index(name='count')
+    # Agrupar por fecha y país, y contar las ocurrencias
+    expired_per_day = df.groupby(['date', 'country']).size().reset_index(name='count')
 
-# Ordenar por fecha y país
-expired_per_day = expired_per_day.sort_values(['date', 'country']).reset_index(drop=True)
+    # Ordenar por fecha y país
+    return expired_per_day.sort_values(['date', 'country']).reset_index(drop=True)
 
-expired_per_day_fig = create_stacked_bar_chart(
+def expired_per_day_chart(expired_per_day):
+    return create_stacked_bar_chart(
                 data_df=expired_per_day, stack_column = "country",
                 title="", x_label="Mes", y_label="Cantidad")
 
+# --------------------- Snapshot ------------------------------------------------------------------
+def build_snapshot():
+    """
+    Descarga Airtable, consulta Stripe y calcula los DataFrames de la pestaña Revenue Recovery.
+
+    Retorna:
+    dict: records, funnel, map y expired_per_day (DataFrames)
+    """
+    df = fetch_expired_sessions()
+    return {
+        'records': df,
+        'funnel': funnel_stages(df),
+        'map': users_by_country(df),
+        'expired_per_day': expired_sessions_per_day(df),
+    }
+
+def snapshot_figures(snapshot):
+    """
+    Retorna:
+    tuple: (map_fig, expired_per_day_fig, total_funnel_fig) armadas desde un snapshot
+    """
+    return (heat_map_users_by_country(snapshot['map']),
+            expired_per_day_chart(snapshot['expired_per_day']),
+            funnel_chart(snapshot['funnel']))
@@ -202,42 +202,34 @@ def mp_net_subscriptions_chart(df):
                         yaxis_tickformat=',', title_x=0.5)
     return fig
 
-def mp_unique_payments_per_month(df, selector = 'Total'):
-    # Tomo solo los pagos únicos de all_mp_payments
-    pagos_unicos = df[df['operation_type']=='regular_payment'].copy()
-    # Transformo las fechas al formato que necesito para agrupar
-    pagos_unicos['date_created'] = pd.to_datetime(df['date_created'])
+def _payments_per_month(df, month_column, x_column):
+    # Cantidad de pagos por mes; month_column es un mes ya calculado en get_mp_payments_frame
+    return (
+        df
+        .groupby(month_column)
+        .agg(count=(month_column, 'size'))
+        .reset_index()
+        .rename(columns={month_column: x_column})
+    )
 
+def _filter_payments_status(df, selector):
     # Selección de pagos
     if selector == 'Aprobados':
-        pagos_unicos = pagos_unicos[pagos_unicos['status']=='approved']
+        return df[df['approved']]
     elif selector == 'Rechazados':
-        pagos_unicos = pagos_unicos[pagos_unicos['status']=='rejected']
-    
-    mp_discount = pagos_unicos[pagos_unicos['description'] == 'single_payment_discount'].copy()
-    recargas_tokens = pagos_unicos[pagos_unicos['description'] == 'single_payment_C'].copy()
-    recargas_min = pagos_unicos[pagos_unicos['description'] == 'single_payment_T'].copy()
-
-    mp_discount_per_month = (
-        mp_discount
-        .groupby(mp_discount['date_created'].dt.to_period('M').dt.to_timestamp())
-        .agg(count=('date_created', 'size'))
-        .reset_index()
-    )
+        return df[df['status'] == 'rejected']
+    return df
 
-    recargas_tokens_per_month = (
-        recargas_tokens
-        .groupby(recargas_tokens['date_created'].dt.to_period('M').dt.to_timestamp())
-        .agg(count=('date_created', 'size'))
-        .reset_index()
-    )
+def mp_unique_payments_per_month(df, selector = 'Total'):
+    # df es la salida de get_mp_payments_frame; tomo solo los pagos únicos
+    pagos_unicos = _filter_payments_status(df[df['operation_type'] == 'regular_payment'], selector)
 
-    recargas_min_per_month = (
-        recargas_min
-        .groupby(recargas_min['date_created'].dt.to_period('M').dt.to_timestamp())
-        .agg(count=('date_created', 'size'))
-        .reset_index()
-    )
+    mp_discount_per_month = _payments_per_month(
+        pagos_unicos[pagos_unicos['description'] == 'single_payment_discount'], 'created_month', 'date_created')
+    recargas_tokens_per_month = _payments_per_month(
+        pagos_unicos[pagos_unicos['description'] == 'single_payment_C'], 'created_month', 'date_created')
+    recargas_min_per_month = _payments_per_month(
+        pagos_unicos[pagos_unicos['description'] == 'single_payment_T'], 'created_month', 'date_created')
 
     fig = go.Figure()
     # Suscripciones de 3 meses
@@ -267,23 +259,9 @@ def mp_unique_payments_per_month(df, selector = 'Total'):
     return fig
 
 def mp_subscription_payments_per_month(df, selector = 'Total'):
-    # Tomo solo las suscripciones de all_mp_payments
-    suscripciones = df[df['operation_type']=='recurring_payment'].copy()
-    # Transformo las fechas al formato que necesito para agrupar
-    suscripciones['date_created'] = pd.to_datetime(df['date_created'])
-
-    # Selección de pagos
-    if selector == 'Aprobados':
-        suscripciones = suscripciones[suscripciones['status']=='approved']
-    elif selector == 'Rechazados':
-        suscripciones = suscripciones[suscripciones['status']=='rejected']
-    
-    suscripciones_per_month = (
-        suscripciones
-        .groupby(suscripciones['date_created'].dt.to_period('M').dt.to_timestamp())
-        .agg(count=('date_created', 'size'))
-        .reset_index()
-    )
+    # df es la salida de get_mp_payments_frame; tomo solo las suscripciones
+    suscripciones = _filter_payments_status(df[df['operation_type'] == 'recurring_payment'], selector)
+    suscripciones_per_month = _payments_per_month(suscripciones, 'created_month', 'date_created')
 
     fig = go.Figure()
     # Suscripciones
@@ -299,38 +277,18 @@ def mp_subscription_payments_per_month(df, selector = 'Total'):
     return fig
 
 def income_mp_per_month(df, selector = 'Total'):
-    pagos_total = df[df['status']=='approved'].copy()
-
-    pagos_total['date_approved'] = pd.to_datetime(df['date_approved'])
-
-    # Unificar los valores de description según el tipo
-    def unify_description(desc):
-        if desc.startswith('TranscribeMe'):
-            return 'Suscripciones'
-        elif desc == 'single_payment_discount':
-            return 'Plan de 3 meses'
-        elif desc == 'single_payment_C':
-            return 'Recargas de tokens'
-        elif desc == 'single_payment_T':
-            return 'Recargas de minutos'
-        return desc  # Mantener el valor original si no coincide con ninguna regla
-
-    pagos_total['description'] = pagos_total['description'].apply(unify_description)
-
-    if selector == 'Total':
-        income_per_month = (
-            pagos_total
-            .groupby(pagos_total['date_approved'].dt.to_period('M').dt.to_timestamp())
-            .agg(income=('transaction_amount', 'sum'))
-            .reset_index()
-        )
-    else:
-        income_per_month = (
-            pagos_total[pagos_total['description'] == selector].copy()
-            .groupby(pagos_total['date_approved'].dt.to_period('M').dt.to_timestamp())
-            .agg(income=('transaction_amount', 'sum'))
-            .reset_index()
-        )
+    # df es la salida de get_mp_payments_frame: description_class ya unifica las descriptions
+    pagos_total = df[df['approved']]
+    if selector != 'Total':
+        pagos_total = pagos_total[pagos_total['description_class'] == selector]
+
+    income_per_month = (
+        pagos_total
+        .groupby('approved_month')
+        .agg(income=('transaction_amount', 'sum'))
+        .reset_index()
+        .rename(columns={'approved_month': 'date_approved'})
+    )
 
     income_per_month['income'] = income_per_month['income'].round(2)
 
@@ -387,7 +345,6 @@ def net_subscriptions_chart(df):
 
 def tgo_income_chart (payments, selector = 'Total'):
     df = payments[payments['statement_descriptor'] == 'TranscribeGo subscript'].copy()
-    df['created'] = pd.to_datetime(df['created'])
     if selector == 'Total':
         income_per_month = (
             df
@@ -419,7 +376,6 @@ def tgo_income_chart (payments, selector = 'Total'):
 
 def tme_subs_income_chart (payments, selector = 'Total'):
     df = payments[payments['statement_descriptor'] != 'Recarga'].copy()
-    df['created'] = pd.to_datetime(df['created'])
     if selector == 'Total':
         income_per_month = (
             df
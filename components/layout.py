@@ -48,6 +48,7 @@ def serve_layout():
                     # value = metrics.get_dolar_argentina(),
                     min=0,
                     step=1,
+                    debounce=True,  # el resumen se actualiza con Enter o al salir del campo, no con cada tecla
                     style={"width": "50%", "marginTop": "10px", "height": "40px", "fontSize": "18px"}
                 ),
             ], style={**card_style, "width": "100%"}),
@@ -74,20 +75,10 @@ def serve_layout():
                 html.Button('Cargar datos', id='load-mongo-button', n_clicks=0, className='btn btn-primary',
                             style={'width': '100%', 'height': '40px', 'fontSize': '18px', 'marginTop': '10px'}),
                 html.Div(id='carga-data-mongo'),  # Placeholder for upload feedback
-                dcc.Store(id='stripe-tme-monthly-subs-store'),
-                dcc.Store(id='stripe-tme-monthly-canceled-subs-store'),
-                dcc.Store(id='stripe-tme-monthly-incomplete-subs-store'),
-                dcc.Store(id='tgo-monthly-subs-store'),
-                dcc.Store(id='tgo-monthly-canceled-subs-store'),
-                dcc.Store(id='tgo-monthly-incomplete-subs-store'),
                 dcc.Store(id='neto-stripe-tme-subs-store'),
                 dcc.Store(id='neto-tgo-subs-store'),
-                dcc.Store(id='stripe-creation-by-country-store'),
-                dcc.Store(id='stripe-cancelation-by-country-store'),
-                dcc.Store(id='succeeded-stripe-payments-store'),
-                dcc.Store(id='total-stripe-recargas-per-month-store'),
-                dcc.Store(id='mp-active-subs-per-plan-store'),
-                dcc.Store(id='mp-payments-store'),
+                # Id del dataset de Mongo guardado en el servidor (dataset_store)
+                dcc.Store(id='mongo-dataset-store'),
             ], style={**card_style, "width": "100%"}),
         ], style={"marginBottom": "20px", "display": 'flex'}),
 
@@ -99,7 +90,9 @@ def serve_layout():
             ], style={**metric_card_style, "borderTop": f"4px solid {colors['stripe']}"}),
             html.Div([
                 html.H3("Ingresos último mes completo", style={"color": colors['primary'], "marginBottom": "15px"}),
-                html.Div(id='ingresos-summary', style={"fontSize": "16px"})
+                html.Div(id='ingresos-summary', style={"fontSize": "16px"}),
+                # Ingresos del último mes; el valor del dólar solo cambia la división
+                dcc.Store(id='summary-income-store'),
             ], style={**metric_card_style, "borderTop": f"4px solid {colors['primary']}"}),
         ], style={"display": "flex", "flexWrap": "wrap", "justifyContent": "space-between", "marginBottom": "20px"}),
             
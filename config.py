@@ -7,6 +7,30 @@ load_dotenv()
 # Configuración de MongoDB
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 
+# Pool de conexiones compartido por todos los usuarios de SubscriptionMetrics (por proceso)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+# Hilos para correr en paralelo las consultas independientes de la carga de datos
+MONGO_LOAD_WORKERS = int(os.getenv("MONGO_LOAD_WORKERS", "6"))
+# Documentos por lote al armar DataFrames tipados desde un cursor (mongo_loader)
+MONGO_LOADER_BATCH_SIZE = int(os.getenv("MONGO_LOADER_BATCH_SIZE", "5000"))
+
+# Caché de resultados de SubscriptionMetrics (límite por tamaño estimado de los DataFrames)
+METRICS_CACHE_MAX_BYTES = int(os.getenv("METRICS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Caché en disco user_id -> país, compartida por todos los workers de la máquina (SQLite)
+COUNTRY_CACHE_PATH = os.getenv("COUNTRY_CACHE_PATH", "/tmp/tme-country-cache.sqlite3")
+
+# Datasets de cada sesión guardados en el servidor (el navegador solo guarda el id)
+DATASET_STORE_DIR = os.getenv("DATASET_STORE_DIR", "/tmp/tme-datasets")
+DATASET_STORE_TTL_S = int(os.getenv("DATASET_STORE_TTL_S", str(6 * 3600)))
+DATASET_STORE_MEMORY_ITEMS = int(os.getenv("DATASET_STORE_MEMORY_ITEMS", "64"))  # DataFrames en memoria por worker
+
+# Ingesta de CSVs subidos (csv_ingest.py): bytes de CSV que parsea pyarrow por bloque
+CSV_INGEST_BLOCK_SIZE = int(os.getenv("CSV_INGEST_BLOCK_SIZE", str(256 * 1024)))
+
 # Configuración para métricas de suscripciones
 MONGO_DB_USERS = 'Users'
 MONGO_COLLECTION_SUBSCRIPTIONS = 'subscriptions'     # para ver creación, status, provider, planes de mp, source
@@ -19,17 +43,66 @@ MONGO_COLLECTION_STRIPE_PAYMENTS = 'stripe-payments'
 MONGO_COLLECTION_STRIPE_RECOVERY = 'stripe-recovery'
 
 # Configuración para métricas de TGO
+TGO_SUBS_START_DATE = os.getenv("TGO_SUBS_START_DATE", "2025-01-01")  # primer mes de las series de TGO
 MONGO_DB_TGO = 'B2B'
 MONGO_COLLECTION_ONBOARDING_TGO = 'onboardings'
 MONGO_COLLECTION_TGO_CALLS = 'transcribego-calls'
 
+# Base de analytics (rollups mensuales y estado de los jobs); necesita permisos de escritura
+MONGO_ANALYTICS_URI = os.getenv("MONGO_ANALYTICS_URI", MONGO_URI)
+MONGO_DB_ANALYTICS = 'TranscribeMe-analytics'
+MONGO_COLLECTION_MONTHLY_ROLLUPS = 'monthly-rollups'
+MONGO_COLLECTION_ROLLUP_STATE = 'rollup-state'
+# Si está activo, las series mensuales y los ingresos mensuales se leen de los rollups para los meses completos
+USE_MONTHLY_ROLLUPS = os.getenv("USE_MONTHLY_ROLLUPS", "false").lower() == "true"
+# Meses (contando el actual) en los que un documento de stripe-payments, mp-payments o tgo-subscriptions
+# puede cambiar de status en el lugar; el job de rollups los recalcula en cada corrida
+ROLLUP_MUTABLE_MONTHS = int(os.getenv("ROLLUP_MUTABLE_MONTHS", "2"))
+
+# Copias de analytics con las fechas como fechas BSON (las escribe normalized_dates.py)
+MONGO_COLLECTION_STRIPE_UPDATES_NORMALIZED = 'stripe-updates-normalized'
+MONGO_COLLECTION_STRIPE_PAYMENTS_NORMALIZED = 'stripe-payments-normalized'
+MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED = 'mp-payments-normalized'
+MONGO_COLLECTION_NORMALIZED_STATE = 'normalized-dates-state'
+# Zona horaria del negocio: define a qué día y mes pertenece cada evento (p. ej. America/Argentina/Buenos_Aires)
+BUSINESS_TIMEZONE = os.getenv("BUSINESS_TIMEZONE", "UTC")
+# Si está activo, los filtros por fecha y la agrupación por mes se hacen sobre las copias normalizadas
+USE_NORMALIZED_DATES = os.getenv("USE_NORMALIZED_DATES", "false").lower() == "true"
+
+# Contadores en vivo (change streams); requiere que la Mongo sea un replica set
+LIVE_COUNTERS_ENABLED = os.getenv("LIVE_COUNTERS_ENABLED", "false").lower() == "true"
+LIVE_COUNTERS_STATE_PATH = os.getenv("LIVE_COUNTERS_STATE_PATH", "/tmp/tme-live-counters.json")
+LIVE_COUNTERS_MAX_AGE_S = int(os.getenv("LIVE_COUNTERS_MAX_AGE_S", "60"))
+
 # API KEY exchange rates
 API_KEY = os.getenv("API_KEY_PROD", "")
+# Tablas diarias de cotizaciones (una por día, todas las monedas contra USD)
+FX_RATES_DIR = os.getenv("FX_RATES_DIR", "/tmp/tme-fx-rates")
+# Historial diario del dólar oficial en ARS (argentinadatos.com) y cada cuánto se actualiza
+ARS_RATES_PATH = os.getenv("ARS_RATES_PATH", "/tmp/tme-ars-rates.parquet")
+ARS_RATES_REFRESH_S = int(os.getenv("ARS_RATES_REFRESH_S", "21600"))
+
+# Cliente HTTP compartido para las APIs externas (timeouts por host en http_client.HOST_TIMEOUTS)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))  # reintentos de GET ante errores de conexión o 5xx/429
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))  # conexiones abiertas por host
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "3"))  # fallas seguidas que abren el circuito
+HTTP_BREAKER_RESET_S = int(os.getenv("HTTP_BREAKER_RESET_S", "60"))  # segundos con el circuito abierto
 
 # Configuración Airtable
 PERSONAL_ACCESS_TOKEN = os.getenv("PAT", "")
 BASE_ID = os.getenv("BASE_ID", "")
 TABLE_ID = os.getenv("TABLE_ID", "")
+# Refresco en segundo plano de los datos de Airtable (un solo worker por máquina lo corre)
+AIRTABLE_REFRESH_INTERVAL_S = int(os.getenv("AIRTABLE_REFRESH_INTERVAL_S", "3600"))
+AIRTABLE_REFRESH_LOCK_PATH = os.getenv("AIRTABLE_REFRESH_LOCK_PATH", "/tmp/tme-airtable-refresh.lock")
+# Snapshots de Airtable: fuera de DATASET_STORE_DIR, no vencen ni los borra el sweep del dataset store
+AIRTABLE_SNAPSHOT_DIR = os.getenv("AIRTABLE_SNAPSHOT_DIR", "/tmp/tme-airtable-snapshots")
 
 # Configuración Stripe
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY", "")
+# Para probar contra stripe-mock: STRIPE_API_BASE=http://localhost:12111 STRIPE_API_KEY=sk_test_123
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "")
+STRIPE_LOOKUP_WORKERS = int(os.getenv("STRIPE_LOOKUP_WORKERS", "4"))  # llamadas por cliente en paralelo
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "5"))  # reintentos ante 429
+STRIPE_BULK_MIN_CUSTOMERS = int(os.getenv("STRIPE_BULK_MIN_CUSTOMERS", "20"))  # desde cuántos clientes conviene listar todo
+STRIPE_CUSTOMER_CACHE_TTL_S = int(os.getenv("STRIPE_CUSTOMER_CACHE_TTL_S", "3600"))
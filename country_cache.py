@@ -0,0 +1,111 @@
+"""
+Caché persistente user_id -> país en un SQLite local.
+
+El país de un usuario sale de su teléfono (el user_id), así que no cambia nunca: se resuelve una sola
+vez y queda guardado en COUNTRY_CACHE_PATH. Todos los workers de gunicorn usan el mismo archivo (modo
+WAL, así las lecturas no bloquean las escrituras) y sobrevive a los reinicios. Para recalcular los países
+alcanza con borrar el archivo.
+"""
+import os
+import sqlite3
+import threading
+import pandas as pd
+from config import COUNTRY_CACHE_PATH
+
+# user_id por consulta, por debajo del límite de 999 parámetros de SQLite viejos
+BATCH_SIZE = 900
+
+
+class CountryCache:
+    def __init__(self, path=COUNTRY_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # Una conexión por hilo y por proceso: sqlite3 no permite compartirlas entre hilos ni después de un fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS countries ("
+                " user_id TEXT NOT NULL, source TEXT NOT NULL, country TEXT NOT NULL,"
+                " PRIMARY KEY (user_id, source)) WITHOUT ROWID"
+            )
+            conn.commit()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def lookup(self, keys):
+        """
+        Lee en bloque los países guardados, con una consulta por source y lote de user_id.
+
+        Parámetros:
+        keys (pd.DataFrame): columnas user_id y source (str), sin duplicados
+
+        Retorna:
+        pd.DataFrame: columnas user_id, source y country de los pares que ya estaban guardados
+        """
+        conn = self._connection()
+        rows = []
+        for source, user_ids in keys.groupby('source')['user_id']:
+            user_ids = user_ids.tolist()
+            for start in range(0, len(user_ids), BATCH_SIZE):
+                batch = user_ids[start:start + BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows += conn.execute(
+                    f"SELECT user_id, source, country FROM countries WHERE source = ? AND user_id IN ({placeholders})",
+                    [source, *batch],
+                ).fetchall()
+        return pd.DataFrame(rows, columns=['user_id', 'source', 'country'], dtype=object)
+
+    def store(self, rows):
+        """
+        Guarda en una sola transacción los países resueltos.
+
+        Parámetros:
+        rows (list): tuplas (user_id, source, país)
+        """
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO countries (user_id, source, country) VALUES (?, ?, ?)", rows)
+
+    def resolve(self, user_ids, sources, resolver):
+        """
+        Retorna el país de cada usuario, resolviendo con resolver solo los que no están en la caché.
+
+        Parámetros:
+        user_ids (pd.Series): user_id de cada fila
+        sources (pd.Series): source de cada fila (mismo índice que user_ids)
+        resolver (callable): recibe una pd.Series de user_id (str) y devuelve sus países
+
+        Retorna:
+        pd.Series: país de cada fila, con el mismo índice que user_ids
+        """
+        # Un source faltante queda como 'None' también si la columna es category (donde sería 'nan')
+        sources = sources.astype(object).where(sources.notna(), None)
+        keys = pd.DataFrame({'user_id': user_ids.astype(str), 'source': sources.astype(str)}, index=user_ids.index)
+        unique_keys = keys.drop_duplicates()
+        try:
+            known = self.lookup(unique_keys)
+        except sqlite3.Error as e:
+            print(f"Country cache no disponible ({e}); se resuelven todos los países")
+            known = pd.DataFrame(columns=['user_id', 'source', 'country'], dtype=object)
+
+        missing = unique_keys.merge(known, on=['user_id', 'source'], how='left', indicator=True)
+        missing = missing.loc[missing['_merge'] == 'left_only', ['user_id', 'source']].reset_index(drop=True)
+        if not missing.empty:
+            missing['country'] = resolver(missing['user_id']).to_numpy()
+            try:
+                self.store(list(missing.itertuples(index=False, name=None)))
+            except sqlite3.Error as e:
+                print(f"Country cache: no se pudieron guardar {len(missing)} países ({e})")
+            known = pd.concat([known, missing], ignore_index=True)
+
+        countries = keys.merge(known, on=['user_id', 'source'], how='left')['country']
+        return pd.Series(countries.to_numpy(), index=user_ids.index, dtype=object, name='country')
+
+
+country_cache = CountryCache()
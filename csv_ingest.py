@@ -0,0 +1,273 @@
+"""
+Ingesta de los CSVs que se suben al dashboard (exportaciones de suscripciones de MP y de revenue
+recovery de Stripe).
+
+El contenido llega del dcc.Upload como 'data:<tipo>;base64,<datos>'. En vez de decodificar todo el
+archivo, pasarlo a un string de Python y parsearlo con pd.read_csv (columnas object), el base64 se
+decodifica de a bloques a medida que pyarrow lee el CSV, con los tipos de columna declarados en
+CSV_SCHEMAS (los valores repetidos quedan como diccionarios). En las exportaciones de suscripciones de MP
+las filas repetidas se descartan por un hash de su columna clave (el id de la suscripción: si un id
+aparece más de una vez se conserva la última fila, así una exportación más nueva subida junto a una
+vieja deja el status actual) y el resultado queda como tabla de Arrow, lista para guardarse en parquet
+en el dataset store sin pasar por pandas.
+
+Los bloques son de como mucho CSV_INGEST_BLOCK_SIZE bytes y más chicos en los archivos chicos: cada bloque
+en vuelo reserva memoria en el reader, y con bloques de 1 MiB un CSV de pocos MiB ocupaba más que
+parsearlo entero con pandas.
+"""
+import base64
+import binascii
+import io
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from config import CSV_INGEST_BLOCK_SIZE
+
+# Tipos de columna (mismos nombres que mongo_loader.SCHEMA_KINDS, salvo datetime: las fechas de los
+# CSV traen offsets y se parsean donde se usan) -> tipo de Arrow
+CSV_KINDS = {
+    'float': pa.float64(),
+    'int': pa.int64(),
+    'bool': pa.bool_(),
+    'string': pa.string(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+}
+
+# Pool de Arrow de las ingestas: vive todo el proceso (las tablas que devuelve ingest_csvs siguen usando
+# su memoria) y permite medir cuánto ocupan las ingestas sin contar el resto del proceso. Usa el malloc
+# del sistema: el pool por defecto (mimalloc) reserva arenas por cada hilo del reader que suman más que
+# un CSV chico entero
+_INGEST_POOL = pa.proxy_memory_pool(pa.system_memory_pool())
+
+# Los archivos de menos de CSV_INGEST_BLOCK_SIZE * BLOCKS_PER_FILE bytes se leen en BLOCKS_PER_FILE bloques
+# (de al menos MIN_BLOCK_SIZE)
+MIN_BLOCK_SIZE = 64 * 1024
+BLOCKS_PER_FILE = 16
+
+# Tipos declarados por CSV y columnas que identifican una fila: se usa la primera que tenga el archivo
+# (si no tiene ninguna, todas las columnas). Con key_columns None el CSV no se deduplica
+CSV_SCHEMAS = {
+    'mp_subscriptions': {
+        'columns': {
+            'id': 'string',
+            'status': 'category',
+            'start_date': 'string',
+            'last_charge_date': 'string',
+            # Puede venir vacío o con decimales ('15.0') según desde dónde se exportó
+            'billing_day': 'float',
+            'reason': 'category',
+        },
+        'key_columns': ['id'],
+    },
+    'stripe_recovery': {
+        'columns': {
+            'charge_id': 'string',
+            'invoice_id': 'string',
+            'initial_payment_failed_at': 'string',
+            'initial_payment_decline_reason': 'string',
+            'initial_failed_amount': 'float',
+            'recovered_at': 'string',
+            'recovered_amount': 'float',
+            'recovery_method': 'string',
+        },
+        # Se carga tal cual, como antes de la ingesta por bloques: cada fila suma al volumen fallido
+        'key_columns': None,
+    },
+}
+
+
+class _Base64Reader(io.RawIOBase):
+    """
+    Archivo de solo lectura que decodifica el base64 de a bloques a medida que se lee, desde la
+    posición 'start' del contenido (sin copiar el string, que en una exportación anual son cientos de MiB).
+    """
+    def __init__(self, encoded, start=0, chunk_chars=4 * 256 * 1024):
+        self._encoded = encoded
+        self._position = start
+        self._buffer = bytearray()
+        self._chunk_chars = chunk_chars
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while len(self._buffer) < len(target) and self._position < len(self._encoded):
+            chunk = self._encoded[self._position:self._position + self._chunk_chars]
+            self._position += len(chunk)
+            self._buffer += base64.b64decode(chunk)
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        del self._buffer[:size]
+        self.bytes_read += size
+        return size
+
+
+def _data_start(content):
+    """Posición donde empiezan los datos, después del encabezado 'data:...;base64,'."""
+    comma = content.find(',', 0, 256)
+    if comma < 0 or 'base64' not in content[:comma]:
+        raise ValueError("El contenido no es un archivo en base64")
+    return comma + 1
+
+
+def _convert_options(columns):
+    return pa_csv.ConvertOptions(
+        column_types={name: CSV_KINDS[kind] for name, kind in columns.items()},
+        strings_can_be_null=True,
+    )
+
+
+def _block_size(content, start, block_size):
+    """Bloque para el archivo: block_size, o 1/BLOCKS_PER_FILE del CSV si es más chico (mínimo MIN_BLOCK_SIZE)."""
+    csv_size = (len(content) - start) * 3 // 4
+    return max(MIN_BLOCK_SIZE, min(block_size, csv_size // BLOCKS_PER_FILE))
+
+
+def _key_columns(names, key_columns):
+    """Columnas con que se identifica una fila: la primera de key_columns que tenga el CSV, o todas."""
+    for name in key_columns:
+        if name in names:
+            return [name]
+    return names
+
+
+def _row_hashes(batch, key_columns):
+    """
+    Hash de 64 bits de cada fila del bloque, sobre las columnas clave. Las filas sin clave (todas las
+    columnas clave nulas) se hashean enteras, así solo se descartan si son idénticas.
+    """
+    frame = batch.select(key_columns).to_pandas()
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy(copy=True)
+    missing = frame.isna().all(axis=1).to_numpy()
+    if missing.any() and len(key_columns) < batch.num_columns:
+        rows = batch.filter(pa.array(missing)).to_pandas()
+        hashes[missing] = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    return hashes
+
+
+def _keep_last(files):
+    """
+    Deja, de cada hash, solo la última fila en que aparece (en el orden de los archivos y sus bloques).
+
+    Parámetros:
+    files (list): (lista de pa.RecordBatch, lista de hashes de cada bloque) de cada archivo
+
+    Retorna:
+    tuple: (lista con los bloques filtrados de cada archivo, cantidad de filas descartadas)
+    """
+    hashes = [block for _, file_hashes in files for block in file_hashes]
+    if not hashes:
+        return [batches for batches, _ in files], 0
+    keep = ~pd.Series(np.concatenate(hashes)).duplicated(keep='last').to_numpy()
+    dropped = int(len(keep) - keep.sum())
+    if not dropped:
+        return [batches for batches, _ in files], 0
+    kept, offset = [], 0
+    for batches, _ in files:
+        filtered = []
+        for batch in batches:
+            mask = keep[offset:offset + batch.num_rows]
+            offset += batch.num_rows
+            filtered.append(batch if mask.all() else batch.filter(pa.array(mask)))
+        kept.append(filtered)
+    return kept, dropped
+
+
+def read_csv_content(content, schema, on_batch=None, block_size=CSV_INGEST_BLOCK_SIZE):
+    """
+    Parsea un CSV subido con dcc.Upload de a bloques, con los tipos declarados, y calcula el hash de la
+    clave de cada fila a medida que se lee.
+
+    Parámetros:
+    content (str): contenido 'data:<tipo>;base64,<datos>'
+    schema (str): nombre del CSV en CSV_SCHEMAS
+    on_batch (callable): se llama después de leer cada bloque (para medir la memoria)
+    block_size (int): máximo de bytes de CSV por bloque
+
+    Retorna:
+    tuple: (lista de pa.RecordBatch, lista con los hashes de las filas de cada bloque (vacía si el CSV
+        no se deduplica), bytes de CSV leídos)
+    """
+    spec = CSV_SCHEMAS[schema]
+    start = _data_start(content)
+    block_size = _block_size(content, start, block_size)
+    # El base64 se decodifica de a un bloque de CSV por vez
+    reader = _Base64Reader(content, start=start, chunk_chars=-(-block_size // 3) * 4)
+    try:
+        stream = pa_csv.open_csv(
+            reader,
+            read_options=pa_csv.ReadOptions(block_size=block_size),
+            convert_options=_convert_options(spec['columns']),
+            memory_pool=_INGEST_POOL,
+        )
+        key_columns = None
+        if spec['key_columns'] is not None:
+            key_columns = _key_columns(stream.schema.names, spec['key_columns'])
+        batches, hashes = [], []
+        for batch in stream:
+            if batch.num_rows:
+                batches.append(batch)
+                if key_columns is not None:
+                    hashes.append(_row_hashes(batch, key_columns))
+            if on_batch:
+                on_batch()
+    except binascii.Error as e:
+        raise ValueError(f"El archivo no es base64 válido: {e}") from e
+    return batches, hashes, reader.bytes_read
+
+
+def ingest_csvs(contents, schema, block_size=CSV_INGEST_BLOCK_SIZE):
+    """
+    Parsea uno o más CSVs subidos (mismas columnas), descarta las filas repetidas dentro y entre
+    archivos (se queda con la última de cada clave) y los une en una sola tabla.
+
+    Parámetros:
+    contents (list): contenidos 'data:<tipo>;base64,<datos>' de cada archivo
+    schema (str): nombre del CSV en CSV_SCHEMAS
+
+    Retorna:
+    tuple: (pa.Table, dict con rows, duplicates, bytes, seconds, mb_per_s y peak_arrow_bytes: máximo de
+        memoria de Arrow que sumó la ingesta, medido después de cada bloque; con ingestas simultáneas en
+        el mismo proceso incluye las de las otras)
+    """
+    started = time.perf_counter()
+    baseline = _INGEST_POOL.bytes_allocated()
+    peak = [0]
+
+    def measure():
+        peak[0] = max(peak[0], _INGEST_POOL.bytes_allocated() - baseline)
+
+    files, total_bytes = [], 0
+    for content in contents:
+        batches, hashes, size = read_csv_content(content, schema, on_batch=measure, block_size=block_size)
+        files.append((batches, hashes))
+        total_bytes += size
+
+    # Las filas repetidas se descartan recién al final: la que queda es la última, que puede estar en
+    # un archivo posterior
+    kept, duplicates = _keep_last(files)
+    tables = [pa.Table.from_batches(batches) for batches in kept if batches]
+
+    if tables:
+        # Un archivo puede inferir un tipo distinto en una columna no declarada (p. ej. toda nula)
+        table = pa.concat_tables(tables, promote_options='permissive', memory_pool=_INGEST_POOL)
+        measure()
+    else:
+        table = pa.table({})
+
+    seconds = time.perf_counter() - started
+    stats = {
+        'rows': table.num_rows,
+        'duplicates': duplicates,
+        'bytes': total_bytes,
+        'seconds': round(seconds, 3),
+        'mb_per_s': round(total_bytes / 2**20 / seconds, 1) if seconds else 0.0,
+        'peak_arrow_bytes': peak[0],
+    }
+    print(f"CSV {schema}: {stats['rows']} filas ({stats['duplicates']} duplicadas) de "
+          f"{total_bytes / 2**20:.1f} MiB en {seconds:.2f}s ({stats['mb_per_s']} MiB/s), "
+          f"pico Arrow {stats['peak_arrow_bytes'] / 2**20:.1f} MiB")
+    return table, stats
@@ -0,0 +1,161 @@
+"""
+Datasets del dashboard guardados del lado del servidor.
+
+cargar_datos_mongo guarda cada DataFrame en DATASET_STORE_DIR/<dataset_id>/<nombre>.parquet y el
+navegador solo guarda el dataset_id en un dcc.Store. Los callbacks leen los DataFrames por id y nombre,
+sin pasar por JSON. Cada worker guarda además los últimos DataFrames leídos en memoria, que se vuelven a
+leer del disco si otro proceso reescribió el archivo. Los datasets
+vencen DATASET_STORE_TTL_S segundos después de guardados; los vencidos se borran al guardar uno nuevo.
+Un store con ttl None (los snapshots de airtable_refresh) no vence ni se barre.
+"""
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import DATASET_STORE_DIR, DATASET_STORE_TTL_S, DATASET_STORE_MEMORY_ITEMS
+
+# El id llega desde el navegador: solo se aceptan nombres sin separadores de ruta
+_VALID_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def _is_valid_id(value):
+    # Un dcc.Store vacío o de una versión anterior puede mandar None, listas o dicts
+    return isinstance(value, str) and _VALID_ID.match(value) is not None
+
+
+class DatasetStore:
+    def __init__(self, root=DATASET_STORE_DIR, ttl=DATASET_STORE_TTL_S, memory_items=DATASET_STORE_MEMORY_ITEMS):
+        self.root = root
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self._memory = OrderedDict()  # (dataset_id, nombre) -> (DataFrame, mtime del archivo)
+        self._lock = threading.Lock()
+
+    def new_id(self):
+        return uuid.uuid4().hex
+
+    def _path(self, dataset_id, name=None):
+        if not _is_valid_id(dataset_id) or (name is not None and not _is_valid_id(name)):
+            raise ValueError(f"Id de dataset inválido: {dataset_id!r}/{name!r}")
+        directory = os.path.join(self.root, dataset_id)
+        return directory if name is None else os.path.join(directory, name)
+
+    def _remember(self, key, df, mtime):
+        with self._lock:
+            self._memory[key] = (df, mtime)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def put(self, dataset_id, name, df):
+        """
+        Guarda un DataFrame del dataset en parquet. Si pyarrow no puede representar alguna columna
+        (por ejemplo, objetos con tipos mezclados) se guarda con pickle. Una tabla de Arrow (los CSVs
+        de csv_ingest) se escribe directo, sin pasar por pandas ni guardarse en memoria.
+        """
+        directory = self._path(dataset_id)
+        os.makedirs(directory, exist_ok=True)
+        base_path = self._path(dataset_id, name)
+        tmp_path = f"{base_path}.{os.getpid()}.tmp"
+        if isinstance(df, pa.Table):
+            pq.write_table(df, tmp_path)
+            os.replace(tmp_path, base_path + '.parquet')
+            if os.path.exists(base_path + '.pkl'):
+                os.remove(base_path + '.pkl')
+            return
+        try:
+            df.to_parquet(tmp_path)
+            final_path = base_path + '.parquet'
+        except Exception as e:
+            print(f"Dataset store: '{name}' no se puede guardar en parquet ({e}); se usa pickle")
+            df.to_pickle(tmp_path)
+            final_path = base_path + '.pkl'
+        # Si antes estaba guardado en el otro formato, se borra para que get no lo lea
+        for path in (base_path + '.parquet', base_path + '.pkl'):
+            if path != final_path and os.path.exists(path):
+                os.remove(path)
+        os.replace(tmp_path, final_path)
+        self._remember((dataset_id, name), df, os.path.getmtime(final_path))
+
+    def put_many(self, frames, dataset_id=None):
+        """
+        Guarda varios DataFrames bajo un mismo dataset_id.
+
+        Parámetros:
+        frames (dict): nombre -> DataFrame (o pa.Table)
+        dataset_id (str): id a usar; si es None se genera uno nuevo
+
+        Retorna:
+        str: dataset_id, lo único que se manda al navegador
+        """
+        self.sweep()
+        dataset_id = dataset_id or self.new_id()
+        started = time.perf_counter()
+        for name, df in frames.items():
+            self.put(dataset_id, name, df)
+        os.utime(self._path(dataset_id))
+        print(f"Dataset store: {len(frames)} DataFrames guardados en {time.perf_counter() - started:.3f}s ({dataset_id})")
+        return dataset_id
+
+    def _file(self, dataset_id, name):
+        base_path = self._path(dataset_id, name)
+        for path in (base_path + '.parquet', base_path + '.pkl'):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get(self, dataset_id, name, default=None):
+        """
+        Retorna una copia del DataFrame guardado, o default si el dataset no existe, venció o el id no es
+        válido.
+        """
+        if not _is_valid_id(dataset_id):
+            return default
+        try:
+            directory = self._path(dataset_id)
+            expires_at = os.path.getmtime(directory) + self.ttl if self.ttl is not None else None
+            path = self._file(dataset_id, name)
+            mtime = os.path.getmtime(path) if path else None
+        except (OSError, ValueError):
+            return default
+        if path is None or (expires_at is not None and time.time() >= expires_at):
+            return default
+
+        # La copia en memoria sirve mientras el archivo no haya sido reescrito (por este u otro worker)
+        key = (dataset_id, name)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None and entry[1] == mtime:
+            return entry[0].copy()
+
+        df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_pickle(path)
+        self._remember(key, df, mtime)
+        return df.copy()
+
+    def sweep(self):
+        """Borra del disco los datasets vencidos."""
+        if self.ttl is None:
+            return
+        now = time.time()
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir() and entry.stat().st_mtime + self.ttl <= now:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
+        with self._lock:
+            for key in [key for key in self._memory if not os.path.isdir(self._path(key[0]))]:
+                del self._memory[key]
+
+
+dataset_store = DatasetStore()
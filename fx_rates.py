@@ -0,0 +1,120 @@
+"""
+Cotizaciones de monedas para pasar los ingresos de Stripe a USD.
+
+Se pide a exchangerate-api una sola tabla por día con todas las monedas (endpoint latest/USD) y se guarda
+en FX_RATES_DIR/<YYYY-MM-DD>.json. Cada mes se convierte con la última tabla guardada dentro de ese mes;
+los meses sin tabla guardada usan la de hoy (como hacía la conversión anterior, que siempre usaba la
+cotización del momento). Si la API no responde se usa la última tabla guardada.
+"""
+import glob
+import json
+import os
+import threading
+from datetime import date
+import pandas as pd
+from config import API_KEY, FX_RATES_DIR
+from http_client import http_client
+
+RATES_URL = "https://v6.exchangerate-api.com/v6/{api_key}/latest/USD"
+
+
+class FxRates:
+    def __init__(self, root=FX_RATES_DIR):
+        self.root = root
+        self._tables = {}  # 'YYYY-MM-DD' -> {moneda: unidades por USD}
+        self._lock = threading.Lock()
+
+    def _path(self, day):
+        return os.path.join(self.root, f"{day}.json")
+
+    def _stored_days(self):
+        return sorted(os.path.basename(path)[:-5] for path in glob.glob(os.path.join(self.root, '*.json')))
+
+    def _load(self, day):
+        if day not in self._tables:
+            with open(self._path(day)) as f:
+                self._tables[day] = json.load(f)
+        return self._tables[day]
+
+    def _fetch_today(self, today):
+        # Sin la última respuesta conocida: si falla se usa la última tabla guardada en disco
+        data = http_client.get_json(RATES_URL.format(api_key=API_KEY), stale_ok=False)
+        if data.get('result') != 'success':
+            raise ValueError(f"exchangerate-api respondió {data.get('error-type', data)}")
+        rates = {currency.upper(): rate for currency, rate in data['conversion_rates'].items()}
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._path(today)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(rates, f)
+        os.replace(tmp_path, self._path(today))
+        self._tables[today] = rates
+        return rates
+
+    def today_table(self):
+        """
+        Tabla de hoy (como mucho un pedido a la API por día y por máquina). Si falla el pedido se
+        usa la última tabla guardada.
+
+        Retorna:
+        tuple: (día de la tabla 'YYYY-MM-DD', {moneda: unidades por USD}), o (None, {}) si no hay ninguna
+        """
+        today = date.today().isoformat()
+        with self._lock:
+            if os.path.exists(self._path(today)):
+                return today, self._load(today)
+            try:
+                return today, self._fetch_today(today)
+            except Exception as e:
+                stored = self._stored_days()
+                if not stored:
+                    print(f"FX: sin cotizaciones ({e})")
+                    return None, {}
+                print(f"FX: no se pudo actualizar ({e}); se usa la tabla del {stored[-1]}")
+                return stored[-1], self._load(stored[-1])
+
+    def monthly_rates(self, months):
+        """
+        Parámetros:
+        months (iterable): meses (Timestamp/fecha) a convertir
+
+        Retorna:
+        pd.DataFrame: columnas month, currency y rate (unidades de la moneda por USD)
+        """
+        _, today_rates = self.today_table()
+        stored = self._stored_days()
+        rows = []
+        for month in pd.to_datetime(pd.Series(list(months))).dt.to_period('M').unique():
+            # Última tabla guardada dentro del mes, o la de hoy
+            days = [day for day in stored if day.startswith(str(month))]
+            with self._lock:
+                rates = self._load(days[-1]) if days else today_rates
+            month_start = month.to_timestamp()
+            rows.extend((month_start, currency, rate) for currency, rate in rates.items())
+        return pd.DataFrame(rows, columns=['month', 'currency', 'rate'])
+
+    def to_usd(self, amounts, currencies, months):
+        """
+        Convierte a USD columnas enteras con un join por moneda y mes.
+
+        Parámetros:
+        amounts (pd.Series): montos en su moneda
+        currencies (pd.Series): código de moneda de cada monto (mayúsculas o minúsculas)
+        months (pd.Series): fecha de cada monto (se usa su mes)
+
+        Retorna:
+        pd.Series: montos en USD (mismo índice). Los montos en monedas sin cotización quedan sin convertir.
+        """
+        frame = pd.DataFrame({
+            'amount': amounts.to_numpy(),
+            'currency': currencies.astype(str).str.upper().to_numpy(),
+            'month': pd.to_datetime(months).dt.to_period('M').dt.to_timestamp().to_numpy(),
+        })
+        frame = frame.merge(self.monthly_rates(frame['month'].unique()), on=['month', 'currency'], how='left')
+        frame.loc[frame['currency'] == 'USD', 'rate'] = 1.0
+        missing = frame['rate'].isna()
+        if missing.any():
+            print(f"FX: sin cotización para {sorted(frame.loc[missing, 'currency'].unique())}; quedan sin convertir")
+        return pd.Series((frame['amount'] / frame['rate'].fillna(1.0)).to_numpy(), index=amounts.index)
+
+
+fx_rates = FxRates()
@@ -1,3 +1,5 @@
+import functools
+import pandas as pd
 import phonenumbers
 from phonenumbers import geocoder
 import pycountry  
@@ -24,4 +26,94 @@ def getCountry(phone):
             country_name = country_name.split(',')[0]
         return country_name  # Retorna el nombre del país
     except Exception as e:
-        return "Invalid_number"  # Retorna "Invalid_number" si ocurre algún error
\ No newline at end of file
+        return "Invalid_number"  # Retorna "Invalid_number" si ocurre algún error
+
+# ---------------------------- Resolución vectorizada ----------------------------------------
+# Largos que acepta phonenumbers.parse para el número nacional (sin el código de país)
+_MIN_NATIONAL_LENGTH = 2
+_MAX_NATIONAL_LENGTH = 17
+_MAX_CALLING_CODE_LENGTH = 3
+
+
+def _region_name(region_code):
+    """Nombre del país para un código de región, con el mismo formato que getCountry."""
+    try:
+        country_name = pycountry.countries.get(alpha_2=region_code).name
+    except Exception:
+        return "Invalid_number"
+    return country_name.split(',')[0]
+
+
+def _build_calling_code_table():
+    """
+    Arma una vez la tabla de códigos de país a partir de la metadata de phonenumbers.
+
+    Retorna:
+    tuple: (names, multi_region)
+        names (dict): código de país (str) -> nombre del país principal
+        multi_region (set): códigos compartidos por varias regiones (ej. +1, +7, +44), donde el país
+                            depende del número nacional
+    """
+    names = {}
+    multi_region = set()
+    for calling_code, regions in phonenumbers.COUNTRY_CODE_TO_REGION_CODE.items():
+        # La primera región es la principal del código (ej. US para +1)
+        names[str(calling_code)] = _region_name(regions[0])
+        if len(regions) > 1:
+            multi_region.add(str(calling_code))
+    return names, multi_region
+
+
+_CALLING_CODE_NAMES, _MULTI_REGION_CODES = _build_calling_code_table()
+
+
+@functools.lru_cache(maxsize=200_000)
+def _cached_get_country(phone):
+    return getCountry(phone)
+
+
+def resolve_countries(phones, compat=True):
+    """
+    Versión vectorizada de getCountry para una serie de teléfonos. Cada valor distinto se resuelve
+    una sola vez y el código de país se busca por prefijo en una tabla armada desde phonenumbers.
+
+    Parámetros:
+    phones (pd.Series | list): teléfonos en formato E.164 ('+' y dígitos)
+    compat (bool): si es True el resultado es idéntico al de getCountry: los códigos compartidos por
+                   varios países (+1, +7, +44, ...) se resuelven con getCountry, número por número.
+                   Si es False se asigna el país principal del código, sin validar el número.
+
+    Retorna:
+    pd.Series: nombre del país de cada teléfono ("Invalid_number" si no se puede resolver),
+               con el mismo índice que phones
+    """
+    phones = pd.Series(phones, copy=False)
+    codes, uniques = pd.factorize(phones, use_na_sentinel=False)
+    uniques = pd.Series(uniques, dtype=object)
+
+    is_e164 = uniques.str.fullmatch(r'\+\d+', na=False)
+    digits = uniques.str[1:].where(is_e164, '')
+    lengths = digits.str.len()
+
+    # Los códigos de país no son prefijo uno de otro: a lo sumo un prefijo de 1 a 3 dígitos coincide
+    calling_code = pd.Series(None, index=uniques.index, dtype=object)
+    for prefix_length in range(1, _MAX_CALLING_CODE_LENGTH + 1):
+        prefix = digits.str[:prefix_length]
+        found = calling_code.isna() & prefix.isin(_CALLING_CODE_NAMES.keys())
+        calling_code[found] = prefix[found]
+
+    national_length = lengths - calling_code.str.len().fillna(0)
+    valid_length = national_length.between(_MIN_NATIONAL_LENGTH, _MAX_NATIONAL_LENGTH)
+    countries = calling_code.map(_CALLING_CODE_NAMES).where(valid_length, "Invalid_number")
+    countries = countries.fillna("Invalid_number")
+
+    # Lo que no es '+' y dígitos, los números nacionales demasiado largos (phonenumbers puede
+    # acortarlos al quitar el prefijo nacional) y en modo compat los códigos compartidos se
+    # resuelven con getCountry para respetar exactamente su resultado
+    fallback = ~is_e164 | (calling_code.notna() & (national_length > _MAX_NATIONAL_LENGTH))
+    if compat:
+        fallback |= calling_code.isin(_MULTI_REGION_CODES) & valid_length
+    if fallback.any():
+        countries[fallback] = [_cached_get_country(phone) for phone in uniques[fallback]]
+
+    return pd.Series(countries.to_numpy()[codes], index=phones.index, name='country')
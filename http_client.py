@@ -0,0 +1,200 @@
+"""
+Cliente HTTP compartido para las APIs externas (dolarapi, argentinadatos, exchangerate-api, Airtable y Stripe).
+
+- Una requests.Session por proceso y por servicio, con pool de conexiones persistentes.
+- Timeout por host (HOST_TIMEOUTS) cuando quien llama no pasa uno; ninguna llamada queda sin timeout.
+- Reintentos acotados de GET ante errores de conexión y respuestas 429/5xx (HTTP_MAX_RETRIES).
+- Circuit breaker por host: después de HTTP_BREAKER_FAILURES fallas seguidas el host queda abierto durante
+  HTTP_BREAKER_RESET_S segundos y las llamadas fallan enseguida (sin ocupar el worker); pasado ese tiempo
+  se deja pasar una llamada de prueba. get_json devuelve mientras tanto la última respuesta buena.
+- Latencia, llamadas y errores por host en stats().
+"""
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import HTTP_MAX_RETRIES, HTTP_POOL_SIZE, HTTP_BREAKER_FAILURES, HTTP_BREAKER_RESET_S
+
+# (timeout de conexión, timeout de lectura) en segundos por host
+HOST_TIMEOUTS = {
+    'dolarapi.com': (3, 5),
+    'api.argentinadatos.com': (3, 15),
+    'v6.exchangerate-api.com': (3, 10),
+    'api.airtable.com': (5, 30),
+    'api.stripe.com': (5, 30),
+}
+DEFAULT_TIMEOUT = (3, 10)
+
+# Cantidad de latencias recientes por host que se usan para los percentiles
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """El host falló varias veces seguidas y no se lo llama hasta que pase HTTP_BREAKER_RESET_S."""
+
+
+def _host(url):
+    return urlsplit(url).hostname or ''
+
+
+class _HostState:
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+
+class _InstrumentedSession(requests.Session):
+    """Session que aplica el timeout del host, el circuit breaker y mide cada llamada."""
+    def __init__(self, client):
+        super().__init__()
+        self._client = client
+
+    def request(self, method, url, **kwargs):
+        host = _host(url)
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+        self._client._before_call(host)
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            self._client._after_call(host, time.perf_counter() - started, failed=True)
+            raise
+        self._client._after_call(host, time.perf_counter() - started, failed=response.status_code >= 500)
+        return response
+
+
+class HttpClient:
+    def __init__(self, max_retries=HTTP_MAX_RETRIES, pool_size=HTTP_POOL_SIZE,
+                 breaker_failures=HTTP_BREAKER_FAILURES, breaker_reset_s=HTTP_BREAKER_RESET_S):
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_s = breaker_reset_s
+        self._sessions = {}
+        self._sessions_pid = None
+        self._hosts = {}
+        self._last_json = {}  # url -> última respuesta JSON buena
+        self._lock = threading.Lock()
+
+    # ------------------------------ sesiones -----------------------------------------------
+    def session(self, name='default'):
+        """
+        Session del proceso para un servicio. Cada servicio tiene la suya para que sus headers
+        (por ejemplo el token de Airtable) no viajen a otros hosts. Después de un fork se crean de nuevo.
+        """
+        with self._lock:
+            if self._sessions_pid != os.getpid():
+                self._sessions = {}
+                self._sessions_pid = os.getpid()
+            if name not in self._sessions:
+                self._sessions[name] = self._new_session()
+            return self._sessions[name]
+
+    def _new_session(self):
+        session = _InstrumentedSession(self)
+        retry = Retry(total=self.max_retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']), respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def timeout_for(self, url_or_host):
+        host = _host(url_or_host) if '://' in url_or_host else url_or_host
+        return HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+
+    # ------------------------------ circuit breaker ----------------------------------------
+    def _state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = _HostState()
+        return self._hosts[host]
+
+    def _before_call(self, host):
+        with self._lock:
+            state = self._state(host)
+            if state.opened_at is not None:
+                if time.monotonic() - state.opened_at < self.breaker_reset_s or state.trial_in_flight:
+                    state.rejected += 1
+                    raise CircuitOpenError(f"Circuito abierto para {host}")
+                # Medio abierto: pasa una sola llamada de prueba
+                state.trial_in_flight = True
+
+    def _after_call(self, host, elapsed, failed):
+        with self._lock:
+            state = self._state(host)
+            state.calls += 1
+            state.latencies.append(elapsed)
+            state.trial_in_flight = False
+            if failed:
+                state.errors += 1
+                state.failures += 1
+                if state.failures >= self.breaker_failures:
+                    if state.opened_at is None:
+                        print(f"HTTP: circuito abierto para {host} después de {state.failures} fallas")
+                    state.opened_at = time.monotonic()
+            else:
+                state.failures = 0
+                state.opened_at = None
+
+    # ------------------------------ API ----------------------------------------------------
+    def get(self, url, session='default', **kwargs):
+        return self.session(session).get(url, **kwargs)
+
+    def get_json(self, url, stale_ok=True, **kwargs):
+        """
+        GET que devuelve el JSON de la respuesta. Si el host falla (o tiene el circuito abierto) y hay
+        una respuesta buena anterior de la misma URL, devuelve esa.
+
+        Parámetros:
+        url (str): URL a consultar
+        stale_ok (bool): si se acepta la última respuesta conocida ante una falla
+
+        Retorna:
+        dict | list: JSON de la respuesta
+        """
+        try:
+            response = self.get(url, **kwargs)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            if stale_ok and url in self._last_json:
+                print(f"HTTP: {_host(url)} no respondió ({e}); se usa la última respuesta conocida")
+                return self._last_json[url]
+            raise
+        self._last_json[url] = data
+        return data
+
+    def stats(self):
+        """
+        Retorna:
+        dict: por host, llamadas, errores, rechazadas por el circuito, estado y latencias (ms)
+        """
+        with self._lock:
+            result = {}
+            for host, state in self._hosts.items():
+                latencies = sorted(state.latencies)
+                percentile = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1) if latencies else None
+                result[host] = {
+                    'calls': state.calls,
+                    'errors': state.errors,
+                    'rejected': state.rejected,
+                    'circuit': 'open' if state.opened_at is not None else 'closed',
+                    'p50_ms': percentile(0.5),
+                    'p95_ms': percentile(0.95),
+                    'max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+                }
+            return result
+
+
+http_client = HttpClient()
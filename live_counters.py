@@ -0,0 +1,281 @@
+"""
+Contadores en vivo del dashboard alimentados por change streams de la Mongo.
+
+Un solo proceso por máquina (el que obtiene el lock del archivo de estado) abre un change stream sobre
+subscriptions, mp-payments y tgo-subscriptions y aplica cada cambio a los contadores de las tarjetas de
+resumen (stripe-updates no se mira: ninguna tarjeta depende de sus eventos).
+Los contadores y el resume token se guardan juntos en LIVE_COUNTERS_STATE_PATH, así que después de un
+reinicio el watcher sigue desde el último evento aplicado. El resto de los workers lee ese archivo.
+
+En el primer arranque la línea base se calcula antes de abrir el stream, y el stream arranca desde el
+momento anterior a la línea base (startAtOperationTime). Los eventos de ese intervalo pueden estar o no
+en la línea base, así que en vez de sumarse recalculan el contador afectado.
+
+Las pruebas contra un replica set están en tests/test_live_counters.py.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pymongo.errors import OperationFailure, PyMongoError
+from config import (
+    MONGO_URI, #string de conexión a la Mongo (solo lectura)
+    MONGO_DB_USERS, # base de datos Users
+    MONGO_COLLECTION_SUBSCRIPTIONS, # colección subscriptions
+    MONGO_DB_TME_CHARTS, # base de datos TranscribeMe-charts
+    MONGO_COLLECTION_TGO_SUBS, # colección de tgo-subscriptions
+    MONGO_COLLECTION_MP_PAYMENTS, # colección mp-payments
+    LIVE_COUNTERS_ENABLED, # activa el watcher
+    LIVE_COUNTERS_STATE_PATH, # archivo con contadores y resume token
+    LIVE_COUNTERS_MAX_AGE_S, # antigüedad máxima del estado para considerarlo vivo
+    )
+from mongo_client import get_client
+from subs_metrics import MP_PLANES, SubscriptionMetrics
+
+SUBSCRIPTIONS_NS = (MONGO_DB_USERS, MONGO_COLLECTION_SUBSCRIPTIONS)
+MP_PAYMENTS_NS = (MONGO_DB_TME_CHARTS, MONGO_COLLECTION_MP_PAYMENTS)
+TGO_SUBS_NS = (MONGO_DB_TME_CHARTS, MONGO_COLLECTION_TGO_SUBS)
+WATCHED_NAMESPACES = [SUBSCRIPTIONS_NS, MP_PAYMENTS_NS, TGO_SUBS_NS]
+
+# Cada cuánto se persiste el estado aunque no lleguen eventos (latido del watcher)
+HEARTBEAT_S = 5
+# Campos de mp-payments que cambian el ingreso aprobado de un mes
+MP_INCOME_FIELDS = {'status', 'date_approved', 'transaction_amount'}
+
+
+def _month(value):
+    return value[:7] if isinstance(value, str) else None
+
+
+def _cluster_time(client):
+    """Momento (Timestamp del oplog) de la última operación que vio el servidor."""
+    return client.admin.command('hello')['operationTime']
+
+
+class LiveCounters:
+    """
+    Contadores mantenidos a partir de los eventos del change stream:
+        tme_active_stripe_subs, total_active_mp_subs, tgo_active_stripe_subs: suscripciones activas
+        mp_income_by_month: ingresos aprobados de MP por mes de date_approved
+    Los inserts se suman directamente; los cambios de status o bajas recalculan el conteo afectado
+    con una consulta indexada.
+    """
+    def __init__(self, state_path=LIVE_COUNTERS_STATE_PATH):
+        self.state_path = state_path
+        self.metrics = SubscriptionMetrics()
+        self.counters = None
+        self.resume_token = None
+        self._thread = None
+        self._pid = None
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._cached_state = None
+        self._cached_mtime = None
+
+    # ------------------------------ lectura ------------------------------------------------
+    def snapshot(self):
+        """
+        Retorna:
+        dict | None: contadores actuales, o None si el watcher no está activo o el estado es viejo
+        """
+        if not LIVE_COUNTERS_ENABLED:
+            return None
+        self.start()
+        state = self._read_state()
+        if not state or time.time() - state.get('heartbeat', 0) > LIVE_COUNTERS_MAX_AGE_S:
+            return None
+        return state['counters']
+
+    def _read_state(self):
+        try:
+            mtime = os.path.getmtime(self.state_path)
+        except OSError:
+            return None
+        if mtime != self._cached_mtime:
+            try:
+                with open(self.state_path) as f:
+                    self._cached_state = json.load(f)
+                self._cached_mtime = mtime
+            except (OSError, ValueError):
+                return self._cached_state
+        return self._cached_state
+
+    # ------------------------------ watcher ------------------------------------------------
+    def start(self):
+        """Arranca el watcher en un hilo de fondo si este proceso obtiene el lock del archivo de estado."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        try:
+            self._lock_file = open(self.state_path + '.lock', 'w')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # Otro proceso ya es el watcher; este solo lee el archivo de estado
+            return
+        self._thread = threading.Thread(target=self.run, name='live-counters', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Aplica los eventos del change stream hasta que se llame a stop(); reintenta ante errores."""
+        while not self._stop.is_set():
+            try:
+                self._watch()
+            except OperationFailure as e:
+                # 280/286: el resume token ya no está en el oplog; se descarta el estado y se recalcula la línea base
+                if e.code in (280, 286):
+                    print("Live counters: resume token vencido, se recalculan los contadores")
+                    self._discard_stored_state()
+                else:
+                    print(f"Live counters: error en el change stream: {e}")
+                    time.sleep(HEARTBEAT_S)
+            except PyMongoError as e:
+                print(f"Live counters: error en el change stream: {e}")
+                time.sleep(HEARTBEAT_S)
+
+    def _watch(self):
+        stored = self._load_stored_state()
+        pipeline = [{'$match': {
+            'ns': {'$in': [{'db': db, 'coll': coll} for db, coll in WATCHED_NAMESPACES]},
+            'operationType': {'$in': ['insert', 'update', 'replace', 'delete']},
+        }}]
+        client = get_client(MONGO_URI)
+        recount_until = None
+        if stored:
+            self.counters = stored['counters']
+            start = {'resume_after': stored['resume_token']}
+        else:
+            # Primer arranque: el stream empieza antes de la línea base y los eventos hasta el final de la
+            # línea base se aplican recalculando, así no se pierden ni se cuentan dos veces
+            started_at = _cluster_time(client)
+            self.counters = self._baseline()
+            recount_until = _cluster_time(client)
+            start = {'start_at_operation_time': started_at}
+        with client.watch(pipeline, full_document='updateLookup', max_await_time_ms=1000, **start) as stream:
+            last_saved = 0
+            while not self._stop.is_set() and stream.alive:
+                event = stream.try_next()
+                if event is not None:
+                    recount = recount_until is not None and event['clusterTime'] <= recount_until
+                    self._apply(event, recount=recount)
+                self.resume_token = stream.resume_token
+                if event is not None or time.time() - last_saved > HEARTBEAT_S:
+                    self._save_state()
+                    last_saved = time.time()
+
+    def _load_stored_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            return state if state.get('resume_token') else None
+        except (OSError, ValueError):
+            return None
+
+    def _discard_stored_state(self):
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+    def _save_state(self):
+        state = {
+            'resume_token': self.resume_token,
+            'counters': self.counters,
+            'heartbeat': time.time(),
+        }
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp_path, self.state_path)
+
+    # ------------------------------ contadores ---------------------------------------------
+    def _baseline(self):
+        counters = {
+            'mp_income_by_month': self._count_mp_income(),
+            'updated_at': datetime.utcnow().isoformat(),
+        }
+        counters.update(self._count_subscriptions())
+        counters.update(self._count_tgo_subscriptions())
+        return counters
+
+    def _count_mp_income(self):
+        """Ingresos aprobados de MP por mes desde el primer día del mes pasado (consulta indexada por status y date_approved)."""
+        first_day_last_month = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+        mp_income = self.metrics.mp_payments.aggregate([
+            {"$match": {"status": "approved", "date_approved": {"$gte": first_day_last_month.strftime("%Y-%m-%d")}}},
+            {"$group": {"_id": {"$substr": ["$date_approved", 0, 7]}, "total": {"$sum": "$transaction_amount"}}},
+        ])
+        return {doc['_id']: doc['total'] for doc in mp_income}
+
+    def _count_subscriptions(self):
+        # Se llama al método sin la caché para tener el valor actual
+        return SubscriptionMetrics.get_subscription_counts.__wrapped__(self.metrics)
+
+    def _count_tgo_subscriptions(self):
+        return {'tgo_active_stripe_subs': SubscriptionMetrics.get_tgo_active_stripe_subs.__wrapped__(self.metrics)}
+
+    def _apply(self, event, recount=False):
+        """
+        Aplica un evento a los contadores.
+
+        Parámetros:
+        event (dict): evento del change stream
+        recount (bool): el evento puede estar ya en la línea base; en vez de sumar se recalcula el contador
+        """
+        ns = (event['ns']['db'], event['ns']['coll'])
+        operation = event['operationType']
+        doc = event.get('fullDocument') or {}
+        updated_fields = (event.get('updateDescription') or {}).get('updatedFields', {})
+        counters = self.counters
+
+        if ns == SUBSCRIPTIONS_NS:
+            if operation == 'insert' and not recount:
+                if doc.get('status') == 'active':
+                    counters['tme_active_stripe_subs'] += 1
+                if doc.get('status') == 'authorized' and doc.get('reason') in MP_PLANES:
+                    counters['total_active_mp_subs'] += 1
+            elif operation != 'update' or 'status' in updated_fields or 'reason' in updated_fields:
+                counters.update(self._count_subscriptions())
+
+        elif ns == TGO_SUBS_NS:
+            if operation == 'insert' and not recount:
+                if doc.get('status') == 'active':
+                    counters['tgo_active_stripe_subs'] += 1
+            elif operation != 'update' or 'status' in updated_fields:
+                counters.update(self._count_tgo_subscriptions())
+
+        elif ns == MP_PAYMENTS_NS:
+            # Un pago nuevo aprobado se suma; los cambios de status, monto o fecha y las bajas recalculan
+            # los meses (un pago puede pasar de approved a refunded, o volver a marcarse approved)
+            if operation == 'insert' and not recount:
+                month = _month(doc.get('date_approved'))
+                if doc.get('status') == 'approved' and month:
+                    income = counters['mp_income_by_month']
+                    income[month] = income.get(month, 0) + (doc.get('transaction_amount') or 0)
+            elif operation != 'update' or MP_INCOME_FIELDS & set(updated_fields):
+                counters['mp_income_by_month'] = self._count_mp_income()
+
+        counters['updated_at'] = datetime.utcnow().isoformat()
+
+
+live_counters = LiveCounters()
+
+
+if __name__ == '__main__':
+    # Corre el watcher en primer plano e imprime los contadores con cada latido
+    if not LIVE_COUNTERS_ENABLED:
+        print("LIVE_COUNTERS_ENABLED no está activo; se corre igual en primer plano")
+    live_counters._pid = os.getpid()
+    watcher = threading.Thread(target=live_counters.run, daemon=True)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(HEARTBEAT_S)
+            print(json.dumps(live_counters.counters, indent=2, default=str))
+    except KeyboardInterrupt:
+        live_counters.stop()
@@ -0,0 +1,167 @@
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from config import METRICS_CACHE_MAX_BYTES
+
+
+def estimate_size(value):
+    """
+    Estima en bytes la memoria que ocupa un valor cacheado. Para DataFrames/Series usa
+    memory_usage(deep=True); para contenedores suma recursivamente sus elementos.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _copy_value(value):
+    """
+    Copia lo que devuelve la caché para que quien llama pueda modificarlo sin alterar la entrada
+    (por ejemplo, asign_countries agrega 'country' al DataFrame de suscripciones).
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _copy_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_value(v) for v in value)
+    return value
+
+
+class MetricsCache:
+    """
+    Caché LRU con TTL por entrada, acotada por el tamaño estimado en bytes de los valores.
+    Las claves son (nombre del método, argumentos).
+    """
+    def __init__(self, max_bytes=METRICS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {}
+
+    def _method_stats(self, method_name):
+        return self._stats.setdefault(method_name, {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0})
+
+    def get(self, key):
+        """Retorna (True, valor) si la clave está vigente, o (False, None)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            stats = self._method_stats(key[0])
+            if entry is None:
+                stats['misses'] += 1
+                return False, None
+            value, size, expires_at = entry
+            if expires_at <= now:
+                self._remove(key)
+                stats['expirations'] += 1
+                stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            stats['hits'] += 1
+            return True, value
+
+    def set(self, key, value, ttl):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Un valor más grande que toda la caché no se guarda
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self._method_stats(evicted_key[0])['evictions'] += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, method_name=None, *args, **kwargs):
+        """
+        Invalida entradas de la caché.
+
+        Parámetros:
+        method_name (str): método a invalidar; si es None se vacía toda la caché
+        args, kwargs: si se pasan, solo se invalida la entrada de esos argumentos
+
+        Retorna:
+        int: cantidad de entradas eliminadas
+        """
+        with self._lock:
+            if method_name is None:
+                keys = list(self._entries)
+            elif args or kwargs:
+                key = make_key(method_name, args, kwargs)
+                keys = [key] if key in self._entries else []
+            else:
+                keys = [key for key in self._entries if key[0] == method_name]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self):
+        """
+        Retorna:
+        dict: entradas, bytes usados, límite y aciertos/fallos por método
+        """
+        with self._lock:
+            per_method = {name: dict(values) for name, values in self._stats.items()}
+            hits = sum(values['hits'] for values in per_method.values())
+            misses = sum(values['misses'] for values in per_method.values())
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                'methods': per_method,
+            }
+
+
+def make_key(method_name, args, kwargs):
+    return (method_name, tuple(args), tuple(sorted(kwargs.items())))
+
+
+metrics_cache = MetricsCache()
+
+
+def cached(ttl):
+    """
+    Decorador para métodos de SubscriptionMetrics: memoiza el resultado por nombre del método
+    y argumentos (sin incluir self, todas las instancias leen los mismos datos) durante ttl segundos.
+
+    Parámetros:
+    ttl (int | float): segundos de vigencia de cada entrada
+    """
+    def decorator(method):
+        method_name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = make_key(method_name, args, kwargs)
+            found, value = metrics_cache.get(key)
+            if not found:
+                value = method(self, *args, **kwargs)
+                metrics_cache.set(key, value, ttl)
+            return _copy_value(value)
+
+        wrapper.invalidate = lambda *args, **kwargs: metrics_cache.invalidate(method_name, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from pymongo import MongoClient, monitoring
+from config import (
+    MONGO_URI, #string de conexión a la Mongo (solo lectura)
+    MONGO_MAX_POOL_SIZE, # conexiones máximas por pool
+    MONGO_MAX_IDLE_TIME_MS, # tiempo máximo que una conexión puede quedar ociosa
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, # tiempo máximo para encontrar un servidor disponible
+    )
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """
+    Mide cuánto espera cada operación para obtener una conexión del pool (checkout).
+    Los eventos de checkout se emiten en el mismo hilo que pidió la conexión, así que
+    el inicio de la espera se guarda por hilo.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.failures = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'failures': self.failures,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+    def _record(self, failed):
+        started = getattr(self._local, 'started', None)
+        if started is None:
+            return
+        self._local.started = None
+        wait = time.perf_counter() - started
+        with self._lock:
+            if failed:
+                self.failures += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._record(failed=False)
+
+    def connection_check_out_failed(self, event):
+        self._record(failed=True)
+
+    # Eventos del pool que no se usan para las métricas de espera
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_checked_in(self, event): pass
+
+
+pool_wait_listener = PoolWaitListener()
+
+# Registro de clientes por URI, válido solo para el proceso que lo creó
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """
+    Descarta los clientes heredados del proceso padre. PyMongo no es fork-safe: el hijo
+    debe abrir su propio pool en lugar de reutilizar los sockets del padre.
+    """
+    global _clients, _clients_pid, _clients_lock
+    _clients = {}
+    _clients_pid = os.getpid()
+    _clients_lock = threading.Lock()
+    pool_wait_listener.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(uri=MONGO_URI):
+    """
+    Devuelve el MongoClient compartido del proceso para la URI indicada, creándolo la primera vez que se pide.
+    Después de un fork (por ejemplo, los workers de gunicorn) se crea un cliente nuevo en el hijo.
+
+    Parámetros:
+    uri (str): string de conexión a la Mongo
+
+    Retorna:
+    MongoClient: cliente compartido por todos los usuarios de SubscriptionMetrics del proceso
+    """
+    global _clients_pid
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+    client = _clients.get(uri)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(
+                uri,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                event_listeners=[pool_wait_listener],
+                connect=False,
+            )
+            _clients[uri] = client
+    return client
+
+
+def get_pool_stats():
+    """
+    Retorna:
+    dict: checkouts, fallas y tiempos de espera (promedio y máximo, en ms) para obtener una conexión del pool
+    """
+    return pool_wait_listener.stats()
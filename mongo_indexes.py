@@ -0,0 +1,223 @@
+"""
+Índices que necesitan las consultas del dashboard y verificación de sus planes de ejecución.
+
+Uso:
+    python mongo_indexes.py create [--uri URI]       crea los índices declarados (réplica de analytics)
+    python mongo_indexes.py verify [--start --end]   corre explain() de cada consulta de SubscriptionMetrics
+                                                     contra MONGO_URI y falla si alguna hace COLLSCAN
+
+La verificación está pensada para un mongod local con los índices ya creados:
+    MONGO_URI=mongodb://localhost:27017 python mongo_indexes.py create
+    MONGO_URI=mongodb://localhost:27017 python mongo_indexes.py verify
+"""
+import argparse
+import sys
+from datetime import date
+from pymongo import ASCENDING, MongoClient, monitoring
+from config import (
+    MONGO_URI, #string de conexión a la Mongo
+    MONGO_DB_USERS, # base de datos Users
+    MONGO_COLLECTION_SUBSCRIPTIONS, # colección subscriptions
+    MONGO_COLLECTION_STRIPE_UPDATES, # colección stripe-updates
+    MONGO_DB_TME_CHARTS, # base de datos TranscribeMe-charts
+    MONGO_COLLECTION_TGO_SUBS, # colección de tgo-subscriptions
+    MONGO_COLLECTION_MP_PAYMENTS, # colección mp-payments
+    MONGO_COLLECTION_STRIPE_PAYMENTS, # colección stripe-payments
+    MONGO_DB_ANALYTICS, # base de datos de analytics
+    MONGO_COLLECTION_MONTHLY_ROLLUPS, # colección de rollups mensuales
+    MONGO_COLLECTION_STRIPE_UPDATES_NORMALIZED, # copia normalizada de stripe-updates
+    MONGO_COLLECTION_STRIPE_PAYMENTS_NORMALIZED, # copia normalizada de stripe-payments
+    MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED, # copia normalizada de mp-payments
+    )
+
+# Índices declarados por (base de datos, colección)
+INDEX_SPECS = {
+    (MONGO_DB_USERS, MONGO_COLLECTION_STRIPE_UPDATES): [
+        [("description", ASCENDING), ("timestamp", ASCENDING)],
+    ],
+    (MONGO_DB_USERS, MONGO_COLLECTION_SUBSCRIPTIONS): [
+        [("status", ASCENDING), ("reason", ASCENDING)],
+    ],
+    (MONGO_DB_TME_CHARTS, MONGO_COLLECTION_MP_PAYMENTS): [
+        [("date_created", ASCENDING)],
+        [("status", ASCENDING), ("date_approved", ASCENDING)],
+    ],
+    (MONGO_DB_TME_CHARTS, MONGO_COLLECTION_STRIPE_PAYMENTS): [
+        [("status", ASCENDING), ("created", ASCENDING), ("statement_descriptor", ASCENDING)],
+    ],
+    (MONGO_DB_TME_CHARTS, MONGO_COLLECTION_TGO_SUBS): [
+        [("created", ASCENDING)],
+        [("status", ASCENDING), ("ended_at", ASCENDING)],
+    ],
+    (MONGO_DB_ANALYTICS, MONGO_COLLECTION_MONTHLY_ROLLUPS): [
+        [("_id.source", ASCENDING), ("_id.month", ASCENDING)],
+    ],
+    (MONGO_DB_ANALYTICS, MONGO_COLLECTION_STRIPE_UPDATES_NORMALIZED): [
+        [("description", ASCENDING), ("timestamp", ASCENDING)],
+    ],
+    (MONGO_DB_ANALYTICS, MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED): [
+        [("date_created", ASCENDING)],
+        [("status", ASCENDING), ("date_approved", ASCENDING)],
+    ],
+    (MONGO_DB_ANALYTICS, MONGO_COLLECTION_STRIPE_PAYMENTS_NORMALIZED): [
+        [("status", ASCENDING), ("created", ASCENDING), ("statement_descriptor", ASCENDING)],
+    ],
+}
+
+# Métodos de SubscriptionMetrics a verificar: (nombre, recibe rango de fechas)
+QUERY_CHECKS = [
+    ("get_subs_data", False),
+    ("get_active_subs_data", False),
+    ("get_stripe_cancelation_data", True),
+    ("get_stripe_creation_data", True),
+    ("get_stripe_incomplete_data", True),
+    ("get_stripe_monthly_rollup", True),
+    ("get_tme_active_stripe_subs", False),
+    ("get_tgo_active_stripe_subs", False),
+    ("get_total_active_mp_subs", False),
+    ("get_subscription_counts", False),
+    ("get_last_month_mp_income", False),
+    ("get_last_month_stripe_income", False),
+    ("get_mp_planes", False),
+    ("get_mp_payments", True),
+    ("get_stripe_succeeded_subscription_payments", True),
+    ("get_stripe_succeeded_extra_credit_payments", True),
+    ("get_tgo_pivot", False),
+    ("get_monthly_stripe_payments", False),
+    ("get_tgo_onboardings_info", False),
+    ("get_mongo_recovery_data", False),
+]
+
+# Consultas que leen la colección completa a propósito (no tienen filtro que indexar)
+FULL_SCAN_ALLOWED = {
+    "get_monthly_stripe_payments",
+    "get_tgo_onboardings_info",
+    "get_mongo_recovery_data",
+}
+
+EXPLAINABLE_COMMANDS = {"aggregate", "find", "count", "distinct"}
+
+
+def create_indexes(uri=MONGO_URI):
+    """
+    Crea (si no existen) los índices declarados en INDEX_SPECS.
+
+    Parámetros:
+    uri (str): string de conexión a la réplica de analytics (necesita permisos de escritura)
+    """
+    client = MongoClient(uri)
+    try:
+        for (db_name, collection_name), indexes in INDEX_SPECS.items():
+            collection = client[db_name][collection_name]
+            for keys in indexes:
+                name = collection.create_index(keys)
+                print(f"{db_name}.{collection_name}: {name}")
+    finally:
+        client.close()
+
+
+class _CommandRecorder(monitoring.CommandListener):
+    """Guarda los comandos de lectura que envía el driver mientras corre cada método."""
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            self.commands.append((event.database_name, dict(event.command)))
+
+    def succeeded(self, event): pass
+    def failed(self, event): pass
+
+
+def _plan_stages(node):
+    """Recorre la salida de explain() y devuelve todas las etapas ('stage') del plan."""
+    stages = []
+    if isinstance(node, dict):
+        if isinstance(node.get("stage"), str):
+            stages.append(node["stage"])
+        for value in node.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(node, list):
+        for value in node:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+def _explain(client, database_name, command):
+    # Se quitan los campos de sesión y de lectura que agrega el driver
+    command = {k: v for k, v in command.items() if not k.startswith("$") and k not in ("lsid", "txnNumber")}
+    return client[database_name].command("explain", command, verbosity="queryPlanner")
+
+
+def verify_query_plans(start_date, end_date):
+    """
+    Corre cada método de QUERY_CHECKS, captura los comandos que envía a la Mongo y ejecuta explain()
+    de cada uno.
+
+    Parámetros:
+    start_date (str): inicio del rango de fechas para los métodos que lo reciben
+    end_date (str): fin del rango de fechas
+
+    Retorna:
+    list: nombres de los métodos con al menos un COLLSCAN no permitido
+    """
+    recorder = _CommandRecorder()
+    # El listener global se aplica a los clientes creados después de registrarlo
+    monitoring.register(recorder)
+    from mongo_client import get_client
+    from subs_metrics import SubscriptionMetrics
+
+    metrics = SubscriptionMetrics()
+    client = get_client(MONGO_URI)
+    failures = []
+    for method_name, uses_range in QUERY_CHECKS:
+        recorder.commands.clear()
+        args = (start_date, end_date) if uses_range else ()
+        try:
+            getattr(metrics, method_name)(*args)
+        except Exception as e:
+            # Sin datos algunos métodos fallan al armar el DataFrame; la consulta ya quedó capturada
+            print(f"  ({method_name} lanzó {type(e).__name__}: {e})")
+
+        commands = list(recorder.commands)
+        for database_name, command in commands:
+            stages = _plan_stages(_explain(client, database_name, command))
+            collection = command.get(next(iter(command)))
+            collscan = "COLLSCAN" in stages
+            if collscan and method_name in FULL_SCAN_ALLOWED:
+                status = "COLLSCAN (permitido)"
+            elif collscan:
+                status = "COLLSCAN"
+                failures.append(method_name)
+            else:
+                status = "OK"
+            print(f"{method_name:45} {database_name}.{collection}: {status} {sorted(set(stages))}")
+        if not commands:
+            print(f"{method_name:45} sin consultas capturadas")
+    return sorted(set(failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índices y planes de consulta del dashboard")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    create_parser = subparsers.add_parser("create", help="crea los índices declarados")
+    create_parser.add_argument("--uri", default=MONGO_URI)
+    verify_parser = subparsers.add_parser("verify", help="falla si alguna consulta hace COLLSCAN")
+    verify_parser.add_argument("--start", default="2025-01-01")
+    verify_parser.add_argument("--end", default=date.today().strftime("%Y-%m-%d"))
+    args = parser.parse_args()
+
+    if args.command == "create":
+        create_indexes(args.uri)
+        return 0
+
+    failures = verify_query_plans(args.start, args.end)
+    if failures:
+        print(f"Consultas con COLLSCAN: {', '.join(failures)}")
+        return 1
+    print("Todas las consultas usan índices")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
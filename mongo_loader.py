@@ -0,0 +1,137 @@
+"""
+Carga de DataFrames tipados directamente desde los lotes de un cursor de la Mongo.
+
+En lugar de list(cursor) + pd.DataFrame(docs), los documentos se leen de a batch_size y cada lote se
+convierte enseguida a columnas tipadas según el schema declarado de la consulta. Así nunca conviven la
+lista completa de dicts y el DataFrame, y las fechas se parsean una sola vez, lote por lote.
+
+Tipos del schema:
+    'float'     float64 (None -> NaN)
+    'int'       Int64 nullable
+    'bool'      boolean nullable
+    'string'    object (str o None)
+    'category'  category (se codifica por lote con diccionarios de Arrow, sin materializar los strings;
+                los valores que no son str se guardan como str)
+    'datetime'  datetime64; acepta cualquier forma ISO 8601 mezclada en el lote (solo fecha, con o sin
+                fracción de segundo u offset) y lo que no se puede parsear queda NaT. Si el primer valor
+                del primer lote con fecha trae offset, la columna queda tz-aware en ese offset
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from config import MONGO_LOADER_BATCH_SIZE
+
+SCHEMA_KINDS = ('float', 'int', 'bool', 'string', 'category', 'datetime')
+
+
+def _first_tz(values):
+    """Zona del primer valor del lote que se puede parsear, o None (sin offset o sin valores)."""
+    for value in values:
+        if value is None:
+            continue
+        try:
+            stamp = pd.Timestamp(value)
+        except (ValueError, TypeError):
+            continue
+        if stamp is not pd.NaT:
+            return stamp.tz
+    return None
+
+
+def _parse_dates(values):
+    """Parsea un lote de fechas. Retorna (datetime64[ns] en UTC si tenían zona, zona o None)."""
+    raw = pd.Series(values, dtype=object)
+    # Los valores sin offset se toman como UTC (las fechas de BSON ya lo son)
+    parsed = pd.to_datetime(raw, utc=True, format='ISO8601', errors='coerce')
+    return parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]'), _first_tz(values)
+
+
+class _Column:
+    def __init__(self, kind):
+        if kind not in SCHEMA_KINDS:
+            raise ValueError(f"Tipo de columna desconocido: {kind!r}")
+        self.kind = kind
+        self.chunks = []
+        self.tz = None
+
+    def add(self, values):
+        kind = self.kind
+        if kind == 'float':
+            self.chunks.append(np.array([np.nan if v is None else v for v in values], dtype='float64'))
+        elif kind == 'int':
+            self.chunks.append(pd.array(values, dtype='Int64'))
+        elif kind == 'bool':
+            self.chunks.append(pd.array(values, dtype='boolean'))
+        elif kind == 'string':
+            self.chunks.append(np.array(values, dtype=object))
+        elif kind == 'category':
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+            self.chunks.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            parsed, tz = _parse_dates(values)
+            if tz is not None and self.tz is None:
+                self.tz = tz
+            self.chunks.append(parsed)
+
+    def build(self):
+        kind, chunks = self.kind, self.chunks
+        self.chunks = []
+        if kind == 'category':
+            if not chunks:
+                return pd.Categorical([])
+            return pa.chunked_array(chunks).unify_dictionaries().to_pandas()
+        if kind in ('int', 'bool'):
+            return pd.array([], dtype='Int64' if kind == 'int' else 'boolean') if not chunks else pd.concat(
+                [pd.Series(chunk) for chunk in chunks], ignore_index=True).array
+        empty = {'float': 'float64', 'string': object, 'datetime': 'datetime64[ns]'}[kind]
+        values = np.concatenate(chunks) if chunks else np.array([], dtype=empty)
+        if kind == 'datetime' and self.tz is not None:
+            return pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(self.tz)
+        return values
+
+
+def iter_batches(cursor, batch_size):
+    """Agrupa los documentos del cursor en listas de batch_size."""
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def frame_from_cursor(cursor, schema, batch_size=MONGO_LOADER_BATCH_SIZE):
+    """
+    Parámetros:
+    cursor (iterable): cursor de find()/aggregate() (o cualquier iterable de dicts)
+    schema (dict): columna -> tipo (ver SCHEMA_KINDS); las columnas que no están en el schema se ignoran
+    batch_size (int): documentos que se convierten juntos
+
+    Retorna:
+    pd.DataFrame: una columna por entrada del schema, en ese orden (con las columnas tipadas aunque el
+        cursor no traiga documentos)
+    """
+    columns = {name: _Column(kind) for name, kind in schema.items()}
+    for batch in iter_batches(cursor, batch_size):
+        for name, column in columns.items():
+            column.add([doc.get(name) for doc in batch])
+    return pd.DataFrame({name: column.build() for name, column in columns.items()})
+
+
+def aggregate_frame(collection, pipeline, schema, batch_size=MONGO_LOADER_BATCH_SIZE):
+    """
+    Corre un aggregate pidiendo lotes de batch_size a la Mongo y arma el DataFrame tipado.
+
+    Parámetros:
+    collection (Collection): colección de pymongo
+    pipeline (list): pipeline de agregación
+    schema (dict): columna -> tipo
+    batch_size (int): documentos por lote (del servidor y de la conversión)
+    """
+    cursor = collection.aggregate(pipeline, batchSize=batch_size)
+    try:
+        return frame_from_cursor(cursor, schema, batch_size)
+    finally:
+        cursor.close()
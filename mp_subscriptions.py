@@ -0,0 +1,129 @@
+"""
+Creaciones y cancelaciones mensuales de las suscripciones de Mercado Pago a partir del CSV exportado.
+
+Cada pestaña que muestra MP vuelve a pedir la serie mensual con el mismo CSV, así que el resultado se
+guarda por proceso junto con el hash de cada fila. Si el CSV es el mismo se devuelve la serie guardada;
+si es un CSV anterior con filas nuevas agregadas al final (una exportación nueva sumada a la anterior),
+solo se procesan las filas nuevas y sus conteos se suman a los guardados.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Columnas del CSV que usa el cálculo (el hash de cada fila se calcula sobre ellas)
+MP_SUBSCRIPTION_COLUMNS = ['status', 'start_date', 'last_charge_date', 'billing_day']
+# Día del mes en que vence el período de una suscripción cancelada
+EXPIRATION_DAY = 26
+# CSVs distintos guardados por proceso
+MAX_ENTRIES = 8
+
+
+def _parse_dates(values):
+    """Parsea fechas del CSV y deja la hora local sin zona (como se ve en la exportación)."""
+    parsed = pd.to_datetime(values)
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed
+
+
+def cancelation_months(last_charge_date):
+    """
+    Mes en que vence cada suscripción cancelada: el del próximo día 26 desde el último cobro (el mismo
+    mes si el cobro fue antes del 26, el siguiente si fue el 26 o después). Se calcula con aritmética
+    de arrays datetime64, sin recorrer las filas.
+
+    Parámetros:
+    last_charge_date (pd.Series): fechas del último cobro (datetime)
+
+    Retorna:
+    pd.Series: primer día del mes de vencimiento (NaT si no hay último cobro)
+    """
+    months = last_charge_date.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+    after_expiration = (last_charge_date.dt.day >= EXPIRATION_DAY).to_numpy()
+    months = months + after_expiration.astype('timedelta64[M]')
+    return pd.Series(months.astype('datetime64[ns]'), index=last_charge_date.index)
+
+
+def expiration_dates(last_charge_date):
+    """Fecha de vencimiento (próximo día 26) de cada suscripción cancelada."""
+    return cancelation_months(last_charge_date) + pd.Timedelta(days=EXPIRATION_DAY - 1)
+
+
+def _monthly_counts(df):
+    """Conteos por mes de creaciones (start_date) y cancelaciones (vencimiento de las canceladas)."""
+    start_month = _parse_dates(df['start_date']).dt.to_period('M').dt.to_timestamp()
+    creations = start_month.value_counts()
+    cancelled = df.loc[df['status'] == 'cancelled', 'last_charge_date']
+    cancelations = cancelation_months(_parse_dates(cancelled)).value_counts()
+    return creations, cancelations
+
+
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class MpSubscriptionsMonthly:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> (hashes de las filas, creaciones, cancelaciones)
+        self._lock = threading.Lock()
+
+    def _find(self, digest, hashes):
+        """Retorna la entrada del mismo CSV o la del CSV más largo que es prefijo de este, o None."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                return entry
+            best = None
+            for entry in self._entries.values():
+                cached_hashes = entry[0]
+                if (len(cached_hashes) < len(hashes) and np.array_equal(hashes[:len(cached_hashes)], cached_hashes)
+                        and (best is None or len(cached_hashes) > len(best[0]))):
+                    best = entry
+            return best
+
+    def _store(self, digest, entry):
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def monthly(self, data):
+        """
+        Creaciones y cancelaciones por mes del CSV de suscripciones de MP.
+
+        Parámetros:
+        data (list | pd.DataFrame): filas del CSV (records del dcc.Store o DataFrame)
+
+        Retorna:
+        pd.DataFrame: columnas month, creations_count, cancelations_count (meses con creaciones)
+        """
+        if isinstance(data, pd.DataFrame):
+            df = data[MP_SUBSCRIPTION_COLUMNS]
+        else:
+            df = pd.DataFrame.from_records(data, columns=MP_SUBSCRIPTION_COLUMNS)
+
+        hashes = _row_hashes(df)
+        digest = hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+        entry = self._find(digest, hashes)
+        if entry is not None and len(entry[0]) == len(hashes):
+            _, creations, cancelations = entry
+        else:
+            processed = 0 if entry is None else len(entry[0])
+            creations, cancelations = _monthly_counts(df.iloc[processed:])
+            if entry is not None:
+                # CSV anterior + filas nuevas: se suman los conteos de las filas nuevas
+                creations = entry[1].add(creations, fill_value=0).astype('int64')
+                cancelations = entry[2].add(cancelations, fill_value=0).astype('int64')
+            self._store(digest, (hashes, creations, cancelations))
+
+        creations_df = creations.rename_axis('month').reset_index(name='creations_count').sort_values('month')
+        cancelations_df = cancelations.rename_axis('month').reset_index(name='cancelations_count').sort_values('month')
+        return pd.merge(creations_df, cancelations_df, on='month', how='left').fillna(0)
+
+
+mp_subscriptions = MpSubscriptionsMonthly()
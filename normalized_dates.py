@@ -0,0 +1,301 @@
+"""
+ETL de fechas normalizadas: copia stripe-updates, stripe-payments y mp-payments a la base de analytics
+con los campos de fecha (strings ISO con offsets distintos) convertidos a fechas BSON.
+
+Uso:
+    python normalized_dates.py                                  copia los documentos nuevos de todas las fuentes
+    python normalized_dates.py --backfill-from 2025-01-01       vuelve a copiar los documentos desde esa fecha
+    python normalized_dates.py --source mp-payments             limita el job a una fuente
+    python normalized_dates.py --every 900                      repite el job cada 900 segundos
+
+La conversión la hace la Mongo con $dateFromString: los strings con offset ('Z', '-04:00') se respetan y
+los que no tienen zona se interpretan en BUSINESS_TIMEZONE. Las copias guardan solo los campos que lee
+el dashboard y mantienen el _id de la fuente, así que volver a copiar un documento lo reemplaza.
+El high-water mark de cada fuente (último _id copiado) se guarda en normalized-dates-state.
+
+mp-payments y stripe-payments cambian en el lugar (un pago de MP pasa a approved y recién ahí tiene
+date_approved, un payment intent pasa a succeeded), y el high-water mark por _id no ve esos cambios. Por
+eso cada corrida incremental vuelve a copiar además los documentos de esas fuentes creados (date_created,
+created) desde el primer mes que recalcula rollups.py: los últimos ROLLUP_MUTABLE_MONTHS meses y el
+anterior. En cada vuelta este job tiene que correr antes que el de rollups.
+
+Las funciones day_range, month_range, truncate y to_business_time arman los filtros, agrupaciones y
+conversiones que usa SubscriptionMetrics sobre las copias cuando USE_NORMALIZED_DATES está activo.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from pymongo import ReplaceOne
+from config import (
+    MONGO_URI, #string de conexión a la Mongo (solo lectura)
+    MONGO_ANALYTICS_URI, # string de conexión a la base de analytics
+    MONGO_DB_USERS, # base de datos Users
+    MONGO_COLLECTION_STRIPE_UPDATES, # colección stripe-updates
+    MONGO_DB_TME_CHARTS, # base de datos TranscribeMe-charts
+    MONGO_COLLECTION_MP_PAYMENTS, # colección mp-payments
+    MONGO_COLLECTION_STRIPE_PAYMENTS, # colección stripe-payments
+    MONGO_DB_ANALYTICS, # base de datos de analytics
+    MONGO_COLLECTION_STRIPE_UPDATES_NORMALIZED, # copia normalizada de stripe-updates
+    MONGO_COLLECTION_STRIPE_PAYMENTS_NORMALIZED, # copia normalizada de stripe-payments
+    MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED, # copia normalizada de mp-payments
+    MONGO_COLLECTION_NORMALIZED_STATE, # colección con el high-water mark de cada copia
+    BUSINESS_TIMEZONE, # zona horaria del negocio
+    ROLLUP_MUTABLE_MONTHS, # meses en que los pagos todavía cambian en el lugar
+    )
+from mongo_client import get_client
+
+# Documentos por bulk_write al escribir las copias
+WRITE_BATCH_SIZE = 1000
+
+# Fuentes de las copias: colección, copia, campos de fecha a convertir, resto de los campos que se copian y,
+# en las que cambian en el lugar, el campo de fecha de creación con que se eligen los documentos a volver a copiar
+NORMALIZED_SOURCES = {
+    MONGO_COLLECTION_STRIPE_UPDATES: {
+        "db": MONGO_DB_USERS,
+        "collection": MONGO_COLLECTION_STRIPE_UPDATES,
+        "target": MONGO_COLLECTION_STRIPE_UPDATES_NORMALIZED,
+        "date_fields": ["timestamp"],
+        "fields": ["description", "user_id", "source"],
+        "mutable_field": None,
+    },
+    MONGO_COLLECTION_STRIPE_PAYMENTS: {
+        "db": MONGO_DB_TME_CHARTS,
+        "collection": MONGO_COLLECTION_STRIPE_PAYMENTS,
+        "target": MONGO_COLLECTION_STRIPE_PAYMENTS_NORMALIZED,
+        "date_fields": ["created"],
+        "fields": ["status", "statement_descriptor", "amount", "currency"],
+        "mutable_field": "created",
+    },
+    MONGO_COLLECTION_MP_PAYMENTS: {
+        "db": MONGO_DB_TME_CHARTS,
+        "collection": MONGO_COLLECTION_MP_PAYMENTS,
+        "target": MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED,
+        "date_fields": ["date_created", "date_approved"],
+        "fields": ["description", "operation_type", "status", "transaction_amount"],
+        "mutable_field": "date_created",
+    },
+}
+
+
+# ------------------------------ helpers de consulta ------------------------------------------
+def _business_tz():
+    return ZoneInfo(BUSINESS_TIMEZONE)
+
+
+def _to_utc(local_midnight):
+    """Medianoche local (datetime naive en BUSINESS_TIMEZONE) -> datetime naive en UTC, como lo guarda la Mongo."""
+    return local_midnight.replace(tzinfo=_business_tz()).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def local_range(start, end):
+    """
+    Condición de rango [start, end) para un campo de fecha BSON.
+
+    Parámetros:
+    start (datetime): inicio, como hora local de BUSINESS_TIMEZONE
+    end (datetime): fin (excluido), como hora local de BUSINESS_TIMEZONE
+    """
+    return {"$gte": _to_utc(start), "$lt": _to_utc(end)}
+
+
+def day_range(start_date, end_date):
+    """Condición para los días start_date..end_date ('YYYY-MM-DD', ambos incluidos) en BUSINESS_TIMEZONE."""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    return local_range(start, end)
+
+
+def month_range(month):
+    """Condición para el mes 'YYYY-MM' en BUSINESS_TIMEZONE."""
+    start = datetime.strptime(month, '%Y-%m')
+    end = (start + timedelta(days=32)).replace(day=1)
+    return local_range(start, end)
+
+
+def truncate(field, unit):
+    """Expresión $dateTrunc del campo al día/mes ('day', 'month') de BUSINESS_TIMEZONE."""
+    return {"$dateTrunc": {"date": "$" + field, "unit": unit, "timezone": BUSINESS_TIMEZONE}}
+
+
+def month_key(date_expression):
+    """Expresión que formatea una fecha como 'YYYY-MM' del mes en BUSINESS_TIMEZONE."""
+    return {"$dateToString": {"format": "%Y-%m", "date": date_expression, "timezone": BUSINESS_TIMEZONE}}
+
+
+def to_business_time(df, columns):
+    """
+    Pasa las columnas de fecha que trae la Mongo (datetime64 naive en UTC) a la hora local de
+    BUSINESS_TIMEZONE, sin zona, para que los meses que calcula pandas coincidan con los de la Mongo.
+    Modifica df en el lugar y lo retorna.
+    """
+    for column in columns:
+        if column in df.columns and BUSINESS_TIMEZONE != 'UTC':
+            df[column] = df[column].dt.tz_localize('UTC').dt.tz_convert(BUSINESS_TIMEZONE).dt.tz_localize(None)
+    return df
+
+
+# ------------------------------ ETL ----------------------------------------------------------
+def _to_date(field):
+    """Expresión que convierte el campo a fecha BSON: los strings con $dateFromString, las fechas quedan igual."""
+    value = "$" + field
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": [{"$type": value}, "date"]}, "then": value},
+                {"case": {"$eq": [{"$type": value}, "string"]}, "then": {"$dateFromString": {
+                    "dateString": value, "timezone": BUSINESS_TIMEZONE, "onError": None,
+                }}},
+            ],
+            "default": None,
+        }
+    }
+
+
+def _copy_pipeline(spec, match):
+    project = {field: 1 for field in spec["fields"]}
+    project.update({field: _to_date(field) for field in spec["date_fields"]})
+    return [{"$match": match}, {"$project": project}]
+
+
+def _target(spec):
+    return get_client(MONGO_ANALYTICS_URI)[MONGO_DB_ANALYTICS][spec["target"]]
+
+
+def _state():
+    return get_client(MONGO_ANALYTICS_URI)[MONGO_DB_ANALYTICS][MONGO_COLLECTION_NORMALIZED_STATE]
+
+
+def _source_collection(spec):
+    return get_client(MONGO_URI)[spec["db"]][spec["collection"]]
+
+
+def _latest_id(spec):
+    doc = _source_collection(spec).find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return doc["_id"] if doc else None
+
+
+def _save_state(source, last_id):
+    _state().update_one(
+        {"_id": source},
+        {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def _copy(spec, match):
+    """Copia a la colección normalizada los documentos de la fuente que cumplen match. Retorna la cantidad."""
+    target = _target(spec)
+    cursor = _source_collection(spec).aggregate(_copy_pipeline(spec, match), allowDiskUse=True,
+                                                batchSize=WRITE_BATCH_SIZE)
+    copied = 0
+    operations = []
+    for doc in cursor:
+        operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        if len(operations) >= WRITE_BATCH_SIZE:
+            target.bulk_write(operations, ordered=False)
+            copied += len(operations)
+            operations = []
+    if operations:
+        target.bulk_write(operations, ordered=False)
+        copied += len(operations)
+    return copied
+
+
+def _mutable_window_start():
+    """Primer mes 'YYYY-MM' de la ventana que recalcula rollups.py (los últimos ROLLUP_MUTABLE_MONTHS y el anterior)."""
+    now = datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - ROLLUP_MUTABLE_MONTHS
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def run_incremental(source):
+    """
+    Copia los documentos de la fuente con _id mayor al high-water mark y, si la fuente cambia en el lugar,
+    vuelve a copiar los creados desde _mutable_window_start().
+
+    Parámetros:
+    source (str): nombre de la fuente en NORMALIZED_SOURCES
+
+    Retorna:
+    int: cantidad de documentos copiados
+    """
+    spec = NORMALIZED_SOURCES[source]
+    state = _state().find_one({"_id": source}) or {}
+    last_id = state.get("last_id")
+    upper_id = _latest_id(spec)
+    if upper_id is None:
+        return 0
+
+    copied = 0
+    if upper_id != last_id:
+        id_range = {"$lte": upper_id}
+        if last_id is not None:
+            id_range["$gt"] = last_id
+        copied = _copy(spec, {"_id": id_range})
+        _save_state(source, upper_id)
+    if spec["mutable_field"] and last_id is not None:
+        # La fuente todavía tiene las fechas como strings ISO: 'YYYY-MM' compara bien contra su prefijo
+        copied += _copy(spec, {"_id": {"$lte": last_id},
+                               spec["mutable_field"]: {"$gte": _mutable_window_start()}})
+    return copied
+
+
+def run_backfill(source, since):
+    """
+    Vuelve a copiar los documentos de la fuente con alguna fecha desde 'since', hasta el high-water mark
+    actual. Trae los eventos corregidos y los cambios en el lugar anteriores a la ventana de run_incremental.
+
+    Parámetros:
+    source (str): nombre de la fuente en NORMALIZED_SOURCES
+    since (str): fecha 'YYYY-MM-DD'
+
+    Retorna:
+    int: cantidad de documentos copiados
+    """
+    spec = NORMALIZED_SOURCES[source]
+    state = _state().find_one({"_id": source}) or {}
+    upper_id = state.get("last_id") or _latest_id(spec)
+    if upper_id is None:
+        return 0
+
+    # La fuente todavía tiene las fechas como strings ISO: 'YYYY-MM-DD' compara bien contra su prefijo
+    since_match = [{field: {"$gte": since}} for field in spec["date_fields"]]
+    match = {"_id": {"$lte": upper_id}, **(since_match[0] if len(since_match) == 1 else {"$or": since_match})}
+    copied = _copy(spec, match)
+    if not state.get("last_id"):
+        _save_state(source, upper_id)
+    return copied
+
+
+def run(sources=None, backfill_from=None):
+    for source in sources or NORMALIZED_SOURCES:
+        started = time.perf_counter()
+        if backfill_from:
+            copied = run_backfill(source, backfill_from)
+        else:
+            copied = run_incremental(source)
+        print(f"Fechas normalizadas {source}: {copied} documentos en {time.perf_counter() - started:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copias con fechas normalizadas para analytics")
+    parser.add_argument("--source", action="append", choices=list(NORMALIZED_SOURCES),
+                        help="fuente a procesar (se puede repetir); por defecto todas")
+    parser.add_argument("--backfill-from", help="vuelve a copiar los documentos desde esta fecha (YYYY-MM-DD)")
+    parser.add_argument("--every", type=int, help="repite el job cada N segundos")
+    args = parser.parse_args()
+
+    backfill_from = args.backfill_from
+    while True:
+        run(args.source, backfill_from)
+        if not args.every:
+            return 0
+        # El backfill se hace una sola vez; las siguientes vueltas son incrementales
+        backfill_from = None
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from config import MONGO_LOAD_WORKERS
+
+# Pool compartido y acotado: varias cargas simultáneas no multiplican los hilos ni las conexiones
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=MONGO_LOAD_WORKERS, thread_name_prefix='mongo-load')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def run_parallel(tasks):
+    """
+    Corre en paralelo consultas independientes y junta sus resultados. Un error en una consulta
+    no afecta a las demás.
+
+    Parámetros:
+    tasks (dict): nombre -> función sin argumentos
+
+    Retorna:
+    tuple: (results, errors, timings)
+        results (dict): nombre -> resultado de las consultas que terminaron bien
+        errors (dict): nombre -> excepción de las consultas que fallaron
+        timings (dict): nombre -> segundos que tardó cada consulta
+    """
+    def timed(name, task):
+        started = time.perf_counter()
+        try:
+            return task(), None, time.perf_counter() - started
+        except Exception as e:
+            print(f"Error en la consulta '{name}': {e}")
+            traceback.print_exc()
+            return None, e, time.perf_counter() - started
+
+    executor = _get_executor()
+    started = time.perf_counter()
+    futures = {name: executor.submit(timed, name, task) for name, task in tasks.items()}
+
+    results, errors, timings = {}, {}, {}
+    for name, future in futures.items():
+        result, error, elapsed = future.result()
+        timings[name] = round(elapsed, 3)
+        if error is None:
+            results[name] = result
+        else:
+            errors[name] = error
+
+    total = time.perf_counter() - started
+    print(f"Consultas en paralelo: {total:.3f}s en total (suma secuencial {sum(timings.values()):.3f}s) {timings}")
+    return results, errors, timings
@@ -0,0 +1,402 @@
+"""
+Job de rollups mensuales: escribe conteos y sumas por mes, provider y status en la base de analytics,
+procesando solo los documentos nuevos de cada colección fuente.
+
+Uso:
+    python rollups.py                                  procesa los documentos nuevos de todas las fuentes
+    python rollups.py --backfill-from 2025-01-01       recalcula los meses desde esa fecha (eventos tardíos)
+    python rollups.py --source stripe-updates          limita el job a una fuente
+    python rollups.py --every 900                      repite el job cada 900 segundos
+
+Cada documento de rollup tiene como _id {source, provider, month, status, ...claves extra} y los campos
+count y amount. Una fuente puede aportar más de un evento por documento (una suscripción de TGO cuenta
+su creación por mes de created y su cancelación por mes de ended_at). El high-water mark de cada fuente
+(último _id procesado y último mes con eventos procesados, 'YYYY-MM' del mismo campo de fecha que los
+rollups) se guarda en rollup-state, junto con complete_before: los meses anteriores están completos en
+los rollups hasta last_id y el dashboard los lee de ahí.
+
+Cada corrida no suma los documentos nuevos a los rollups: recalcula con $set los meses en los que cayó
+alguno (todos los documentos de esos meses hasta el high-water mark nuevo). Así un evento tardío
+corrige su mes y, si el job se corta antes de guardar el high-water mark, la corrida siguiente vuelve
+a escribir los mismos valores en vez de contar dos veces.
+
+stripe-payments, mp-payments y tgo-subscriptions cambian en el lugar (un payment intent pasa a
+succeeded, un pago de MP a approved y recién ahí tiene date_approved, una suscripción de TGO se cancela
+y toma ended_at), y un high-water mark por _id no ve esos cambios. Para esas fuentes cada corrida
+recalcula además los últimos ROLLUP_MUTABLE_MONTHS meses y el anterior, y complete_before no pasa del
+primero de esos meses: el dashboard lee de las colecciones los meses que todavía pueden cambiar. Esto
+supone que un documento solo cambia dentro de esa ventana y que el job corre al menos una vez por mes
+(el mes que sale de la ventana se recalcula una última vez ya estable).
+
+--backfill-from arma los rollups en una colección temporal y la renombra sobre la de rollups, así el
+dashboard nunca lee los meses borrados a medio recalcular. No hay que correrlo a la vez que el job
+incremental (lo que este escriba en el medio se pierde con el renombre).
+
+Con USE_NORMALIZED_DATES los rollups de las fuentes que tienen copia en normalized_dates.py se calculan
+sobre esa copia y el mes sale de $dateTrunc en BUSINESS_TIMEZONE; al activarlo hay que correr un
+--backfill-from desde el primer mes. Las copias de mp-payments y stripe-payments ven los cambios en el
+lugar de la misma ventana porque normalized_dates.py los vuelve a copiar en cada corrida: ese job tiene
+que correr antes que este.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pymongo import DeleteMany, UpdateOne
+from config import (
+    MONGO_URI, #string de conexión a la Mongo (solo lectura)
+    MONGO_ANALYTICS_URI, # string de conexión a la base de analytics
+    MONGO_DB_USERS, # base de datos Users
+    MONGO_COLLECTION_STRIPE_UPDATES, # colección stripe-updates
+    MONGO_DB_TME_CHARTS, # base de datos TranscribeMe-charts
+    MONGO_COLLECTION_STRIPE_PAYMENTS, # colección stripe-payments
+    MONGO_COLLECTION_MP_PAYMENTS, # colección mp-payments
+    MONGO_COLLECTION_TGO_SUBS, # colección de tgo-subscriptions
+    MONGO_DB_ANALYTICS, # base de datos de analytics
+    MONGO_COLLECTION_MONTHLY_ROLLUPS, # colección de rollups mensuales
+    MONGO_COLLECTION_ROLLUP_STATE, # colección con el high-water mark de cada fuente
+    ROLLUP_MUTABLE_MONTHS, # meses en que los documentos de las fuentes que cambian en el lugar se recalculan
+    USE_NORMALIZED_DATES, # leer las fuentes desde las copias con fechas normalizadas
+    )
+from mongo_client import get_client
+from mongo_indexes import INDEX_SPECS
+from normalized_dates import NORMALIZED_SOURCES, month_key, month_range, truncate
+from subs_metrics import STRIPE_MONTHLY_FACETS, TGO_ENDED_STATUSES
+
+
+def _stripe_update_kind():
+    """Expresión que traduce la description de stripe-updates a created/canceled/incomplete."""
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$in": ["$description", descriptions]}, "then": key}
+                for key, descriptions in STRIPE_MONTHLY_FACETS.items()
+            ],
+            "default": "other",
+        }
+    }
+
+
+# Fuentes de los rollups: colección, eventos de cada documento (campo de fecha, string ISO o fecha BSON en la
+# copia normalizada; status; condición extra), claves extra por las que se agrupa y si cambian en el lugar.
+# Los eventos de una fuente tienen que dar status distintos (sus grupos no se suman entre sí)
+ROLLUP_SOURCES = {
+    MONGO_COLLECTION_STRIPE_UPDATES: {
+        "db": MONGO_DB_USERS,
+        "collection": MONGO_COLLECTION_STRIPE_UPDATES,
+        "provider": "stripe",
+        "match": {"description": {"$in": [d for descs in STRIPE_MONTHLY_FACETS.values() for d in descs]}},
+        "events": [{"date_field": "timestamp", "status": _stripe_update_kind()}],
+        "keys": {},
+        "amount": None,
+        "mutable": False,
+    },
+    MONGO_COLLECTION_STRIPE_PAYMENTS: {
+        "db": MONGO_DB_TME_CHARTS,
+        "collection": MONGO_COLLECTION_STRIPE_PAYMENTS,
+        "provider": "stripe",
+        "match": {},
+        "events": [{"date_field": "created", "status": "$status"}],
+        "keys": {"currency": "$currency"},
+        "amount": "$amount",
+        "mutable": True,
+    },
+    MONGO_COLLECTION_MP_PAYMENTS: {
+        "db": MONGO_DB_TME_CHARTS,
+        "collection": MONGO_COLLECTION_MP_PAYMENTS,
+        "provider": "mercadopago",
+        "match": {},
+        "events": [{"date_field": "date_approved", "status": "$status"}],
+        "keys": {},
+        "amount": "$transaction_amount",
+        "mutable": True,
+    },
+    MONGO_COLLECTION_TGO_SUBS: {
+        "db": MONGO_DB_TME_CHARTS,
+        "collection": MONGO_COLLECTION_TGO_SUBS,
+        "provider": "stripe",
+        "match": {},
+        "events": [
+            {"date_field": "created", "status": {"$literal": "created"}},
+            {"date_field": "ended_at", "status": "$status", "match": {"status": {"$in": TGO_ENDED_STATUSES}}},
+        ],
+        "keys": {"plan": "$plan.nickname"},
+        "amount": None,
+        "mutable": True,
+    },
+}
+
+
+def _rollups():
+    return get_client(MONGO_ANALYTICS_URI)[MONGO_DB_ANALYTICS][MONGO_COLLECTION_MONTHLY_ROLLUPS]
+
+
+def _state():
+    return get_client(MONGO_ANALYTICS_URI)[MONGO_DB_ANALYTICS][MONGO_COLLECTION_ROLLUP_STATE]
+
+
+def _normalized(spec):
+    return USE_NORMALIZED_DATES and spec["collection"] in NORMALIZED_SOURCES
+
+
+def _source_collection(spec):
+    if _normalized(spec):
+        # La copia conserva los _id de la fuente, así que el high-water mark sirve igual
+        target = NORMALIZED_SOURCES[spec["collection"]]["target"]
+        return get_client(MONGO_ANALYTICS_URI)[MONGO_DB_ANALYTICS][target]
+    return get_client(MONGO_URI)[spec["db"]][spec["collection"]]
+
+
+def _month_expression(spec, date_field):
+    if _normalized(spec):
+        return month_key(truncate(date_field, "month"))
+    return {"$substr": ["$" + date_field, 0, 7]}
+
+
+def _shift_month(month, months):
+    """Mes 'YYYY-MM' corrido la cantidad de meses indicada."""
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _next_month(month):
+    return _shift_month(month, 1)
+
+
+def _current_month():
+    return datetime.utcnow().strftime("%Y-%m")
+
+
+def _mutable_window():
+    """Meses que se recalculan en cada corrida de las fuentes que cambian en el lugar: los de la ventana y el anterior."""
+    current = _current_month()
+    return [_shift_month(current, -months) for months in range(ROLLUP_MUTABLE_MONTHS, -1, -1)]
+
+
+def _complete_before(spec, last_month):
+    """Primer mes que el dashboard no lee de los rollups ('YYYY-MM'), o None si no hay meses procesados."""
+    if not last_month:
+        return None
+    if spec["mutable"]:
+        return min(last_month, _shift_month(_current_month(), 1 - ROLLUP_MUTABLE_MONTHS))
+    return last_month
+
+
+def _months_match(spec, date_field, months):
+    """Condición sobre el campo de fecha de la fuente para los meses 'YYYY-MM' indicados."""
+    if _normalized(spec):
+        conditions = [{date_field: month_range(month)} for month in months]
+    else:
+        # Strings ISO: 'YYYY-MM' <= fecha < 'YYYY-MM' del mes siguiente
+        conditions = [{date_field: {"$gte": month, "$lt": _next_month(month)}} for month in months]
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def _since_match(spec, date_field, month_from):
+    if _normalized(spec):
+        return {date_field: {"$gte": month_range(month_from)["$gte"]}}
+    return {date_field: {"$gte": month_from}}
+
+
+def _event_match(spec, event, condition):
+    return {**spec["match"], **event.get("match", {}), **condition}
+
+
+def _group_pipeline(spec, event, match):
+    group_id = {"month": _month_expression(spec, event["date_field"]), "status": event["status"]}
+    group_id.update(spec["keys"])
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": group_id,
+            "count": {"$sum": 1},
+            "amount": {"$sum": spec["amount"] if spec["amount"] else 0},
+        }},
+    ]
+
+
+def _groups(spec, condition):
+    """
+    Grupos (mes, status, claves) de todos los eventos de la fuente.
+
+    Parámetros:
+    spec (dict): fuente de ROLLUP_SOURCES
+    condition (callable): campo de fecha del evento -> condición sobre los documentos
+    """
+    groups = []
+    for event in spec["events"]:
+        match = _event_match(spec, event, condition(event["date_field"]))
+        groups.extend(_source_collection(spec).aggregate(_group_pipeline(spec, event, match), allowDiskUse=True))
+    return groups
+
+
+def _rollup_id(source, spec, group):
+    # El orden de los campos del _id tiene que ser siempre el mismo para que el upsert encuentre el documento
+    rollup_id = {"source": source, "provider": spec["provider"], "month": group["month"], "status": group["status"]}
+    for key in sorted(spec["keys"]):
+        rollup_id[key] = group.get(key)
+    return rollup_id
+
+
+def _now():
+    # La Mongo guarda milisegundos: sin truncar, el updated_at guardado sería menor que el de la corrida
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _latest_id(spec):
+    doc = _source_collection(spec).find_one(spec["match"], {"_id": 1}, sort=[("_id", -1)])
+    return doc["_id"] if doc else None
+
+
+def _touched_months(spec, id_range):
+    """Meses 'YYYY-MM' de los eventos de los documentos con _id en id_range."""
+    months = set()
+    for event in spec["events"]:
+        pipeline = [
+            {"$match": _event_match(spec, event, {"_id": id_range, event["date_field"]: {"$ne": None}})},
+            {"$group": {"_id": _month_expression(spec, event["date_field"])}},
+        ]
+        months.update(doc["_id"] for doc in _source_collection(spec).aggregate(pipeline) if doc["_id"])
+    return sorted(months)
+
+
+def _save_state(source, spec, last_id, last_month):
+    _state().update_one(
+        {"_id": source},
+        {"$set": {
+            "last_id": last_id,
+            # Último mes con eventos procesados (los meses anteriores están completos hasta last_id)
+            "last_month": last_month,
+            # Los meses anteriores se leen de los rollups (en las fuentes que cambian en el lugar, solo los
+            # que ya salieron de la ventana)
+            "complete_before": _complete_before(spec, last_month),
+            "updated_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+
+
+def run_incremental(source):
+    """
+    Recalcula los rollups de los meses en los que cayó algún documento de la fuente con _id mayor al
+    high-water mark y, si la fuente cambia en el lugar, los de la ventana de _mutable_window().
+
+    Parámetros:
+    source (str): nombre de la fuente en ROLLUP_SOURCES
+
+    Retorna:
+    int: cantidad de grupos (mes, status, claves) escritos
+    """
+    spec = ROLLUP_SOURCES[source]
+    state = _state().find_one({"_id": source}) or {}
+    last_id = state.get("last_id")
+    upper_id = _latest_id(spec)
+    window = _mutable_window() if spec["mutable"] else []
+    if upper_id is None or (upper_id == last_id and not window):
+        return 0
+
+    touched = []
+    if upper_id != last_id:
+        id_range = {"$lte": upper_id}
+        if last_id is not None:
+            id_range["$gt"] = last_id
+        touched = _touched_months(spec, id_range)
+    months = sorted(set(touched) | set(window))
+    written = 0
+    if months:
+        groups = _groups(spec, lambda field: {"_id": {"$lte": upper_id}, **_months_match(spec, field, months)})
+        now = _now()
+        operations = [
+            UpdateOne(
+                {"_id": _rollup_id(source, spec, group["_id"])},
+                {"$set": {"count": group["count"], "amount": group["amount"], "updated_at": now}},
+                upsert=True,
+            )
+            for group in groups
+        ]
+        written = len(operations)
+        # Los grupos de esos meses que ya no tienen documentos (status corregido) se borran
+        operations.append(DeleteMany({"_id.source": source, "_id.month": {"$in": months}, "updated_at": {"$lt": now}}))
+        _rollups().bulk_write(operations, ordered=True)
+    _save_state(source, spec, upper_id, max([state.get("last_month") or "", *touched]) or None)
+    return written
+
+
+def run_backfill(source, since):
+    """
+    Recalcula desde cero los rollups de la fuente para los meses desde 'since', hasta el high-water mark
+    actual. Sirve para eventos que llegan tarde o documentos corregidos en el lugar.
+
+    Parámetros:
+    source (str): nombre de la fuente en ROLLUP_SOURCES
+    since (str): fecha 'YYYY-MM-DD'; se recalcula desde el primer día de ese mes
+
+    Retorna:
+    int: cantidad de grupos reescritos
+    """
+    spec = ROLLUP_SOURCES[source]
+    state = _state().find_one({"_id": source}) or {}
+    upper_id = state.get("last_id") or _latest_id(spec)
+    if upper_id is None:
+        return 0
+
+    month_from = since[:7]
+    groups = _groups(spec, lambda field: {"_id": {"$lte": upper_id}, **_since_match(spec, field, month_from)})
+
+    # Copia de los rollups sin los meses recalculados + los grupos nuevos, que reemplaza a la colección
+    rollups = _rollups()
+    staging = rollups.database[f"{MONGO_COLLECTION_MONTHLY_ROLLUPS}-backfill"]
+    staging.drop()
+    rollups.aggregate([
+        {"$match": {"$nor": [{"_id.source": source, "_id.month": {"$gte": month_from}}]}},
+        {"$out": staging.name},
+    ])
+    now = _now()
+    docs = [
+        {"_id": _rollup_id(source, spec, group["_id"]), "count": group["count"],
+         "amount": group["amount"], "updated_at": now}
+        for group in groups
+    ]
+    if docs:
+        staging.insert_many(docs, ordered=False)
+    for keys in INDEX_SPECS[(MONGO_DB_ANALYTICS, MONGO_COLLECTION_MONTHLY_ROLLUPS)]:
+        staging.create_index(keys)
+    staging.rename(MONGO_COLLECTION_MONTHLY_ROLLUPS, dropTarget=True)
+
+    if not state.get("last_id"):
+        months = [group["_id"]["month"] for group in groups if group["_id"]["month"]]
+        _save_state(source, spec, upper_id, max(months) if months else None)
+    return len(docs)
+
+
+def run(sources=None, backfill_from=None):
+    for source in sources or ROLLUP_SOURCES:
+        started = time.perf_counter()
+        if backfill_from:
+            updated = run_backfill(source, backfill_from)
+        else:
+            updated = run_incremental(source)
+        print(f"Rollup {source}: {updated} grupos en {time.perf_counter() - started:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollups mensuales incrementales")
+    parser.add_argument("--source", action="append", choices=list(ROLLUP_SOURCES),
+                        help="fuente a procesar (se puede repetir); por defecto todas")
+    parser.add_argument("--backfill-from", help="recalcula los meses desde esta fecha (YYYY-MM-DD)")
+    parser.add_argument("--every", type=int, help="repite el job cada N segundos")
+    args = parser.parse_args()
+
+    backfill_from = args.backfill_from
+    while True:
+        run(args.source, backfill_from)
+        if not args.every:
+            return 0
+        # El backfill se hace una sola vez; las siguientes vueltas son incrementales
+        backfill_from = None
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Búsqueda en bloque de suscripciones activas de Stripe para el funnel de checkout sessions expiradas.
+
+Para cada usuario emailed se busca la suscripción activa más reciente de su customer creada después de
+la sesión expirada. Con muchos clientes se listan una sola vez las suscripciones activas creadas después
+de la sesión más vieja (paginando de a 100) y se cruzan localmente por customer. Con pocos clientes se
+consulta a Stripe por customer, en paralelo con un pool acotado. En los dos casos las respuestas 429 se
+reintentan con backoff exponencial y lo encontrado queda cacheado por customer.
+
+Para probarlo contra stripe-mock:
+    docker run --rm -p 12111:12111 stripe/stripe-mock
+    STRIPE_API_BASE=http://localhost:12111 STRIPE_API_KEY=sk_test_123 python stripe_subscriptions.py
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import stripe
+from config import (
+    STRIPE_API_KEY, # API key de Stripe
+    STRIPE_API_BASE, # URL alternativa de la API (stripe-mock)
+    STRIPE_LOOKUP_WORKERS, # llamadas por cliente en paralelo
+    STRIPE_MAX_RETRIES, # reintentos ante 429
+    STRIPE_BULK_MIN_CUSTOMERS, # desde cuántos clientes se lista todo
+    STRIPE_CUSTOMER_CACHE_TTL_S, # vigencia de la caché por customer
+    )
+from http_client import http_client
+
+stripe.api_key = STRIPE_API_KEY
+if STRIPE_API_BASE:
+    stripe.api_base = STRIPE_API_BASE
+
+PAGE_SIZE = 100
+BACKOFF_BASE_S = 0.5
+
+
+class SubscriptionResolver:
+    """
+    Resuelve la suscripción activa de cada (customer, timestamp de la sesión) con la menor cantidad de
+    llamadas a Stripe. Guarda por customer sus suscripciones activas conocidas:
+        customer -> (lista de (created, subscription_id), desde qué created cubre la lista, fetched_at)
+    """
+    def __init__(self, workers=STRIPE_LOOKUP_WORKERS, max_retries=STRIPE_MAX_RETRIES,
+                 bulk_min_customers=STRIPE_BULK_MIN_CUSTOMERS, cache_ttl=STRIPE_CUSTOMER_CACHE_TTL_S):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.bulk_min_customers = bulk_min_customers
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.calls = {'bulk_pages': 0, 'per_customer': 0, 'rate_limited': 0, 'cache_hits': 0}
+        self._http_pid = None
+
+    def _use_shared_http_client(self):
+        # El SDK guarda su cliente HTTP en un global; se lo arma por proceso con la sesión compartida
+        if self._http_pid != os.getpid():
+            stripe.default_http_client = stripe.RequestsClient(
+                session=http_client.session('stripe'), timeout=http_client.timeout_for('api.stripe.com'))
+            self._http_pid = os.getpid()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.calls[key] += n
+
+    def _list(self, **params):
+        """Subscription.list con backoff exponencial (y jitter) ante 429."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return stripe.Subscription.list(**params)
+            except stripe.RateLimitError:
+                self._count('rate_limited')
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(BACKOFF_BASE_S * 2 ** attempt * (1 + random.random()))
+
+    # ------------------------------ caché por customer -------------------------------------
+    def _cached(self, customer, since):
+        entry = self._cache.get(customer)
+        if entry is None:
+            return None
+        subscriptions, covered_since, fetched_at = entry
+        if time.time() - fetched_at > self.cache_ttl or (covered_since is not None and since < covered_since):
+            return None
+        return subscriptions
+
+    def _store(self, customer, subscriptions, covered_since):
+        with self._lock:
+            self._cache[customer] = (subscriptions, covered_since, time.time())
+
+    # ------------------------------ consultas a Stripe -------------------------------------
+    def _fetch_bulk(self, customers, since):
+        """Lista las suscripciones activas creadas después de since y las reparte por customer."""
+        by_customer = {customer: [] for customer in customers}
+        params = {'status': 'active', 'created': {'gt': since}, 'limit': PAGE_SIZE}
+        while True:
+            page = self._list(**params)
+            self._count('bulk_pages')
+            for subscription in page.data:
+                if subscription.customer in by_customer:
+                    by_customer[subscription.customer].append((subscription.created, subscription.id))
+            if not page.has_more or not page.data:
+                break
+            params['starting_after'] = page.data[-1].id
+        for customer, subscriptions in by_customer.items():
+            self._store(customer, subscriptions, since)
+
+    def _fetch_customer(self, customer):
+        """Todas las suscripciones activas de un customer (cubre cualquier timestamp)."""
+        subscriptions = []
+        params = {'customer': customer, 'status': 'active', 'limit': PAGE_SIZE}
+        while True:
+            page = self._list(**params)
+            self._count('per_customer')
+            subscriptions.extend((subscription.created, subscription.id) for subscription in page.data)
+            if not page.has_more or not page.data:
+                break
+            params['starting_after'] = page.data[-1].id
+        self._store(customer, subscriptions, None)
+
+    # ------------------------------ API ----------------------------------------------------
+    def resolve(self, customers, session_timestamps):
+        """
+        Parámetros:
+        customers (pd.Series): customer ID de Stripe de cada fila
+        session_timestamps (pd.Series): timestamp unix de la sesión expirada de cada fila
+
+        Retorna:
+        pd.Series: id de la suscripción activa más reciente del customer creada después de la sesión,
+                   o None (mismo índice que customers)
+        """
+        self._use_shared_http_client()
+        started = time.perf_counter()
+        calls_before = dict(self.calls)
+        timestamps = pd.to_numeric(session_timestamps, errors='coerce')
+        valid = customers.notna() & timestamps.notna()
+        rows = pd.DataFrame({'customer': customers[valid], 'since': timestamps[valid].astype('int64')})
+
+        # Clientes sin caché vigente para su sesión más vieja
+        earliest = rows.groupby('customer')['since'].min()
+        missing = [customer for customer, since in earliest.items() if self._cached(customer, since) is None]
+        self._count('cache_hits', len(earliest) - len(missing))
+        if len(missing) >= self.bulk_min_customers:
+            self._fetch_bulk(missing, int(earliest[missing].min()))
+        elif missing:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='stripe-lookup') as executor:
+                list(executor.map(self._fetch_customer, missing))
+
+        result = pd.Series(None, index=customers.index, dtype=object)
+        for idx, customer, since in rows.itertuples(name=None):
+            subscriptions, _, _ = self._cache[customer]
+            newer = [(created, subscription_id) for created, subscription_id in subscriptions if created > since]
+            # Igual que Subscription.list (más recientes primero): la más reciente
+            result[idx] = max(newer)[1] if newer else None
+
+        calls = {key: self.calls[key] - calls_before[key] for key in self.calls}
+        print(f"Stripe subscriptions: {len(earliest)} clientes en {time.perf_counter() - started:.1f}s, llamadas {calls}")
+        return result
+
+
+subscription_resolver = SubscriptionResolver()
+
+
+if __name__ == '__main__':
+    # Prueba rápida (por ejemplo contra stripe-mock): busca las suscripciones de los customers listados
+    customers = [subscription.customer for subscription in stripe.Subscription.list(limit=5).data]
+    sample = pd.Series(customers)
+    print(subscription_resolver.resolve(sample, pd.Series([0] * len(customers))))
+    print(subscription_resolver.calls)
@@ -1,8 +1,15 @@
 from datetime import date, datetime, timedelta
-from pymongo import MongoClient
 import pandas as pd
-from get_country import getCountry
-import requests
+from get_country import resolve_countries
+from country_cache import country_cache
+from mongo_client import get_client
+from metrics_cache import cached
+from mongo_loader import aggregate_frame
+from fx_rates import fx_rates
+from ars_rates import ars_rates
+from http_client import http_client
+from mp_subscriptions import mp_subscriptions
+from normalized_dates import day_range, local_range, month_key, month_range, to_business_time, truncate
 from config import (
     MONGO_URI, #string de conexión a la Mongo (solo lectura)
     MONGO_DB_USERS, # base de datos Users
@@ -16,30 +23,150 @@ from config import (
     MONGO_DB_TGO, # base de datos B2B
     MONGO_COLLECTION_ONBOARDING_TGO, # colección onboardings
     MONGO_COLLECTION_TGO_CALLS, # colección transcribego-calls
-    API_KEY, # API KEY exchange rates
+    MONGO_ANALYTICS_URI, # string de conexión a la base de analytics
+    MONGO_DB_ANALYTICS, # base de datos de analytics
+    MONGO_COLLECTION_MONTHLY_ROLLUPS, # colección de rollups mensuales
+    MONGO_COLLECTION_ROLLUP_STATE, # colección con el high-water mark de cada rollup
+    USE_MONTHLY_ROLLUPS, # leer las series mensuales de Stripe desde los rollups
+    MONGO_COLLECTION_STRIPE_UPDATES_NORMALIZED, # copia de stripe-updates con fechas BSON
+    MONGO_COLLECTION_STRIPE_PAYMENTS_NORMALIZED, # copia de stripe-payments con fechas BSON
+    MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED, # copia de mp-payments con fechas BSON
+    USE_NORMALIZED_DATES, # filtrar y agrupar por fecha sobre las copias normalizadas
+    TGO_SUBS_START_DATE, # primer mes de las series de TGO
     )
 
+# Vigencia (segundos) de los resultados cacheados de cada método
+CACHE_TTL_COUNTS = 60        # conteos de suscripciones activas
+CACHE_TTL_SNAPSHOT = 300     # fotos del estado actual (planes, suscripciones activas, recovery)
+CACHE_TTL_RANGE = 600        # consultas por rango de fechas
+CACHE_TTL_INCOME = 86400     # ingresos de un mes ya cerrado (la clave es el mes)
+
+# Planes de suscripción de Mercado Pago
+MP_PLANES = ['TranscribeMe Plus 10d', 'TranscribeMe Plus discount', 'TranscribeMe Plus 2',
+             'TranscribeMe Plus', 'TranscribeMe Plus - Anual con 3 meses gratis', 
+             'TranscribeMe Plus - mensual 20% off']
+
+# Clase de cada description de mp-payments (las que empiezan con 'TranscribeMe' son suscripciones;
+# las que no figuran acá conservan su description)
+MP_PAYMENT_SUBSCRIPTION_PREFIX = 'TranscribeMe'
+MP_PAYMENT_CLASSES = {
+    'single_payment_discount': 'Plan de 3 meses',
+    'single_payment_C': 'Recargas de tokens',
+    'single_payment_T': 'Recargas de minutos',
+}
+# Schemas con que mongo_loader arma los DataFrames directamente desde el cursor: las columnas de
+# valores repetidos quedan como category y las fechas se parsean una sola vez, acá. El resto del
+# dashboard usa esos tipos sin volver a convertir.
+SUBS_SCHEMA = {
+    'user_id': 'string',
+    'provider': 'category',
+    'status': 'category',
+    'source': 'category',
+    'reason': 'category',
+    'start_date': 'datetime',
+}
+# Dimensiones del cubo de suscripciones (además del día y el mes)
+SUBS_CUBE_DIMENSIONS = ['status', 'reason', 'source', 'country', 'provider']
+ACTIVE_SUBS_SCHEMA = {column: kind for column, kind in SUBS_SCHEMA.items() if column != 'start_date'}
+STRIPE_UPDATES_SCHEMA = {
+    'user_id': 'string',
+    'source': 'category',
+    'timestamp': 'datetime',
+}
+MP_PAYMENTS_SCHEMA = {
+    'date_created': 'datetime',
+    'date_approved': 'datetime',
+    'description': 'category',
+    'operation_type': 'category',
+    'status': 'category',
+    'transaction_amount': 'float',
+}
+STRIPE_SUBSCRIPTION_PAYMENTS_SCHEMA = {
+    'created': 'datetime',
+    'statement_descriptor': 'category',
+    'amount': 'float',
+    'currency': 'category',
+}
+STRIPE_EXTRA_CREDIT_PAYMENTS_SCHEMA = {
+    'created': 'datetime',
+    'amount': 'float',
+    'currency': 'category',
+}
+
+# Descripciones de stripe-updates que alimentan cada serie mensual de suscripciones de Stripe
+STRIPE_MONTHLY_FACETS = {
+    'created': ['new_subscription', 'subscription_already_created'],
+    'canceled': ['subscription_cancelled'],
+    'incomplete': ['subscription_incomplete_expired'],
+}
+
+# Opciones del selector de planes de TGO -> plan.nickname ('Total' suma todos los planes)
+TGO_PLAN_SELECTORS = {
+    # Planes viejos
+    'Plan Basic': 'Basic',
+    'Plan Plus': 'Plus',
+    'Plan Business': 'Business',
+    # Planes nuevos mensuales
+    'Basic-monthly': 'transcribego-basic-month',
+    'Plus-monthly': 'transcribego-plus-month',
+    'Unlimited-monthly': 'transcribego-unlimited-month',
+    # Planes nuevos anuales
+    'Basic-yearly': 'transcribego-basic-year',
+    'Plus-yearly': 'transcribego-plus-year',
+    'Unlimited-yearly': 'transcribego-unlimited-year',
+}
+TGO_ENDED_STATUSES = ['canceled', 'incomplete_expired']
+
+
+def _collection(db_name, collection_name, uri=MONGO_URI):
+    """
+    Propiedad que resuelve la colección sobre el MongoClient compartido del proceso en cada acceso,
+    así las instancias creadas antes del fork de gunicorn usan el pool del worker.
+    """
+    return property(lambda self: get_client(uri)[db_name][collection_name])
+
+
+def last_month_key():
+    """Último mes completo, 'YYYY-MM'."""
+    return (date.today().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+
+
+def month_bounds(month):
+    """Primer día del mes 'YYYY-MM' y primer día del mes siguiente, como 'YYYY-MM-DD'."""
+    first_day = datetime.strptime(month, '%Y-%m').date()
+    next_month = (first_day + timedelta(days=32)).replace(day=1)
+    return first_day.strftime('%Y-%m-%d'), next_month.strftime('%Y-%m-%d')
 
-class SubscriptionMetrics:
-    def __init__(self):
-        self.client = MongoClient(MONGO_URI)
-        self.db_users = self.client[MONGO_DB_USERS]
-        self.subscriptions = self.db_users[MONGO_COLLECTION_SUBSCRIPTIONS]
-        self.stripe_updates = self.db_users[MONGO_COLLECTION_STRIPE_UPDATES]
-        self.db_tme_charts = self.client[MONGO_DB_TME_CHARTS]
-        self.tgo_subs = self.db_tme_charts[MONGO_COLLECTION_TGO_SUBS]
-        self.mp_payments = self.db_tme_charts[MONGO_COLLECTION_MP_PAYMENTS]
-        self.stripe_payments = self.db_tme_charts[MONGO_COLLECTION_STRIPE_PAYMENTS]
-        self.stripe_recovery = self.db_tme_charts[MONGO_COLLECTION_STRIPE_RECOVERY]
-        self.db_tgo = self.client[MONGO_DB_TGO]
-        self.tgo_onboardings = self.db_tgo[MONGO_COLLECTION_ONBOARDING_TGO]
-        self.tgo_calls = self.db_tgo[MONGO_COLLECTION_TGO_CALLS]
 
+class SubscriptionMetrics:
+    subscriptions = _collection(MONGO_DB_USERS, MONGO_COLLECTION_SUBSCRIPTIONS)
+    stripe_updates = _collection(MONGO_DB_USERS, MONGO_COLLECTION_STRIPE_UPDATES)
+    tgo_subs = _collection(MONGO_DB_TME_CHARTS, MONGO_COLLECTION_TGO_SUBS)
+    mp_payments = _collection(MONGO_DB_TME_CHARTS, MONGO_COLLECTION_MP_PAYMENTS)
+    stripe_payments = _collection(MONGO_DB_TME_CHARTS, MONGO_COLLECTION_STRIPE_PAYMENTS)
+    stripe_recovery = _collection(MONGO_DB_TME_CHARTS, MONGO_COLLECTION_STRIPE_RECOVERY)
+    tgo_onboardings = _collection(MONGO_DB_TGO, MONGO_COLLECTION_ONBOARDING_TGO)
+    tgo_calls = _collection(MONGO_DB_TGO, MONGO_COLLECTION_TGO_CALLS)
+    monthly_rollups = _collection(MONGO_DB_ANALYTICS, MONGO_COLLECTION_MONTHLY_ROLLUPS, MONGO_ANALYTICS_URI)
+    rollup_state = _collection(MONGO_DB_ANALYTICS, MONGO_COLLECTION_ROLLUP_STATE, MONGO_ANALYTICS_URI)
+    # Copias con fechas BSON en BUSINESS_TIMEZONE (normalized_dates.py), se usan con USE_NORMALIZED_DATES
+    stripe_updates_normalized = _collection(MONGO_DB_ANALYTICS, MONGO_COLLECTION_STRIPE_UPDATES_NORMALIZED,
+                                            MONGO_ANALYTICS_URI)
+    stripe_payments_normalized = _collection(MONGO_DB_ANALYTICS, MONGO_COLLECTION_STRIPE_PAYMENTS_NORMALIZED,
+                                             MONGO_ANALYTICS_URI)
+    mp_payments_normalized = _collection(MONGO_DB_ANALYTICS, MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED,
+                                         MONGO_ANALYTICS_URI)
+
+    @property
+    def client(self):
+        return get_client(MONGO_URI)
+
+    @cached(CACHE_TTL_RANGE)
     def get_subs_data(self):
         """
         Busca las suscripciones en la Mongo
         Retorna:
-        subs: lista de documentos (diccionarios) encontrados
+        pd.DataFrame: suscripciones con los tipos de SUBS_SCHEMA
         """
         match_stage = {
             "$match": {
@@ -62,9 +189,9 @@ class SubscriptionMetrics:
         }
 
         pipeline = [match_stage, project_stage]
-        subs = list(self.subscriptions.aggregate(pipeline))
-        return subs
+        return aggregate_frame(self.subscriptions, pipeline, SUBS_SCHEMA)
     
+    @cached(CACHE_TTL_SNAPSHOT)
     def get_active_subs_data(self):
         """
         Busca las suscripciones activas en la Mongo, usando pipeline de agregación de Mongo DB
@@ -74,7 +201,7 @@ class SubscriptionMetrics:
         end_date (str): fin del rango de fechas
     
         Retorna:
-        subs: lista de documentos (diccionarios) encontrados
+        pd.DataFrame: suscripciones con los tipos de ACTIVE_SUBS_SCHEMA
         """
         match_stage = {
             "$match": {
@@ -96,9 +223,9 @@ class SubscriptionMetrics:
         }
 
         pipeline = [match_stage, project_stage]
-        subs = list(self.subscriptions.aggregate(pipeline))
-        return subs
+        return aggregate_frame(self.subscriptions, pipeline, ACTIVE_SUBS_SCHEMA)
     
+    @cached(CACHE_TTL_RANGE)
     def get_stripe_cancelation_data (self, start_date, end_date):
         """
         Busca las stripe-updates de cancelaciones de suscripciones en la Mongo, creadas en un rango de fechas
@@ -109,8 +236,10 @@ class SubscriptionMetrics:
         end_date (str): fin del rango de fechas
     
         Retorna:
-        subs: lista de documentos (diccionarios) encontrados
+        pd.DataFrame: eventos con los tipos de STRIPE_UPDATES_SCHEMA
         """
+        if USE_NORMALIZED_DATES:
+            return self._normalized_stripe_updates(['subscription_cancelled'], start_date, end_date)
         start = datetime.strptime(start_date, '%Y-%m-%d')
         end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
 
@@ -134,9 +263,9 @@ class SubscriptionMetrics:
         }
 
         pipeline = [match_stage, project_stage]
-        stripe_cancelation_data = list(self.stripe_updates.aggregate(pipeline))
-        return stripe_cancelation_data
+        return aggregate_frame(self.stripe_updates, pipeline, STRIPE_UPDATES_SCHEMA)
 
+    @cached(CACHE_TTL_RANGE)
     def get_stripe_creation_data (self, start_date, end_date):
         """
         Busca las stripe-updates de creaciones de suscripciones en la Mongo, creadas en un rango de fechas
@@ -147,12 +276,14 @@ class SubscriptionMetrics:
         end_date (str): fin del rango de fechas
     
         Retorna:
-        subs: lista de documentos (diccionarios) encontrados
+        pd.DataFrame: eventos con los tipos de STRIPE_UPDATES_SCHEMA
         """
         start = datetime.strptime(start_date, '%Y-%m-%d')
         end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
 
         valores = ['new_subscription', 'subscription_already_created']
+        if USE_NORMALIZED_DATES:
+            return self._normalized_stripe_updates(valores, start_date, end_date)
         match_stage = {
             "$match": {
                 "timestamp": {
@@ -173,9 +304,9 @@ class SubscriptionMetrics:
         }
 
         pipeline = [match_stage, project_stage]
-        stripe_creation_data = list(self.stripe_updates.aggregate(pipeline))
-        return stripe_creation_data
+        return aggregate_frame(self.stripe_updates, pipeline, STRIPE_UPDATES_SCHEMA)
     
+    @cached(CACHE_TTL_RANGE)
     def get_stripe_incomplete_data (self, start_date, end_date):
         """
         Busca las stripe-updates de suscripciones incompletas en la Mongo, creadas en un rango de fechas
@@ -186,8 +317,10 @@ class SubscriptionMetrics:
         end_date (str): fin del rango de fechas
     
         Retorna:
-        subs: lista de documentos (diccionarios) encontrados
+        pd.DataFrame: eventos con los tipos de STRIPE_UPDATES_SCHEMA
         """
+        if USE_NORMALIZED_DATES:
+            return self._normalized_stripe_updates(['subscription_incomplete_expired'], start_date, end_date)
         start = datetime.strptime(start_date, '%Y-%m-%d')
         end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
 
@@ -211,28 +344,44 @@ class SubscriptionMetrics:
         }
 
         pipeline = [match_stage, project_stage]
-        stripe_incomplete_data = list(self.stripe_updates.aggregate(pipeline))
-        return stripe_incomplete_data
+        return aggregate_frame(self.stripe_updates, pipeline, STRIPE_UPDATES_SCHEMA)
+
+    def _normalized_stripe_updates(self, descriptions, start_date, end_date):
+        """
+        Versión de get_stripe_*_data sobre la copia normalizada: los días start_date..end_date de
+        BUSINESS_TIMEZONE, con 'timestamp' truncado al día local.
+        """
+        pipeline = [
+            {"$match": {"description": {"$in": descriptions}, "timestamp": day_range(start_date, end_date)}},
+            {"$project": {"_id": 0, "user_id": 1, "source": 1, "timestamp": truncate("timestamp", "day")}},
+        ]
+        df = aggregate_frame(self.stripe_updates_normalized, pipeline, STRIPE_UPDATES_SCHEMA)
+        return to_business_time(df, ['timestamp'])
     
     def asign_countries (self, doc_list):
         """
-        Asigna el país a cada documento de la lista y devuelve un dataframe con el resultado
+        Asigna el país a cada fila y devuelve un dataframe con el resultado
          
         Parámetros:
-        doc_list (list_dic): lista de documentos (diccionarios)
+        doc_list (pd.DataFrame | list_dic): suscripciones o eventos (con user_id y source)
     
         Retorna:
-        pd.DataFrame: dataframe con los resultados
+        pd.DataFrame: dataframe con los resultados y la columna 'country' (category)
         """
-        for doc in doc_list:
-            if doc['source'] == "t":
-                country = "Telegram"
-            else:
-                user_id = doc['user_id']
-                user_phone = '+' + str(user_id)
-                country = getCountry(user_phone)
-            doc['country'] = country
-        return pd.DataFrame(doc_list)
+        df = pd.DataFrame(doc_list)
+        if df.empty:
+            df['country'] = pd.Series(dtype='category')
+            return df
+        telegram = df['source'] == "t"
+        df['country'] = "Telegram"
+        # Solo se resuelven los usuarios que no están en la caché persistente;
+        # el teléfono de los usuarios de la web es el user_id con el prefijo '+'
+        web = df.loc[~telegram]
+        df.loc[~telegram, 'country'] = country_cache.resolve(
+            web['user_id'], web['source'], lambda user_ids: resolve_countries('+' + user_ids)
+        )
+        df['country'] = df['country'].astype('category')
+        return df
     
     def assign_provider_default(self, df):
         """
@@ -253,6 +402,9 @@ class SubscriptionMetrics:
                 raise KeyError("La columna 'provider' no existe en el DataFrame")
         
             # Reemplazar valores faltantes (NaN, None) en la columna 'provider' con 'mp'
+            # (en una columna category, 'mp' tiene que ser una categoría antes del fillna)
+            if isinstance(df['provider'].dtype, pd.CategoricalDtype) and 'mp' not in df['provider'].cat.categories:
+                df['provider'] = df['provider'].cat.add_categories('mp')
             df['provider'] = df['provider'].fillna('mp')
         
             return df
@@ -261,13 +413,51 @@ class SubscriptionMetrics:
             print(f"Error: {e}")
             return df  # Retorna el DataFrame sin cambios en caso de error
         
+    def build_subs_cube(self, df):
+        """
+        Cubo de suscripciones: cantidad por día (y su mes) x status x reason x source x country x provider.
+        Los valores faltantes se conservan como celdas propias, así que cualquier combinación de filtros
+        y agrupaciones de subs_all da lo mismo sumando celdas que recorriendo las filas.
+
+        Parámetros:
+        df (pd.DataFrame): suscripciones con start_date y las columnas de SUBS_CUBE_DIMENSIONS
+
+        Retorna:
+        pd.DataFrame: columnas month, day, las dimensiones y count; marcado con attrs['subs_cube']
+        """
+        start_date = df['start_date']
+        if start_date.dtype == 'object':
+            start_date = pd.to_datetime(start_date)
+        day = start_date.dt.normalize()
+        keys = [day.rename('day')] + [
+            df[column] if column in df else pd.Series(None, index=df.index, dtype=object, name=column)
+            for column in SUBS_CUBE_DIMENSIONS
+        ]
+        cube = df.groupby(keys, observed=True, dropna=False).size().rename('count').reset_index()
+        cube.insert(0, 'month', cube['day'].dt.to_period('M').dt.to_timestamp())
+        cube.attrs['subs_cube'] = True
+        return cube
+
+    @cached(CACHE_TTL_RANGE)
+    def get_subs_cube(self):
+        """
+        Cubo de todas las suscripciones de get_subs_data, con países y provider por defecto asignados.
+        Se arma una vez por versión de los datos (la vigencia de la caché) y sirve todas las llamadas
+        a subs_all de la pestaña.
+        """
+        full_data = self.assign_provider_default(self.asign_countries(self.get_subs_data()))
+        cube = self.build_subs_cube(full_data)
+        print(f"Subs cube: {len(full_data)} suscripciones en {len(cube)} celdas")
+        return cube
+
     def subs_all(self, df, group_by='day', status=None, reason=None, source=None, country=None, provider=None):
         """
         Analiza suscripciones, agrupando por día o mes, con filtros opcionales.
     
         Args:
             df (pandas.DataFrame): DataFrame con las columnas ['status', 'reason', 'user_id', 'source', 
-                                   'start_date', 'country', 'provider']
+                                   'start_date', 'country', 'provider'], o el cubo de get_subs_cube /
+                                   build_subs_cube (se suman sus celdas en vez de contar filas)
             group_by (str): 'day' o 'month' para agrupar los resultados
             status (str or list): Valor(es) para filtrar por status, 'all' para considerar todos
             reason (str or list): Valor(es) para filtrar por reason, 'all' para considerar todos
@@ -281,9 +471,10 @@ class SubscriptionMetrics:
         """
         # Crear una copia del DataFrame para no modificar el original
         df_copy = df.copy()
+        is_cube = df.attrs.get('subs_cube', False)
     
         # Convertir start_date a datetime si es string
-        if df_copy['start_date'].dtype == 'object':
+        if not is_cube and df_copy['start_date'].dtype == 'object':
             df_copy['start_date'] = pd.to_datetime(df_copy['start_date'])
 
         # Aplicar filtros adicionales si se especifican
@@ -319,9 +510,9 @@ class SubscriptionMetrics:
     
         # Crear la columna de agrupación según el parámetro group_by
         if group_by.lower() == 'day':
-            df_copy['date'] = df_copy['start_date'].dt.date
+            df_copy['date'] = (df_copy['day'] if is_cube else df_copy['start_date']).dt.date
         elif group_by.lower() == 'month':
-            df_copy['date'] = df_copy['start_date'].dt.to_period('M').dt.to_timestamp()
+            df_copy['date'] = df_copy['month'] if is_cube else df_copy['start_date'].dt.to_period('M').dt.to_timestamp()
         else:
             raise ValueError("El parámetro group_by debe ser 'day' o 'month'")
     
@@ -338,8 +529,13 @@ class SubscriptionMetrics:
         if provider is not None:
             group_columns.append('provider')
     
-        # Agrupar y contar
-        result = df_copy.groupby(group_columns).size().reset_index(name='count')
+        # Agrupar y contar (observed=True: solo las combinaciones que existen, no el producto de categorías)
+        grouped = df_copy.groupby(group_columns, observed=True)
+        result = (grouped['count'].sum() if is_cube else grouped.size()).reset_index(name='count')
+        # El resultado es chico: las columnas de filtro vuelven a object para que los merge/fillna de
+        # quienes lo usan no choquen con categorías distintas
+        for column in group_columns[1:]:
+            result[column] = result[column].astype(object)
     
         # Formatear el resultado según el tipo de agrupación
         if group_by.lower() == 'day':
@@ -359,31 +555,145 @@ class SubscriptionMetrics:
         df_balance['balance'] = df_balance['creadas'] - df_balance['canceladas']
         return df_balance[["date", "country", "balance"]]
 
-    def get_stripe_subs_per_month(self, start_date, end_date):
-        """"
-        Obtiene la cantidad de suscripciones de TranscribeMe creadas por mes desde Stripe.
+    @cached(CACHE_TTL_RANGE)
+    def get_stripe_monthly_rollup(self, start_date, end_date):
+        """
+        Obtiene en una sola agregación las suscripciones de TranscribeMe creadas, canceladas e incompletas
+        por mes desde Stripe. El agrupamiento por mes se hace en la Mongo y las tres series se devuelven
+        juntas usando $facet.
+
+        Parámetros:
+        start_date (str): inicio del rango de fechas
+        end_date (str): fin del rango de fechas
+
+        Retorna:
+        dict: {'created', 'canceled', 'incomplete'} -> pd.DataFrame indexado por mes ('timestamp') con la columna 'count'
         """
         start = datetime.strptime(start_date, '%Y-%m-%d')
         end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-        valores = ['new_subscription', 'subscription_already_created']
-        query = {
-            "description": {"$in": valores}, 
-            "timestamp": {
-                    "$gte": start.strftime('%Y-%m-%dT00:00:00.000Z'),
-                    "$lt": end.strftime('%Y-%m-%dT00:00:00.000Z')
-            },
+
+        # Meses completos desde los rollups (si están activos) y los tramos restantes desde stripe-updates
+        rows = {key: [] for key in STRIPE_MONTHLY_FACETS}
+        raw_ranges = [(start, end)]
+        if USE_MONTHLY_ROLLUPS:
+            rows, raw_ranges = self._read_stripe_rollups(start, end)
+        if raw_ranges:
+            facets = self._stripe_monthly_facet(raw_ranges)
+            for key in STRIPE_MONTHLY_FACETS:
+                rows[key] = rows[key] + facets.get(key, [])
+        return {key: self._monthly_counts_frame(rows[key]) for key in STRIPE_MONTHLY_FACETS}
+
+    def _stripe_monthly_facet(self, ranges):
+        """
+        Cuenta por mes las suscripciones creadas/canceladas/incompletas de stripe-updates en los rangos
+        [inicio, fin) indicados, con una sola agregación $facet. Un rango (inicio, fin, _id) cuenta solo
+        los eventos con _id mayor (los que todavía no están en los rollups).
+
+        Retorna:
+        dict: {'created', 'canceled', 'incomplete'} -> lista de {'_id': 'YYYY-MM', 'count': n}
+        """
+        all_descriptions = [desc for descs in STRIPE_MONTHLY_FACETS.values() for desc in descs]
+        if USE_NORMALIZED_DATES:
+            # Los rangos son días de BUSINESS_TIMEZONE y el mes sale de $dateTrunc en esa zona
+            collection = self.stripe_updates_normalized
+            timestamp_ranges = [{"timestamp": local_range(range_start, range_end)} for range_start, range_end, *_ in ranges]
+            month = month_key(truncate("timestamp", "month"))
+        else:
+            collection = self.stripe_updates
+            timestamp_ranges = [
+                {"timestamp": {
+                    "$gte": range_start.strftime('%Y-%m-%dT00:00:00.000Z'),
+                    "$lt": range_end.strftime('%Y-%m-%dT00:00:00.000Z')
+                }}
+                for range_start, range_end, *_ in ranges
+            ]
+            month = {"$substr": ["$timestamp", 0, 7]}
+        for condition, (_, _, *after_id) in zip(timestamp_ranges, ranges):
+            if after_id:
+                condition["_id"] = {"$gt": after_id[0]}
+        match_stage = {
+            "$match": {
+                "description": {"$in": all_descriptions},
+                **(timestamp_ranges[0] if len(timestamp_ranges) == 1 else {"$or": timestamp_ranges}),
+            }
         }
-        proj = {"_id": 0, "timestamp": 1, "user_id":1, 'source':1, 
-                'subscription_id':1, 'plan_id': 1, 'customerId': 1}
-
-        docs = self.stripe_updates.find(query, proj)
-        mongo_info = pd.DataFrame(docs)
-        mongo_info['timestamp'] = pd.to_datetime(mongo_info['timestamp'], errors='coerce')
-        stripe_subs_per_month = (
-            mongo_info
-            .groupby(mongo_info['timestamp'].dt.to_period('M').dt.to_timestamp())
-            .agg(count=('timestamp', 'size'))
-        )
+
+        project_stage = {
+            "$project": {
+                "_id": 0,
+                "description": 1,
+                "month": month
+            }
+        }
+
+        facet_stage = {
+            "$facet": {
+                key: [
+                    {"$match": {"description": {"$in": descriptions}}},
+                    {"$group": {"_id": "$month", "count": {"$sum": 1}}},
+                    {"$sort": {"_id": 1}}
+                ]
+                for key, descriptions in STRIPE_MONTHLY_FACETS.items()
+            }
+        }
+
+        pipeline = [match_stage, project_stage, facet_stage]
+        result = list(collection.aggregate(pipeline))
+        return result[0] if result else {}
+
+    def _read_stripe_rollups(self, start, end):
+        """
+        Lee de los rollups mensuales los meses completos de [start, end) que el job ya procesó.
+
+        Retorna:
+        tuple: (dict {'created', 'canceled', 'incomplete'} -> lista de {'_id': 'YYYY-MM', 'count': n},
+                lista de rangos a leer de stripe-updates: los [inicio, fin) que no cubren los rollups y
+                (inicio, fin, last_id) con los meses de los rollups, para sumar los eventos que llegaron
+                después de la última corrida del job)
+        """
+        rows = {key: [] for key in STRIPE_MONTHLY_FACETS}
+        rollup_cutoff = self._rollup_cutoff(MONGO_COLLECTION_STRIPE_UPDATES)
+        if rollup_cutoff is None:
+            return rows, [(start, end)]
+
+        # Los meses anteriores al último con eventos procesados (por timestamp, la misma clave que los
+        # rollups) se leen de los rollups
+        complete_before, last_id = rollup_cutoff
+        cutoff = datetime.strptime(complete_before, '%Y-%m')
+        first_full = start if start.day == 1 else (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last_full_end = min(end.replace(day=1), cutoff)
+        if first_full >= last_full_end:
+            return rows, [(start, end)]
+
+        docs = self.monthly_rollups.find({
+            "_id.source": MONGO_COLLECTION_STRIPE_UPDATES,
+            "_id.month": {"$gte": first_full.strftime('%Y-%m'), "$lt": last_full_end.strftime('%Y-%m')},
+        })
+        for doc in docs:
+            if doc["_id"]["status"] in rows:
+                rows[doc["_id"]["status"]].append({"_id": doc["_id"]["month"], "count": doc["count"]})
+
+        raw_ranges = [(range_start, range_end) for range_start, range_end
+                      in [(start, first_full), (last_full_end, end)] if range_start < range_end]
+        raw_ranges.append((first_full, last_full_end, last_id))
+        return rows, raw_ranges
+
+    def _monthly_counts_frame(self, rows):
+        """
+        Convierte los grupos {'_id': 'YYYY-MM', 'count': n} devueltos por la Mongo en un DataFrame
+        indexado por el primer día de cada mes ('timestamp') con la columna 'count'.
+        """
+        df = pd.DataFrame(rows, columns=['_id', 'count']).rename(columns={'_id': 'timestamp'})
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='%Y-%m', errors='coerce')
+        df['count'] = df['count'].astype('int64')
+        df = df.dropna(subset=['timestamp'])
+        return df.groupby('timestamp').agg(count=('count', 'sum'))
+
+    def get_stripe_subs_per_month(self, start_date, end_date):
+        """"
+        Obtiene la cantidad de suscripciones de TranscribeMe creadas por mes desde Stripe.
+        """
+        stripe_subs_per_month = self.get_stripe_monthly_rollup(start_date, end_date)['created']
         if not stripe_subs_per_month.empty:
             print ("Stripe subs per month found")
         return stripe_subs_per_month
@@ -392,28 +702,7 @@ class SubscriptionMetrics:
         """
         Obtiene la cantidad de suscripciones de TranscribeMe canceladas por mes desde Stripe.
         """
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-
-        query = {
-            "description": "subscription_cancelled", 
-            "timestamp": {
-                    "$gte": start.strftime('%Y-%m-%dT00:00:00.000Z'),
-                    "$lt": end.strftime('%Y-%m-%dT00:00:00.000Z')
-            },
-        }
-        proj = {"_id": 0, "timestamp": 1,}
-
-        docs = self.stripe_updates.find(query, proj)
-        canceladas_mongo = pd.DataFrame(docs)
-
-        canceladas_mongo['timestamp'] = pd.to_datetime(canceladas_mongo['timestamp'], errors='coerce')
-        canceladas_stripe_per_month = (
-            canceladas_mongo
-            .groupby(canceladas_mongo['timestamp'].dt.to_period('M').dt.to_timestamp())
-            .agg(count=('timestamp', 'size'))
-        )
-        
+        canceladas_stripe_per_month = self.get_stripe_monthly_rollup(start_date, end_date)['canceled']
         if not canceladas_stripe_per_month.empty:
             print ("Canceladas Stripe per month found")
         return canceladas_stripe_per_month
@@ -422,140 +711,161 @@ class SubscriptionMetrics:
         """
         Obtiene la cantidad de suscripciones de TranscribeMe incompletas por mes desde Stripe.
         """
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-        
-        query = {
-            "description": "subscription_incomplete_expired", 
-            "timestamp": {
-                    "$gte": start.strftime('%Y-%m-%dT00:00:00.000Z'),
-                    "$lt": end.strftime('%Y-%m-%dT00:00:00.000Z')
-            },
-        }
-        proj = {"_id": 0, "timestamp": 1,}
-
-        docs = self.stripe_updates.find(query, proj)
-        incomplete_mongo = pd.DataFrame(docs)
-
-        incomplete_mongo['timestamp'] = pd.to_datetime(incomplete_mongo['timestamp'], errors='coerce')
-        incomplete_stripe_per_month = (
-            incomplete_mongo
-            .groupby(incomplete_mongo['timestamp'].dt.to_period('M').dt.to_timestamp())
-            .agg(count=('timestamp', 'size'))
-        )
-
+        incomplete_stripe_per_month = self.get_stripe_monthly_rollup(start_date, end_date)['incomplete']
         if not incomplete_stripe_per_month.empty:
             print ("Incomplete Stripe per month found")
         return incomplete_stripe_per_month
     
-    def get_tgo_subs(self, selector = 'Total'):
+    @cached(CACHE_TTL_RANGE)
+    def get_tgo_pivot(self, start_date=TGO_SUBS_START_DATE):
+        """
+        Cuenta en una sola agregación las suscripciones de TGO por plan, evento y mes: 'created' por mes
+        de created, 'canceled' e 'incomplete_expired' por mes de ended_at. Con USE_MONTHLY_ROLLUPS los
+        meses que ya no pueden cambiar se leen de los rollups y la agregación cuenta el resto.
+
+        Parámetros:
+        start_date (str): fecha 'YYYY-MM-DD' desde la que se cuentan los eventos
+
+        Retorna:
+        pd.DataFrame: columnas plan, kind, month ('YYYY-MM') y count
+        """
+        since = {"$gte": start_date}
+        event_match = {"events.kind": {"$in": ["created", *TGO_ENDED_STATUSES]}, "events.date": since}
+        rows = []
+        cutoff = self._rollup_cutoff(MONGO_COLLECTION_TGO_SUBS) if USE_MONTHLY_ROLLUPS else None
+        # Meses completos desde start_date que cubren los rollups
+        first_full = start_date[:7] if start_date[8:] == '01' else month_bounds(start_date[:7])[1][:7]
+        if cutoff is not None and first_full < cutoff[0]:
+            complete_before, last_id = cutoff
+            docs = self.monthly_rollups.find({
+                "_id.source": MONGO_COLLECTION_TGO_SUBS,
+                "_id.month": {"$gte": first_full, "$lt": complete_before},
+            })
+            rows = [{"plan": doc["_id"]["plan"], "kind": doc["_id"]["status"], "month": doc["_id"]["month"],
+                     "count": doc["count"]} for doc in docs]
+            # De la colección: los eventos fuera de esos meses y los de documentos posteriores a la última corrida
+            event_match["$or"] = [
+                {"events.date": {"$lt": first_full}},
+                {"events.date": {"$gte": complete_before}},
+                {"_id": {"$gt": last_id}},
+            ]
         pipeline = [
+            {"$match": {"$or": [
+                {"created": since},
+                {"status": {"$in": TGO_ENDED_STATUSES}, "ended_at": since},
+            ]}},
+            # Cada suscripción aporta su creación y, si terminó, su cancelación o expiración
             {"$project": {
-                         "_id": 0,
-                         "status": 1,
-                         "created": 1,
-                         "ended_at": 1,
-                         "plan": "$plan.nickname"}}
+                "plan": "$plan.nickname",
+                "events": [
+                    {"kind": "created", "date": "$created"},
+                    {"kind": "$status", "date": "$ended_at"},
+                ]}},
+            {"$unwind": "$events"},
+            {"$match": event_match},
+            {"$group": {
+                "_id": {"plan": "$plan", "kind": "$events.kind", "month": {"$substr": ["$events.date", 0, 7]}},
+                "count": {"$sum": 1}}},
         ]
-        docs = self.tgo_subs.aggregate(pipeline)
-        all_tgo_subs = pd.DataFrame(docs)
-        
-        # Planes viejos
-        if selector == 'Plan Basic':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan']=='Basic']
-        elif selector == 'Plan Plus':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan']=='Plus']
-        elif selector == 'Plan Business':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan']=='Business']
-        
-        # Planes nuevos mensuales
-        elif selector == 'Basic-monthly':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan'] == 'transcribego-basic-month']
-        elif selector == 'Plus-monthly':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan'] == 'transcribego-plus-month']
-        elif selector == 'Unlimited-monthly':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan'] == 'transcribego-unlimited-month']
-        
-        # Planes nuevos anuales
-        elif selector == 'Basic-yearly':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan'] == 'transcribego-basic-year']
-        elif selector == 'Plus-yearly':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan'] == 'transcribego-plus-year']
-        elif selector == 'Unlimited-yearly':
-            all_tgo_subs = all_tgo_subs[all_tgo_subs['plan'] == 'transcribego-unlimited-year']
-
-        canceled = all_tgo_subs[all_tgo_subs['status'] == 'canceled'].copy()
-        incomplete = all_tgo_subs[all_tgo_subs['status'] == 'incomplete_expired'].copy()
-        
-        created_2025 = all_tgo_subs[all_tgo_subs['created'] >= '2025-01-01'].copy()     
-        canceled_2025 = canceled[canceled['ended_at'] >= '2025-01-01'].copy()
-        incomplete_2025 = incomplete[incomplete['ended_at']>= '2025-01-01'].copy()
-        
-        created_2025['created'] = pd.to_datetime(created_2025['created'], errors='coerce')
-        tgo_2025_subs_per_month = (
-            created_2025
-            .groupby(created_2025['created'].dt.to_period('M').dt.to_timestamp())
-            .agg(count=('created', 'size'))
-        )
+        rows += [{**doc["_id"], "count": doc["count"]} for doc in self.tgo_subs.aggregate(pipeline)]
+        df = pd.DataFrame(rows, columns=["plan", "kind", "month", "count"])
+        return df.groupby(["plan", "kind", "month"], as_index=False, dropna=False)["count"].sum() if rows else df
 
-        canceled_2025['ended_at'] = pd.to_datetime(canceled_2025['ended_at'], errors='coerce')
-        tgo_canceled_per_month = (
-            canceled_2025
-            .groupby(canceled_2025['ended_at'].dt.to_period('M').dt.to_timestamp())
-            .agg(count=('ended_at', 'size'))
-        )
+    def _tgo_monthly_counts(self, pivot, kind, index_name):
+        counts = pivot[pivot['kind'] == kind].groupby('month')['count'].sum()
+        months = pd.to_datetime(counts.index, format='%Y-%m', errors='coerce')
+        frame = pd.DataFrame({'count': counts.to_numpy(dtype='int64')}, index=pd.DatetimeIndex(months, name=index_name))
+        return frame[frame.index.notna()].sort_index()
 
-        incomplete_2025['ended_at'] = pd.to_datetime(incomplete_2025['ended_at'], errors='coerce')
-        tgo_incomplete_per_month = (
-            incomplete_2025
-            .groupby(incomplete_2025['ended_at'].dt.to_period('M').dt.to_timestamp())
-            .agg(count=('ended_at', 'size'))
-        )
-        if not tgo_2025_subs_per_month.empty:
-            print ("TGO subs per month found")
-        if not tgo_canceled_per_month.empty:
-            print ("TGO canceled subs per month found")
-        if not tgo_incomplete_per_month.empty:
-            print ("TGO incomplete subs per month found")
+    def get_tgo_subs(self, selector = 'Total'):
+        """
+        Suscripciones de TGO creadas, canceladas e incompletas por mes para un plan del selector.
+        Se arman a partir de get_tgo_pivot (cacheado): cambiar de plan no consulta la Mongo.
+
+        Parámetros:
+        selector (str): opción del selector de planes ('Total' o una clave de TGO_PLAN_SELECTORS)
+
+        Retorna:
+        tuple: (creadas, canceladas, incompletas), DataFrames con 'count' indexados por mes
+        """
+        pivot = self.get_tgo_pivot()
+        plan = TGO_PLAN_SELECTORS.get(selector)
+        if plan is not None:
+            pivot = pivot[pivot['plan'] == plan]
+
+        tgo_2025_subs_per_month = self._tgo_monthly_counts(pivot, 'created', 'created')
+        tgo_canceled_per_month = self._tgo_monthly_counts(pivot, 'canceled', 'ended_at')
+        tgo_incomplete_per_month = self._tgo_monthly_counts(pivot, 'incomplete_expired', 'ended_at')
         return tgo_2025_subs_per_month, tgo_canceled_per_month, tgo_incomplete_per_month
 
+    @cached(CACHE_TTL_COUNTS)
     def get_tme_active_stripe_subs(self):
         query = {'status': "active"}
         total = self.subscriptions.count_documents(query)
         return total
     
+    @cached(CACHE_TTL_COUNTS)
     def get_tgo_active_stripe_subs(self):
         query = {'status': "active"}
         total = self.tgo_subs.count_documents(query)
         return total
 
+    @cached(CACHE_TTL_COUNTS)
     def get_total_active_mp_subs(self):
-        mp_planes = ['TranscribeMe Plus 10d', 'TranscribeMe Plus discount', 'TranscribeMe Plus 2',
-                 'TranscribeMe Plus', 'TranscribeMe Plus - Anual con 3 meses gratis', 
-                 'TranscribeMe Plus - mensual 20% off']
-        query = {'status': "authorized", "reason":{"$in": mp_planes}}
+        query = {'status': "authorized", "reason":{"$in": MP_PLANES}}
         total = self.subscriptions.count_documents(query)
         return total
-    
-    def get_last_month_mp_income(self):
-        # Fecha de hoy
-        today = date.today()
 
-        # Primer día del mes actual
-        first_day_this_month = today.replace(day=1)
+    @cached(CACHE_TTL_COUNTS)
+    def get_subscription_counts(self):
+        """
+        Suscripciones activas de Stripe (TME) y autorizadas de MP en una sola consulta a subscriptions.
 
-        # Primer día del mes pasado
-        first_day_last_month = (first_day_this_month - timedelta(days=1)).replace(day=1)
+        Retorna:
+        dict: tme_active_stripe_subs y total_active_mp_subs
+        """
+        pipeline = [
+            # El $match previo usa el índice (status, reason); el $facet solo separa los dos conteos
+            {"$match": {"$or": [
+                {"status": "active"},
+                {"status": "authorized", "reason": {"$in": MP_PLANES}},
+            ]}},
+            {"$facet": {
+                "tme_active_stripe_subs": [{"$match": {"status": "active"}}, {"$count": "n"}],
+                "total_active_mp_subs": [{"$match": {"status": "authorized"}}, {"$count": "n"}],
+            }},
+        ]
+        result = next(self.subscriptions.aggregate(pipeline), {})
+        return {key: (result.get(key) or [{"n": 0}])[0]["n"]
+                for key in ("tme_active_stripe_subs", "total_active_mp_subs")}
+
+    def get_last_month_mp_income(self):
+        return self.get_month_mp_income(last_month_key())
+
+    @cached(CACHE_TTL_INCOME)
+    def get_month_mp_income(self, month):
+        """
+        Ingresos aprobados de MP (ARS) de un mes. La clave es el mes, así que la entrada cacheada del mes
+        pasado se deja de usar sola cuando cambia el mes. Con USE_MONTHLY_ROLLUPS los meses que ya no pueden
+        cambiar se leen de los rollups y de mp-payments solo se suman los pagos posteriores a su última corrida.
 
-        # Primer día de este mes = límite superior
-        start_date = first_day_last_month.strftime("%Y-%m-%d")
-        end_date = first_day_this_month.strftime("%Y-%m-%d")
+        Parámetros:
+        month (str): mes 'YYYY-MM'
+        """
+        start_date, end_date = month_bounds(month)
+        if USE_NORMALIZED_DATES:
+            collection, date_range = self.mp_payments_normalized, month_range(month)
+        else:
+            collection, date_range = self.mp_payments, {"$gte": start_date, "$lt": end_date}
+        match = {"status": 'approved', "date_approved": date_range}
+        total = 0
+        rollup = self._read_month_rollup(MONGO_COLLECTION_MP_PAYMENTS, month, 'approved') if USE_MONTHLY_ROLLUPS else None
+        if rollup is not None:
+            docs, last_id = rollup
+            total = sum(doc['amount'] for doc in docs)
+            match["_id"] = {"$gt": last_id}
         pipeline = [
-            {"$match":{
-                "status": 'approved',
-                "date_approved":{"$gte": start_date, "$lt": end_date}
-                }
-            },
+            {"$match": match},
             {"$group":{
                 "_id": None,
                 "total":{"$sum": "$transaction_amount"}
@@ -566,31 +876,62 @@ class SubscriptionMetrics:
                 }
             }
         ]
-        result = list(self.mp_payments.aggregate(pipeline))
-        return result[0]["total"] if result else 0
+        result = list(collection.aggregate(pipeline))
+        return total + (result[0]["total"] if result else 0)
     
     def get_last_month_stripe_income(self):
+        return self.get_month_stripe_income(last_month_key())
+
+    def _rollup_cutoff(self, source):
         """
-        
+        Hasta dónde están completos los rollups de una fuente (ver rollups.py).
+
+        Retorna:
+        tuple: (primer mes 'YYYY-MM' que no se lee de los rollups, último _id procesado) o None si el job
+            todavía no procesó meses de la fuente
         """
-        # Fecha de hoy
-        today = date.today()
+        state = self.rollup_state.find_one({"_id": source})
+        if not state or not state.get("complete_before"):
+            return None
+        return state["complete_before"], state["last_id"]
 
-        # Primer día del mes actual
-        first_day_this_month = today.replace(day=1)
+    def _read_month_rollup(self, source, month, status):
+        """
+        Lee de los rollups mensuales los grupos de un mes completo que el job ya procesó.
 
-        # Primer día del mes pasado
-        first_day_last_month = (first_day_this_month - timedelta(days=1)).replace(day=1)
+        Retorna:
+        tuple: (lista de documentos de rollup, último _id procesado) o None si el mes no está en los rollups
+        """
+        cutoff = self._rollup_cutoff(source)
+        if cutoff is None or month >= cutoff[0]:
+            return None
+        docs = self.monthly_rollups.find({"_id.source": source, "_id.month": month, "_id.status": status})
+        return list(docs), cutoff[1]
+
+    @cached(CACHE_TTL_INCOME)
+    def get_month_stripe_income(self, month):
+        """
+        Ingresos de Stripe (USD) de un mes, con cada moneda convertida a la cotización de ese mes. Con
+        USE_MONTHLY_ROLLUPS los meses que ya procesó el job se leen de los rollups y de stripe-payments
+        solo se suman los pagos posteriores a su última corrida.
 
-        # Primer día de este mes = límite superior
-        start_date = first_day_last_month.strftime("%Y-%m-%d")
-        end_date = first_day_this_month.strftime("%Y-%m-%d")
+        Parámetros:
+        month (str): mes 'YYYY-MM'
+        """
+        start_date, end_date = month_bounds(month)
+        if USE_NORMALIZED_DATES:
+            collection, date_range = self.stripe_payments_normalized, month_range(month)
+        else:
+            collection, date_range = self.stripe_payments, {"$gte": start_date, "$lt": end_date}
+        match = {"status": 'succeeded', "created": date_range}
+        rows = []
+        rollup = self._read_month_rollup(MONGO_COLLECTION_STRIPE_PAYMENTS, month, 'succeeded') if USE_MONTHLY_ROLLUPS else None
+        if rollup is not None:
+            docs, last_id = rollup
+            rows = [{'currency': doc['_id']['currency'], 'total': doc['amount']} for doc in docs]
+            match["_id"] = {"$gt": last_id}
         pipeline = [
-            {"$match":{
-                "status": 'succeeded',
-                "created":{"$gte": start_date, "$lt": end_date}
-                }
-            },
+            {"$match": match},
             {"$group":{
                 '_id': "$currency",
                 "total":{"$sum": "$amount"}
@@ -602,30 +943,19 @@ class SubscriptionMetrics:
                 }
             }
         ]
-        cursor = self.stripe_payments.aggregate(pipeline)
-        df = pd.DataFrame(list(cursor))
-
-        # Conversión de monedas extranjera a USD
-        for idx, row in df.iterrows():
-            currency = row['currency'].upper()
-            amount = row['total']
-            if currency != 'USD':
-                try:
-                    url = f"https://v6.exchangerate-api.com/v6/{API_KEY}/pair/{currency}/USD/{amount}"
-                    response = requests.get(url)
-                    data = response.json()
-            
-                    if data['result'] == 'success':
-                        df.at[idx, 'total'] = data['conversion_result']
-                        df.at[idx, 'currency'] = 'USD'
-                    else:
-                        print(f"Error convirtiendo {currency}: {data}")
-                
-                except Exception as e:
-                    print(f"Error con {currency}: {e}")
+        cursor = collection.aggregate(pipeline)
+        df = pd.DataFrame(rows + list(cursor))
+        if not df.empty:
+            df = df.groupby('currency', as_index=False)['total'].sum()
+
+        # Conversión de monedas extranjera a USD con la cotización del mes
+        if not df.empty:
+            df['total'] = fx_rates.to_usd(df['total'], df['currency'],
+                                          pd.Series(pd.Timestamp(start_date), index=df.index))
         total = float(df['total'].sum()) if not df.empty else 0
         return total
     
+    @cached(CACHE_TTL_RANGE)
     def get_monthly_stripe_payments(self):
         """
         """
@@ -637,23 +967,20 @@ class SubscriptionMetrics:
         # Api para obtener el precio del dólar oficial
         # "https://dolarapi.com/docs/argentina/operations/get-dolar-oficial.html"
         url = "https://dolarapi.com/v1/dolares/oficial"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()  
-        else:
-            print("Error:", response.status_code)
+        try:
+            data = http_client.get_json(url)
+        except Exception as e:
+            print("Error:", e)
             data = {"venta": "No se pudo extraer el valor del dólar, ingrese manualmente"}
         valor_venta_oficial = data['venta']
         return valor_venta_oficial
     
+    @cached(CACHE_TTL_SNAPSHOT)
     def get_mp_planes(self):
-        mp_planes = ['TranscribeMe Plus 10d', 'TranscribeMe Plus discount', 'TranscribeMe Plus 2',
-                 'TranscribeMe Plus', 'TranscribeMe Plus - Anual con 3 meses gratis', 
-                 'TranscribeMe Plus - mensual 20% off']
         pipeline = [
             {"$match": {
                 "status": 'authorized',
-                "reason": {"$in": mp_planes}
+                "reason": {"$in": MP_PLANES}
                 }
             },
             {"$group":{
@@ -680,74 +1007,40 @@ class SubscriptionMetrics:
         Process the Mercado Pago subscriptions data to prepare it for visualization.
 
         Args:
-            data (JSON): Mercado Pago subscriptions data stored in JSON format.
+            data (pd.DataFrame | list): Mercado Pago subscriptions CSV (csv_ingest output or records).
         Returns:
             pd.DataFrame: Processed DataFrame with necessary columns.
         """
-        if not data:
+        if data is None or len(data) == 0:
             print("No MP data provided for processing.")
-            return pd.DataFrame(columns=['month', 'creations_count', 'cancelations_count', 'net_subscriptions'])
-
-        df = pd.DataFrame(data)
-
-        # Separo solo las columnas que me interesan
-        df = df[['status', 'start_date', 'last_charge_date', 'billing_day']].copy()
-
-        # 1. Convertir start_date a datetime
-        df['start_date'] = pd.to_datetime(df['start_date'])
-        df['start_month'] = df['start_date'].dt.to_period('M').dt.to_timestamp()
-
-        # 2. Cuento por mes
-        creations_df = df['start_month'].value_counts().reset_index()
-        creations_df.columns = ['month', 'creations_count']
-
-        # 3. Ordeno cronológicamente
-        creations_df = creations_df.sort_values('month')
-
-        # 4. Filtrar cancelados
-        cancelados_df = df[df['status'] == 'cancelled'].copy()
+            return pd.DataFrame({
+                'month': pd.Series(dtype='datetime64[ns]'),
+                **{column: pd.Series(dtype='int64') for column in ['creations_count', 'cancelations_count', 'net_subscriptions']},
+            })
 
-        # 5. Convertir last_charge_date a datetime
-        cancelados_df['last_charge_date'] = pd.to_datetime(cancelados_df['last_charge_date'])
+        # Conteos mensuales de creaciones y cancelaciones (vencimiento el próximo día 26); se reutilizan
+        # entre pestañas y, si el CSV suma filas al final, solo se procesan las nuevas
+        merged_df = mp_subscriptions.monthly(data)
 
-        # 6. Crear expiration_date: próximo día 26
-        cancelados_df['expiration_date'] = cancelados_df['last_charge_date'].apply(
-            lambda x: pd.Timestamp(
-                year=x.year + (x.month // 12) if x.day >= 26 else x.year,
-                month=(x.month % 12) + 1 if x.day >= 26 else x.month,
-                day=26
-            )
-        )
-
-        # 7. Crear cancelation_month en formato datetime (primer día del mes)
-        cancelados_df['cancelation_month'] = cancelados_df['expiration_date'].dt.to_period('M').dt.to_timestamp()
-
-        # 8. Agrupar cancelaciones por mes
-        cancelados_df = cancelados_df['cancelation_month'].value_counts().reset_index()
-        cancelados_df.columns = ['month', 'cancelations_count']
-        cancelados_df = cancelados_df.sort_values('month')
-
-        # 9. Unir creaciones y cancelaciones
-        merged_df = pd.merge(
-            creations_df,
-            cancelados_df,
-            on='month',
-            how='left'
-        ).fillna(0)
-
-        # 10. Calcular suscripciones netas
+        # Calcular suscripciones netas
         merged_df['net_subscriptions'] = merged_df['creations_count'] - merged_df['cancelations_count']
 
-        # 11. Filtrar solo los meses de 2025
+        # Filtrar solo los meses de 2025
         merged_df = merged_df[merged_df['month'].dt.year == 2025]
 
         return merged_df
 
     
+    @cached(CACHE_TTL_RANGE)
     def get_mp_payments(self, start, end):
+        # Con fechas normalizadas el rango incluye el día 'end' completo de BUSINESS_TIMEZONE
+        if USE_NORMALIZED_DATES:
+            collection, date_range = self.mp_payments_normalized, day_range(start, end)
+        else:
+            collection, date_range = self.mp_payments, {"$gte": start, "$lte": end}
         pipeline = [
             {"$match":{
-                "date_created":{"$gte": start, "$lte": end}
+                "date_created": date_range
                 }
             },
             {"$project": {
@@ -761,15 +1054,44 @@ class SubscriptionMetrics:
                 }
             }
         ]
-        result = list(self.mp_payments.aggregate(pipeline))
-        if not result:
+        df = aggregate_frame(collection, pipeline, MP_PAYMENTS_SCHEMA)
+        if USE_NORMALIZED_DATES:
+            to_business_time(df, ['date_created', 'date_approved'])
+        if df.empty:
             print ("No se encontraron datos entre la fecha ingresada")
-        df = pd.DataFrame(result)
-
-        if not df.empty:
+        else:
             print ("MP payments found")
         return df 
 
+    @cached(CACHE_TTL_RANGE)
+    def get_mp_payments_frame(self, start, end):
+        """
+        Pagos de MP del rango ya preparados para los charts y los ingresos: se consultan una sola vez
+        (get_mp_payments, cacheado) y se tipan una sola vez.
+
+        Parámetros:
+        start (str): fecha de inicio 'YYYY-MM-DD'
+        end (str): fecha de fin 'YYYY-MM-DD'
+
+        Retorna:
+        pd.DataFrame: columnas de get_mp_payments con date_created/date_approved como datetime, más
+            description_class (categórica: Suscripciones, Plan de 3 meses, Recargas de tokens, ...),
+            approved (bool) y created_month/approved_month (primer día del mes)
+        """
+        # get_mp_payments ya trae las fechas parseadas (MP_PAYMENTS_SCHEMA)
+        df = self.get_mp_payments(start, end)
+        df['created_month'] = df['date_created'].dt.to_period('M').dt.to_timestamp()
+        df['approved_month'] = df['date_approved'].dt.to_period('M').dt.to_timestamp()
+
+        description = df['description'].astype(object)
+        description_class = description.map(MP_PAYMENT_CLASSES).fillna(description)
+        is_subscription = description.str.startswith(MP_PAYMENT_SUBSCRIPTION_PREFIX, na=False)
+        description_class[is_subscription] = 'Suscripciones'
+        df['description_class'] = description_class.astype('category')
+
+        df['approved'] = df['status'] == 'approved'
+        return df
+
     def get_totales_por_mes(self, mp_df, stripe_creations_df, stripe_cancels_df, stripe_incomplete_df,
                             tgo_subs_per_month, tgo_canceled_per_month, tgo_incomplete_per_month):
         """
@@ -821,11 +1143,22 @@ class SubscriptionMetrics:
 
         return merged[['month', 'total_creations', 'total_cancellations', 'total_incomplete', 'net_total']]
 
+    def _stripe_payments_range(self, start, end):
+        """
+        Colección y condición sobre 'created' para los pagos de Stripe entre start y end ('YYYY-MM-DD').
+        Con fechas normalizadas el rango incluye el día 'end' completo de BUSINESS_TIMEZONE.
+        """
+        if USE_NORMALIZED_DATES:
+            return self.stripe_payments_normalized, day_range(start, end)
+        return self.stripe_payments, {"$gte": start, "$lt": end}
+
+    @cached(CACHE_TTL_RANGE)
     def get_stripe_succeeded_subscription_payments (self, start, end):
+        collection, date_range = self._stripe_payments_range(start, end)
         pipeline = [
             {"$match":{
                 "status": 'succeeded',
-                "created":{"$gte": start, "$lt": end},
+                "created": date_range,
                 'statement_descriptor': {"$ne": None},
                 }
             },
@@ -838,10 +1171,11 @@ class SubscriptionMetrics:
                 }
             }
         ]
-        result = list(self.stripe_payments.aggregate(pipeline))
-        if not result:
+        df = aggregate_frame(collection, pipeline, STRIPE_SUBSCRIPTION_PAYMENTS_SCHEMA)
+        if USE_NORMALIZED_DATES:
+            to_business_time(df, ['created'])
+        if df.empty:
             print ("No se encontraron datos entre la fecha ingresada")
-        df = pd.DataFrame(result)
 
         descriptions = {
             'Plan Basic': 1.5,
@@ -864,16 +1198,18 @@ class SubscriptionMetrics:
         amount_to_desc = {v: k for k, v in descriptions.items()}
 
         # Crear la nueva columna en df
-        df['description'] = df['amount'].map(amount_to_desc).fillna('Recarga')
+        df['description'] = df['amount'].map(amount_to_desc).fillna('Recarga').astype('category')
         if not df.empty:
             print ("Stripe succeeded subscription payments found")
         return df 
     
+    @cached(CACHE_TTL_RANGE)
     def get_stripe_succeeded_extra_credit_payments (self, start, end):
+        collection, date_range = self._stripe_payments_range(start, end)
         pipeline = [
             {"$match":{
                 "status": 'succeeded',
-                "created":{"$gte": start, "$lt": end},
+                "created": date_range,
                 "statement_descriptor": {"$eq": None},
                 }
             },
@@ -885,38 +1221,23 @@ class SubscriptionMetrics:
                 }
             }
         ]
-        result = list(self.stripe_payments.aggregate(pipeline))
-        if not result:
+        df = aggregate_frame(collection, pipeline, STRIPE_EXTRA_CREDIT_PAYMENTS_SCHEMA)
+        if USE_NORMALIZED_DATES:
+            to_business_time(df, ['created'])
+        if df.empty:
             print ("No se encontraron datos entre la fecha ingresada")
-        df = pd.DataFrame(result)
 
-        df['created'] = pd.to_datetime(df['created'])
         df_per_month = (
             df
-            .groupby([df['created'].dt.to_period('M').dt.to_timestamp(), 'currency'])
+            .groupby([df['created'].dt.to_period('M').dt.to_timestamp(), 'currency'], observed=True)
             .agg(income=('amount', 'sum'))
             .reset_index()
         )
-        # Conversión de monedas extranjera a USD
-        for idx, row in df_per_month.iterrows():
-            currency = row['currency'].upper()
-            amount = row['income']
-            if currency != 'USD':
-                try:
-                    url = f"https://v6.exchangerate-api.com/v6/{API_KEY}/pair/{currency}/USD/{amount}"
-                    response = requests.get(url)
-                    data = response.json()
-            
-                    if data['result'] == 'success':
-                        df_per_month.at[idx, 'income'] = data['conversion_result']
-                        df_per_month.at[idx, 'currency'] = 'USD'
-                    else:
-                        print(f"Error convirtiendo {currency}: {data}")
-                
-                except Exception as e:
-                    print(f"Error con {currency}: {e}")
-
-        df_per_month['created'] = pd.to_datetime(df_per_month['created'])
+        # Conversión de monedas extranjera a USD con la cotización de cada mes
+        if not df_per_month.empty:
+            df_per_month['income'] = fx_rates.to_usd(df_per_month['income'], df_per_month['currency'],
+                                                     df_per_month['created'])
+
         df_per_month = (
             df_per_month
             .groupby(df_per_month['created'].dt.to_period('M').dt.to_timestamp())
@@ -930,20 +1251,22 @@ class SubscriptionMetrics:
     
 
     def total_income (self, mp_payments, stripe_subs_payments, extra_credit_income):
-        mp_income = mp_payments.copy()
+        # mp_payments es la salida de get_mp_payments_frame (fechas y meses ya calculados)
         stripe_subs_income = stripe_subs_payments.copy()
         stripe_extra_income = extra_credit_income.copy()
-        dolar = self.get_dolar_argentina()
-        mp_income['date_approved'] = pd.to_datetime(mp_income['date_approved'])
-        stripe_subs_income['created'] = pd.to_datetime(stripe_subs_income['created'])
-        stripe_extra_income['created'] = pd.to_datetime(stripe_extra_income['created'])
+        # Las fechas ya vienen como datetime de los schemas de carga
 
         mp_income_per_month = (
-            mp_income
-            .groupby(mp_income['date_approved'].dt.to_period('M').dt.to_timestamp())
+            mp_payments
+            .groupby('approved_month')
             .agg(mp_income=('transaction_amount', 'sum'))
             .reset_index()
+            .rename(columns={'approved_month': 'date_approved'})
         )
+        # Cada mes se pasa a USD con el dólar oficial promedio de ese mes
+        dolar = ars_rates.monthly_rates(mp_income_per_month['date_approved'])
+        if dolar.isna().any():
+            dolar = dolar.fillna(float(self.get_dolar_argentina()))
         mp_income_per_month['mp_income'] = round(mp_income_per_month['mp_income'] / dolar, 2)
 
         stripe_subs_income_per_month = (
@@ -963,6 +1286,7 @@ class SubscriptionMetrics:
         total = total.rename(columns={'date_approved': 'month', 'income': 'extra_credit_income'})   
         return total
     
+    @cached(CACHE_TTL_RANGE)
     def get_tgo_onboardings_info(self):
         pipeline = [
             {"$project":{
@@ -984,6 +1308,7 @@ class SubscriptionMetrics:
             print ('No TGO onboardings found')
             return pd.DataFrame() 
 
+    @cached(CACHE_TTL_SNAPSHOT)
     def get_mongo_recovery_data(self):
         docs = list(self.stripe_recovery.find())
         df = pd.DataFrame(docs)
@@ -0,0 +1,48 @@
+"""
+Fixtures compartidas de las pruebas (dependencias en requirements-dev.txt).
+
+Las pruebas que necesitan una Mongo real se saltean si no hay una disponible:
+    MONGO_TEST_URI              mongod local (explain() de mongo_indexes)
+    MONGO_TEST_REPLSET_URI      replica set local (change streams de live_counters)
+Las dos bases se llenan y se vacían en cada prueba: no apuntarlas a una Mongo con datos reales.
+"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongo_client  # noqa: E402
+from metrics_cache import metrics_cache  # noqa: E402
+
+
+def real_mongo_client(env_var, replica_set=False):
+    """MongoClient de la URI de env_var, o skip si no está definida, no responde o no es un replica set."""
+    uri = os.getenv(env_var)
+    if not uri:
+        pytest.skip(f"{env_var} no está definida")
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+    client = MongoClient(uri, serverSelectionTimeoutMS=1000)
+    try:
+        hello = client.admin.command('hello')
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"No hay una Mongo en {uri}: {e}")
+    if replica_set and 'setName' not in hello:
+        client.close()
+        pytest.skip(f"{uri} no es un replica set")
+    return client
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    """Hace que todos los módulos usen el cliente indicado en vez del de MONGO_URI."""
+    def install(client, *modules):
+        monkeypatch.setattr(mongo_client, 'get_client', lambda uri=None: client)
+        for module in modules:
+            monkeypatch.setattr(module, 'get_client', lambda uri=None: client)
+        metrics_cache.invalidate()
+        return client
+    yield install
+    metrics_cache.invalidate()
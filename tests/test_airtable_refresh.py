@@ -0,0 +1,71 @@
+"""Publicación de los snapshots de Airtable (airtable_refresh.py)."""
+import os
+import sys
+import types
+import pandas as pd
+import pytest
+from airtable_refresh import AirtableRefresher, SNAPSHOT_FRAMES
+from dataset_store import DatasetStore
+
+
+def _frames(rows):
+    return {name: pd.DataFrame({'rows': [rows] * rows}) for name in SNAPSHOT_FRAMES}
+
+
+@pytest.fixture
+def refresher(tmp_path, monkeypatch):
+    builds = []
+    fake = types.ModuleType('components.airtable')
+    def build_snapshot():
+        if isinstance(builds[0], Exception):
+            raise builds.pop(0)
+        return builds.pop(0)
+    fake.build_snapshot = build_snapshot
+    monkeypatch.setitem(sys.modules, 'components.airtable', fake)
+    refresher = AirtableRefresher(lock_path=str(tmp_path / 'refresh.lock'), snapshot_dir=str(tmp_path / 'snapshots'))
+    # Sin hilo de refresco: los tests llaman a refresh() a mano
+    monkeypatch.setattr(refresher, 'start', lambda: None)
+    refresher.builds = builds
+    return refresher
+
+
+def test_no_snapshot_before_the_first_refresh(refresher):
+    assert refresher.snapshot() is None
+
+
+def test_snapshot_survives_ttl_and_sweep_of_the_dataset_store(refresher, tmp_path):
+    refresher.builds.append(_frames(2))
+    refresher.refresh()
+    snapshot_dir = os.path.join(refresher.store.root, refresher._current_id())
+    os.utime(snapshot_dir, (0, 0))
+    # Un store de datasets con TTL sobre el mismo directorio lo barrería; el de los snapshots no vence
+    users_store = DatasetStore(root=str(tmp_path / 'datasets'), ttl=1)
+    users_store.put_many({'df': pd.DataFrame({'a': [1]})})
+    users_store.sweep()
+    refresher.store.sweep()
+    assert len(refresher.snapshot()['records']) == 2
+
+
+def test_each_refresh_publishes_a_whole_new_snapshot(refresher):
+    refresher.builds.extend([_frames(1), _frames(2), _frames(3)])
+    refresher.refresh()
+    first_id = refresher._current_id()
+    refresher.refresh()
+    second_id = refresher._current_id()
+    assert second_id != first_id
+    # Un worker que leyó el puntero antes del refresco sigue encontrando el snapshot completo anterior
+    assert all(len(refresher.store.get(first_id, name)) == 1 for name in SNAPSHOT_FRAMES)
+    snapshot = refresher.snapshot()
+    assert all(len(snapshot[name]) == 2 for name in SNAPSHOT_FRAMES)
+    refresher.refresh()
+    # Solo se conservan el snapshot vigente y el anterior
+    assert sorted(entry.name for entry in os.scandir(refresher.store.root) if entry.is_dir()) == \
+        sorted([second_id, refresher._current_id()])
+
+
+def test_failed_refresh_keeps_the_previous_snapshot(refresher):
+    refresher.builds.extend([_frames(2), RuntimeError('Airtable no responde')])
+    refresher.refresh()
+    with pytest.raises(RuntimeError):
+        refresher.refresh()
+    assert len(refresher.snapshot()['funnel']) == 2
@@ -0,0 +1,53 @@
+import base64
+import csv_ingest
+from csv_ingest import ingest_csvs
+
+HEADER = 'id,status,start_date,last_charge_date,billing_day,reason\n'
+
+
+def _content(text):
+    return 'data:text/csv;base64,' + base64.b64encode(text.encode()).decode('ascii')
+
+
+def _row(_id, status='authorized', billing_day='5'):
+    return f'{_id},{status},2025-01-05T10:00:00.000-04:00,2025-03-05T10:00:00.000-04:00,{billing_day},TranscribeMe Plus\n'
+
+
+def test_drops_repeated_ids_within_and_across_files():
+    first = _content(HEADER + _row('a') + _row('b') + _row('a', status='paused'))
+    second = _content(HEADER + _row('b', status='cancelled') + _row('c'))
+    table, stats = ingest_csvs([first, second], 'mp_subscriptions')
+    assert table.column('id').to_pylist() == ['a', 'b', 'c']
+    # Se conserva la última fila de cada id: la exportación más nueva manda
+    assert table.column('status').to_pylist() == ['paused', 'cancelled', 'authorized']
+    assert (stats['rows'], stats['duplicates']) == (3, 2)
+
+
+def test_rows_without_id_are_only_dropped_when_identical():
+    rows = _row('', status='cancelled') + _row('', status='authorized') + _row('', status='cancelled')
+    table, stats = ingest_csvs([_content(HEADER + rows + _row('a'))], 'mp_subscriptions')
+    assert table.column('id').to_pylist() == [None, None, 'a']
+    assert table.column('status').to_pylist() == ['authorized', 'cancelled', 'authorized']
+    assert (stats['rows'], stats['duplicates']) == (3, 1)
+
+
+def test_dedup_across_blocks(monkeypatch):
+    monkeypatch.setattr(csv_ingest, 'MIN_BLOCK_SIZE', 256)
+    rows = [_row(f'id{i % 50}') for i in range(200)]
+    table, stats = ingest_csvs([_content(HEADER + ''.join(rows))], 'mp_subscriptions', block_size=256)
+    assert (stats['rows'], stats['duplicates']) == (50, 150)
+    assert table.column('id').to_pylist() == [f'id{i}' for i in range(50)]
+
+
+def test_billing_day_accepts_blank_and_decimal_values():
+    content = _content(HEADER + _row('a', billing_day='') + _row('b', billing_day='15.0'))
+    table, _ = ingest_csvs([content], 'mp_subscriptions')
+    assert table.column('billing_day').to_pylist() == [None, 15.0]
+
+
+def test_recovery_rows_are_not_deduplicated():
+    header = 'charge_id,initial_payment_failed_at,initial_failed_amount,recovered_amount\n'
+    rows = 'ch_1,2025-01-01,10.0,10.0\nch_1,2025-01-01,10.0,10.0\n,2025-01-01,10.0,0.0\n'
+    table, stats = ingest_csvs([_content(header + rows)], 'stripe_recovery')
+    assert (stats['rows'], stats['duplicates']) == (3, 0)
+    assert sum(table.column('initial_failed_amount').to_pylist()) == 30.0
@@ -0,0 +1,183 @@
+"""
+Pruebas de live_counters.
+
+Las de _apply y la del reinicio desde el estado guardado corren sobre mongomock. La del watcher
+necesita un replica set de un solo nodo:
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27018 &
+    mongosh --port 27018 --eval "rs.initiate()"
+    MONGO_TEST_REPLSET_URI="mongodb://localhost:27018/?replicaSet=rs0" python -m pytest tests/test_live_counters.py
+"""
+import threading
+import time
+from datetime import date
+import mongomock
+import pytest
+import live_counters
+import subs_metrics
+from config import MONGO_DB_TME_CHARTS, MONGO_COLLECTION_MP_PAYMENTS
+from conftest import real_mongo_client
+
+THIS_MONTH = date.today().strftime('%Y-%m')
+APPROVED_AT = date.today().replace(day=1).strftime('%Y-%m-%dT10:00:00.000-04:00')
+
+
+def _payment(_id, amount, status='approved'):
+    return {'_id': _id, 'status': status, 'date_approved': APPROVED_AT, 'transaction_amount': amount}
+
+
+def _event(operation, doc=None, updated_fields=None, _id=None):
+    event = {
+        'ns': {'db': MONGO_DB_TME_CHARTS, 'coll': MONGO_COLLECTION_MP_PAYMENTS},
+        'operationType': operation,
+        'documentKey': {'_id': _id if _id is not None else (doc or {}).get('_id')},
+    }
+    if doc is not None:
+        event['fullDocument'] = doc
+    if updated_fields is not None:
+        event['updateDescription'] = {'updatedFields': updated_fields}
+    return event
+
+
+@pytest.fixture
+def counters(use_client, tmp_path):
+    client = use_client(mongomock.MongoClient(), live_counters, subs_metrics)
+    payments = client[MONGO_DB_TME_CHARTS][MONGO_COLLECTION_MP_PAYMENTS]
+    watcher = live_counters.LiveCounters(state_path=str(tmp_path / 'state.json'))
+    watcher.counters = watcher._baseline()
+    return watcher, payments
+
+
+def _mp_income(watcher):
+    return watcher.counters['mp_income_by_month'].get(THIS_MONTH, 0)
+
+
+def test_insert_approved_adds_income(counters):
+    watcher, payments = counters
+    payments.insert_one(_payment(1, 100))
+    watcher._apply(_event('insert', _payment(1, 100)))
+    assert _mp_income(watcher) == 100
+
+
+def test_status_reset_to_approved_does_not_add_twice(counters):
+    watcher, payments = counters
+    payments.insert_one(_payment(1, 100))
+    watcher._apply(_event('insert', _payment(1, 100)))
+    watcher._apply(_event('update', _payment(1, 100), {'status': 'approved'}))
+    assert _mp_income(watcher) == 100
+
+
+def test_refund_and_delete_subtract_income(counters):
+    watcher, payments = counters
+    payments.insert_many([_payment(1, 100), _payment(2, 50)])
+    watcher._apply(_event('insert', _payment(1, 100)))
+    watcher._apply(_event('insert', _payment(2, 50)))
+
+    payments.update_one({'_id': 1}, {'$set': {'status': 'refunded'}})
+    watcher._apply(_event('update', _payment(1, 100, 'refunded'), {'status': 'refunded'}))
+    assert _mp_income(watcher) == 50
+
+    payments.delete_one({'_id': 2})
+    watcher._apply(_event('delete', _id=2))
+    assert _mp_income(watcher) == 0
+
+
+def test_events_already_in_baseline_are_not_counted_twice(counters):
+    watcher, payments = counters
+    payments.insert_one(_payment(1, 100))
+    watcher.counters = watcher._baseline()
+    # El stream repite el insert que la línea base ya había visto
+    watcher._apply(_event('insert', _payment(1, 100)), recount=True)
+    assert _mp_income(watcher) == 100
+
+
+class _FakeStream:
+    """Change stream de mongomock (que no tiene watch): entrega los eventos y después para el watcher."""
+    def __init__(self, watcher, events):
+        self.watcher = watcher
+        self.events = list(events)
+        self.alive = True
+        self.resume_token = {'_data': 'token-1'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        if not self.events:
+            self.watcher.stop()
+            return None
+        self.resume_token = {'_data': f"token-{int(self.resume_token['_data'].split('-')[1]) + 1}"}
+        return self.events.pop(0)
+
+
+def test_restart_resumes_from_the_stored_state(counters, monkeypatch):
+    watcher, payments = counters
+    payments.insert_one(_payment(1, 100))
+    watcher._apply(_event('insert', _payment(1, 100)))
+    watcher.resume_token = {'_data': 'token-1'}
+    watcher._save_state()
+
+    # Reinicio: un watcher nuevo sobre el mismo archivo de estado
+    restarted = live_counters.LiveCounters(state_path=watcher.state_path)
+    def no_baseline():
+        raise AssertionError('con un estado guardado no se recalcula la línea base')
+    monkeypatch.setattr(restarted, '_baseline', no_baseline)
+    starts = []
+    def watch(pipeline, **kwargs):
+        starts.append(kwargs)
+        return _FakeStream(restarted, [_event('insert', _payment(2, 50))])
+    monkeypatch.setattr(payments.database.client, 'watch', watch, raising=False)
+
+    payments.insert_one(_payment(2, 50))
+    restarted._watch()
+    assert starts[0]['resume_after'] == {'_data': 'token-1'}
+    assert 'start_at_operation_time' not in starts[0]
+    assert _mp_income(restarted) == 150
+
+    # El estado guardado avanza con el stream: el próximo reinicio sigue desde el token nuevo
+    state = restarted._load_stored_state()
+    assert state['resume_token'] == {'_data': 'token-2'}
+    assert state['counters']['mp_income_by_month'][THIS_MONTH] == 150
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_watcher_on_replica_set(use_client, tmp_path, monkeypatch):
+    client = use_client(real_mongo_client('MONGO_TEST_REPLSET_URI', replica_set=True), live_counters, subs_metrics)
+    payments = client[MONGO_DB_TME_CHARTS][MONGO_COLLECTION_MP_PAYMENTS]
+    payments.delete_many({})
+    watcher = live_counters.LiveCounters(state_path=str(tmp_path / 'state.json'))
+
+    # Un pago que se escribe mientras se calcula la línea base no se cuenta dos veces
+    baseline = watcher._baseline
+    def baseline_with_concurrent_insert():
+        payments.insert_one(_payment(1, 100))
+        return baseline()
+    monkeypatch.setattr(watcher, '_baseline', baseline_with_concurrent_insert)
+
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    try:
+        assert _wait_for(lambda: watcher.counters is not None)
+        payments.insert_one(_payment(2, 50))
+        assert _wait_for(lambda: _mp_income(watcher) == 150)
+
+        payments.update_one({'_id': 2}, {'$set': {'status': 'refunded'}})
+        assert _wait_for(lambda: _mp_income(watcher) == 100)
+
+        payments.delete_one({'_id': 1})
+        assert _wait_for(lambda: _mp_income(watcher) == 0)
+    finally:
+        watcher.stop()
+        thread.join(timeout=5)
+        payments.delete_many({})
+        client.close()
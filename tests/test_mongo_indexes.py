@@ -0,0 +1,40 @@
+"""
+Planes de consulta de SubscriptionMetrics (mongo_indexes.verify_query_plans) contra un mongod local:
+    MONGO_TEST_URI="mongodb://localhost:27017" python -m pytest tests/test_mongo_indexes.py
+"""
+import os
+from pymongo import MongoClient
+import mongo_client
+import mongo_indexes
+import subs_metrics
+from conftest import real_mongo_client
+from metrics_cache import metrics_cache
+
+
+def test_dashboard_queries_use_indexes(monkeypatch):
+    real_mongo_client('MONGO_TEST_URI').close()
+    uri = os.environ['MONGO_TEST_URI']
+
+    clients = []
+    def client_after_listener(_uri=None):
+        # verify_query_plans registra su listener al empezar y solo ve los clientes creados después
+        if not clients:
+            clients.append(MongoClient(uri))
+        return clients[0]
+    monkeypatch.setattr(mongo_client, 'get_client', client_after_listener)
+    monkeypatch.setattr(subs_metrics, 'get_client', client_after_listener)
+    metrics_cache.invalidate()
+
+    databases = {db_name for db_name, _ in mongo_indexes.INDEX_SPECS}
+    try:
+        # Los índices crean las colecciones: sobre una colección inexistente explain() no elige plan
+        mongo_indexes.create_indexes(uri)
+        assert mongo_indexes.verify_query_plans('2025-01-01', '2025-03-31') == []
+    finally:
+        metrics_cache.invalidate()
+        cleanup = MongoClient(uri)
+        for db_name in databases:
+            cleanup.drop_database(db_name)
+        cleanup.close()
+        for client in clients:
+            client.close()
@@ -0,0 +1,49 @@
+"""Conversión de lotes de documentos a columnas tipadas (mongo_loader.py)."""
+import datetime
+import pandas as pd
+from mongo_loader import frame_from_cursor
+
+
+def _dates(values, batch_size=10):
+    docs = [{'timestamp': value} for value in values]
+    return frame_from_cursor(docs, {'timestamp': 'datetime'}, batch_size=batch_size)['timestamp']
+
+
+def test_mixed_iso_forms_in_one_batch():
+    parsed = _dates([
+        '2025-01-02T00:00:00.000Z',
+        '2025-01-02T00:00:00Z',
+        '2025-01-02T00:00:00.123Z',
+        '2025-01-02T00:00:00.000-03:00',
+        '2025-01-02',
+    ])
+    assert str(parsed.dt.tz) == 'UTC'
+    assert parsed.dt.tz_convert(None).tolist() == [
+        pd.Timestamp('2025-01-02 00:00:00'),
+        pd.Timestamp('2025-01-02 00:00:00'),
+        pd.Timestamp('2025-01-02 00:00:00.123'),
+        pd.Timestamp('2025-01-02 03:00:00'),
+        pd.Timestamp('2025-01-02 00:00:00'),
+    ]
+
+
+def test_invalid_values_become_nat_without_failing_the_batch():
+    parsed = _dates(['no es una fecha', None, '2025-01-02T10:00:00.000Z', 12, ''])
+    assert parsed.isna().tolist() == [True, True, False, True, True]
+    assert parsed.iloc[2] == pd.Timestamp('2025-01-02 10:00:00', tz='UTC')
+
+
+def test_offset_of_the_first_batch_is_kept_across_batches():
+    parsed = _dates(['2025-01-02T00:00:00.000-03:00', '2025-01-02T00:00:00.000Z'], batch_size=1)
+    assert str(parsed.dt.tz) == 'UTC-03:00'
+    assert parsed.dt.tz_convert('UTC').tolist() == [
+        pd.Timestamp('2025-01-02 03:00:00', tz='UTC'),
+        pd.Timestamp('2025-01-02 00:00:00', tz='UTC'),
+    ]
+
+
+def test_bson_dates_stay_naive():
+    parsed = _dates([datetime.datetime(2025, 1, 2, 10), None])
+    assert parsed.dt.tz is None
+    assert parsed.iloc[0] == pd.Timestamp('2025-01-02 10:00:00')
+    assert pd.isna(parsed.iloc[1])
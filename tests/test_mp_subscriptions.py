@@ -0,0 +1,87 @@
+"""Serie mensual de suscripciones de MP a partir del CSV exportado (mp_subscriptions.py)."""
+import pandas as pd
+import pytest
+import mp_subscriptions
+from mp_subscriptions import MpSubscriptionsMonthly, cancelation_months
+
+
+def _baseline_expiration(x):
+    # Regla que reemplazó cancelation_months (process_mp_subscriptions_data antes de vectorizarse)
+    return x.replace(
+        year=x.year + (x.month // 12) if x.day >= 26 else x.year,
+        month=(x.month % 12) + 1 if x.day >= 26 else x.month,
+        day=26,
+    )
+
+
+def test_cancelation_months_match_the_baseline_rule():
+    # Todos los días alrededor del 26 y del cambio de año, a distintas horas
+    charges = pd.Series(pd.date_range('2024-10-20 00:00', '2025-03-05 23:59', freq='13h'))
+    expected = charges.apply(_baseline_expiration).dt.to_period('M').dt.to_timestamp()
+    pd.testing.assert_series_equal(cancelation_months(charges), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('charge, month', [
+    ('2025-03-25 23:59', '2025-03-01'),
+    ('2025-03-26 00:00', '2025-04-01'),
+    ('2024-12-26 10:00', '2025-01-01'),
+    ('2024-12-31 23:00', '2025-01-01'),
+    ('2025-01-01 00:00', '2025-01-01'),
+])
+def test_cancelation_month_boundaries(charge, month):
+    assert cancelation_months(pd.Series(pd.to_datetime([charge])))[0] == pd.Timestamp(month)
+
+
+def test_cancelation_month_without_last_charge_is_nat():
+    assert cancelation_months(pd.Series(pd.to_datetime([None, '2025-01-10'])))[0] is pd.NaT
+
+
+def _rows(n, offset=0, status='authorized'):
+    rows = []
+    for i in range(offset, offset + n):
+        month = i % 12 + 1
+        rows.append({
+            'status': 'cancelled' if i % 3 == 0 else status,
+            'start_date': f'2025-{month:02d}-{i % 28 + 1:02d}T10:00:00.000-03:00',
+            'last_charge_date': f'2025-{month:02d}-{(i * 7) % 28 + 1:02d}T10:00:00.000-03:00',
+            'billing_day': float(i % 28 + 1),
+        })
+    return rows
+
+
+@pytest.fixture
+def processed_rows(monkeypatch):
+    """Cantidad de filas que procesa _monthly_counts en cada llamada."""
+    calls = []
+    monthly_counts = mp_subscriptions._monthly_counts
+    def spy(df):
+        calls.append(len(df))
+        return monthly_counts(df)
+    monkeypatch.setattr(mp_subscriptions, '_monthly_counts', spy)
+    return calls
+
+
+def test_appended_rows_match_a_full_recompute(processed_rows):
+    cache = MpSubscriptionsMonthly()
+    cache.monthly(_rows(40))
+    appended = cache.monthly(_rows(40) + _rows(15, offset=40))
+    # Solo se procesan las filas nuevas
+    assert processed_rows == [40, 15]
+    pd.testing.assert_frame_equal(appended, MpSubscriptionsMonthly().monthly(_rows(55)))
+
+
+def test_changed_row_in_prefix_forces_a_full_recompute(processed_rows):
+    cache = MpSubscriptionsMonthly()
+    cache.monthly(_rows(40))
+    changed = _rows(40) + _rows(15, offset=40)
+    changed[5] = {**changed[5], 'status': 'cancelled', 'last_charge_date': '2025-06-27T10:00:00.000-03:00'}
+    result = cache.monthly(changed)
+    assert processed_rows == [40, 55]
+    pd.testing.assert_frame_equal(result, MpSubscriptionsMonthly().monthly(changed))
+
+
+def test_same_csv_is_served_from_the_cache(processed_rows):
+    cache = MpSubscriptionsMonthly()
+    first = cache.monthly(_rows(30))
+    pd.testing.assert_frame_equal(cache.monthly(pd.DataFrame(_rows(30))), first)
+    assert processed_rows == [30]
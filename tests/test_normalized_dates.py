@@ -0,0 +1,48 @@
+"""Copias con fechas normalizadas (normalized_dates.py), sobre mongomock."""
+import mongomock
+import pytest
+import normalized_dates
+from config import (
+    MONGO_DB_TME_CHARTS,
+    MONGO_COLLECTION_MP_PAYMENTS,
+    MONGO_DB_ANALYTICS,
+    MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED,
+)
+
+SOURCE = MONGO_COLLECTION_MP_PAYMENTS
+
+
+@pytest.fixture
+def client(use_client, monkeypatch):
+    # mongomock no tiene $type: las fechas se copian sin convertir (acá solo importa qué documentos se copian)
+    monkeypatch.setattr(normalized_dates, '_copy_pipeline', lambda spec, match: [
+        {'$match': match},
+        {'$project': {field: 1 for field in spec['fields'] + spec['date_fields']}},
+    ])
+    return use_client(mongomock.MongoClient(), normalized_dates)
+
+
+def _copy(client, _id):
+    return client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_MP_PAYMENTS_NORMALIZED].find_one({'_id': _id})
+
+
+def test_payment_approved_in_place_reaches_the_copy(client, monkeypatch):
+    monkeypatch.setattr(normalized_dates, '_mutable_window_start', lambda: '2025-02')
+    payments = client[MONGO_DB_TME_CHARTS][MONGO_COLLECTION_MP_PAYMENTS]
+    payments.insert_many([
+        {'_id': 1, 'date_created': '2025-03-10T10:00:00.000-03:00', 'date_approved': None,
+         'status': 'pending', 'transaction_amount': 100},
+        {'_id': 2, 'date_created': '2025-01-10T10:00:00.000-03:00', 'date_approved': None,
+         'status': 'pending', 'transaction_amount': 50},
+    ])
+    normalized_dates.run_incremental(SOURCE)
+    assert _copy(client, 1)['status'] == 'pending'
+
+    # Sin _id nuevos: los pagos de la ventana se vuelven a copiar, los anteriores no
+    for _id in (1, 2):
+        payments.update_one({'_id': _id}, {'$set': {'status': 'approved',
+                                                    'date_approved': '2025-03-11T10:00:00.000-03:00'}})
+    normalized_dates.run_incremental(SOURCE)
+    copy = _copy(client, 1)
+    assert copy['status'] == 'approved' and copy['date_approved'] is not None
+    assert _copy(client, 2)['status'] == 'pending'
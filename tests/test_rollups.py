@@ -0,0 +1,183 @@
+"""Rollups mensuales (rollups.py) y su lectura desde SubscriptionMetrics, sobre mongomock."""
+import mongomock
+import pandas as pd
+import pytest
+import rollups
+import subs_metrics
+from config import (
+    MONGO_DB_USERS,
+    MONGO_COLLECTION_STRIPE_UPDATES,
+    MONGO_DB_ANALYTICS,
+    MONGO_COLLECTION_MONTHLY_ROLLUPS,
+    MONGO_COLLECTION_ROLLUP_STATE,
+)
+from metrics_cache import metrics_cache
+
+SOURCE = MONGO_COLLECTION_STRIPE_UPDATES
+
+
+@pytest.fixture
+def client(use_client):
+    return use_client(mongomock.MongoClient(), rollups, subs_metrics)
+
+
+def _event(client, timestamp, description='new_subscription'):
+    client[MONGO_DB_USERS][MONGO_COLLECTION_STRIPE_UPDATES].insert_one(
+        {'timestamp': timestamp, 'description': description, 'user_id': 'u'})
+
+
+def _counts(client):
+    docs = client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_MONTHLY_ROLLUPS].find({'_id.source': SOURCE})
+    return {(doc['_id']['month'], doc['_id']['status']): doc['count'] for doc in docs}
+
+
+def test_rerun_after_crash_before_saving_state_does_not_double_count(client):
+    _event(client, '2025-01-10T10:00:00.000Z')
+    _event(client, '2025-01-20T10:00:00.000Z', 'subscription_cancelled')
+    rollups.run_incremental(SOURCE)
+    # El job se corta antes de guardar el high-water mark: la corrida siguiente vuelve a procesar todo
+    client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_ROLLUP_STATE].delete_many({})
+    rollups.run_incremental(SOURCE)
+    assert _counts(client) == {('2025-01', 'created'): 1, ('2025-01', 'canceled'): 1}
+
+
+def test_late_event_recounts_its_month(client):
+    _event(client, '2025-01-10T10:00:00.000Z')
+    _event(client, '2025-02-10T10:00:00.000Z')
+    rollups.run_incremental(SOURCE)
+    _event(client, '2025-01-25T10:00:00.000Z')
+    rollups.run_incremental(SOURCE)
+    assert _counts(client) == {('2025-01', 'created'): 2, ('2025-02', 'created'): 1}
+    state = client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_ROLLUP_STATE].find_one({'_id': SOURCE})
+    assert state['last_month'] == '2025-02'
+
+
+def test_backfill_replaces_months_and_keeps_the_rest(client):
+    _event(client, '2025-01-10T10:00:00.000Z')
+    _event(client, '2025-02-10T10:00:00.000Z')
+    rollups.run_incremental(SOURCE)
+    other = {'_id': {'source': 'other', 'month': '2025-02'}, 'count': 7}
+    client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_MONTHLY_ROLLUPS].insert_one(other)
+    client[MONGO_DB_USERS][MONGO_COLLECTION_STRIPE_UPDATES].update_many(
+        {'timestamp': {'$gte': '2025-02'}}, {'$set': {'description': 'subscription_cancelled'}})
+
+    rollups.run_backfill(SOURCE, '2025-02-01')
+    assert _counts(client) == {('2025-01', 'created'): 1, ('2025-02', 'canceled'): 1}
+    assert client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_MONTHLY_ROLLUPS].find_one({'_id.source': 'other'})['count'] == 7
+
+
+def test_monthly_series_from_rollups_match_raw_events(client, monkeypatch):
+    for timestamp in ['2025-01-10T10:00:00.000Z', '2025-02-10T10:00:00.000Z', '2025-03-05T10:00:00.000Z']:
+        _event(client, timestamp)
+    rollups.run_incremental(SOURCE)
+    # Un evento tardío que llegó después de la corrida del job
+    _event(client, '2025-01-28T10:00:00.000Z')
+
+    metrics = subs_metrics.SubscriptionMetrics()
+    raw = metrics.get_stripe_monthly_rollup('2025-01-01', '2025-03-31')
+    metrics_cache.invalidate()
+    monkeypatch.setattr(subs_metrics, 'USE_MONTHLY_ROLLUPS', True)
+    from_rollups = metrics.get_stripe_monthly_rollup('2025-01-01', '2025-03-31')
+    assert from_rollups['created']['count'].tolist() == raw['created']['count'].tolist() == [2, 1, 1]
+
+
+def test_month_stripe_income_from_rollups_matches_raw_payments(client, monkeypatch):
+    no_rates = pd.DataFrame({'month': pd.Series(dtype='datetime64[ns]'), 'currency': pd.Series(dtype=object),
+                             'rate': pd.Series(dtype='float64')})
+    monkeypatch.setattr(subs_metrics.fx_rates, 'monthly_rates', lambda months: no_rates)
+    payments = client[subs_metrics.MONGO_DB_TME_CHARTS][subs_metrics.MONGO_COLLECTION_STRIPE_PAYMENTS]
+    payments.insert_many([
+        {'created': '2025-01-10T10:00:00.000Z', 'status': 'succeeded', 'currency': 'usd', 'amount': 10},
+        {'created': '2025-01-11T10:00:00.000Z', 'status': 'failed', 'currency': 'usd', 'amount': 99},
+        {'created': '2025-02-10T10:00:00.000Z', 'status': 'succeeded', 'currency': 'usd', 'amount': 5},
+    ])
+    rollups.run_incremental(subs_metrics.MONGO_COLLECTION_STRIPE_PAYMENTS)
+    payments.insert_one({'created': '2025-01-20T10:00:00.000Z', 'status': 'succeeded', 'currency': 'usd', 'amount': 3})
+
+    metrics = subs_metrics.SubscriptionMetrics()
+    raw = metrics.get_month_stripe_income('2025-01')
+    metrics_cache.invalidate()
+    monkeypatch.setattr(subs_metrics, 'USE_MONTHLY_ROLLUPS', True)
+    assert metrics._read_month_rollup(subs_metrics.MONGO_COLLECTION_STRIPE_PAYMENTS, '2025-01', 'succeeded') is not None
+    assert metrics.get_month_stripe_income('2025-01') == raw == 13
+
+
+def test_payment_that_succeeds_after_the_mark_is_recounted(client, monkeypatch):
+    monkeypatch.setattr(rollups, '_current_month', lambda: '2025-02')
+    source = subs_metrics.MONGO_COLLECTION_STRIPE_PAYMENTS
+    payments = client[subs_metrics.MONGO_DB_TME_CHARTS][source]
+    payments.insert_one({'_id': 1, 'created': '2025-01-31T10:00:00.000Z', 'status': 'processing',
+                         'currency': 'usd', 'amount': 10})
+    rollups.run_incremental(source)
+    # El payment intent pasa a succeeded en el lugar: no hay _id nuevo
+    payments.update_one({'_id': 1}, {'$set': {'status': 'succeeded'}})
+    rollups.run_incremental(source)
+
+    docs = client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_MONTHLY_ROLLUPS].find({'_id.source': source})
+    assert {(doc['_id']['month'], doc['_id']['status']): doc['amount'] for doc in docs} == {('2025-01', 'succeeded'): 10}
+    # Enero todavía puede cambiar: el dashboard no lo lee de los rollups
+    state = client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_ROLLUP_STATE].find_one({'_id': source})
+    assert state['complete_before'] == '2025-01'
+    monkeypatch.setattr(subs_metrics, 'USE_MONTHLY_ROLLUPS', True)
+    assert subs_metrics.SubscriptionMetrics()._read_month_rollup(source, '2025-01', 'succeeded') is None
+
+
+def test_month_mp_income_from_rollups_matches_raw_payments(client, monkeypatch):
+    monkeypatch.setattr(rollups, '_current_month', lambda: '2025-06')
+    source = subs_metrics.MONGO_COLLECTION_MP_PAYMENTS
+    payments = client[subs_metrics.MONGO_DB_TME_CHARTS][source]
+    payments.insert_many([
+        {'date_approved': '2025-01-10T10:00:00.000-04:00', 'status': 'approved', 'transaction_amount': 100},
+        {'date_approved': None, 'status': 'pending', 'transaction_amount': 40},
+        {'date_approved': '2025-01-12T10:00:00.000-04:00', 'status': 'refunded', 'transaction_amount': 30},
+        {'date_approved': '2025-02-10T10:00:00.000-04:00', 'status': 'approved', 'transaction_amount': 50},
+    ])
+    rollups.run_incremental(source)
+    payments.insert_one({'date_approved': '2025-01-20T10:00:00.000-04:00', 'status': 'approved', 'transaction_amount': 7})
+
+    metrics = subs_metrics.SubscriptionMetrics()
+    raw = metrics.get_month_mp_income('2025-01')
+    metrics_cache.invalidate()
+    monkeypatch.setattr(subs_metrics, 'USE_MONTHLY_ROLLUPS', True)
+    assert metrics._read_month_rollup(source, '2025-01', 'approved') is not None
+    assert metrics.get_month_mp_income('2025-01') == raw == 107
+
+
+def _tgo_counts(client):
+    docs = client[MONGO_DB_ANALYTICS][MONGO_COLLECTION_MONTHLY_ROLLUPS].find(
+        {'_id.source': subs_metrics.MONGO_COLLECTION_TGO_SUBS})
+    return {(doc['_id']['month'], doc['_id']['status'], doc['_id']['plan']): doc['count'] for doc in docs}
+
+
+def test_tgo_rollup_counts_creations_and_endings_and_follows_cancellations(client, monkeypatch):
+    monkeypatch.setattr(rollups, '_current_month', lambda: '2025-06')
+    source = subs_metrics.MONGO_COLLECTION_TGO_SUBS
+    subs = client[subs_metrics.MONGO_DB_TME_CHARTS][source]
+    subs.insert_many([
+        {'_id': 1, 'created': '2025-01-05T10:00:00Z', 'status': 'canceled', 'ended_at': '2025-03-01T10:00:00Z',
+         'plan': {'nickname': 'Basic'}},
+        {'_id': 2, 'created': '2025-02-05T10:00:00Z', 'status': 'incomplete_expired',
+         'ended_at': '2025-02-06T10:00:00Z', 'plan': {'nickname': 'Plus'}},
+        {'_id': 3, 'created': '2025-06-02T10:00:00Z', 'status': 'active', 'plan': {'nickname': 'Plus'}},
+    ])
+    rollups.run_incremental(source)
+    expected = {
+        ('2025-01', 'created', 'Basic'): 1,
+        ('2025-02', 'created', 'Plus'): 1,
+        ('2025-02', 'incomplete_expired', 'Plus'): 1,
+        ('2025-03', 'canceled', 'Basic'): 1,
+        ('2025-06', 'created', 'Plus'): 1,
+    }
+    assert _tgo_counts(client) == expected
+
+    # Una cancelación en el lugar dentro de la ventana aparece en la corrida siguiente sin un _id nuevo
+    subs.update_one({'_id': 3}, {'$set': {'status': 'canceled', 'ended_at': '2025-06-20T10:00:00Z'}})
+    rollups.run_incremental(source)
+    assert _tgo_counts(client) == {**expected, ('2025-06', 'canceled', 'Plus'): 1}
+
+    # Los meses que ya salieron de la ventana se leen de los rollups
+    monkeypatch.setattr(subs_metrics, 'USE_MONTHLY_ROLLUPS', True)
+    pivot = subs_metrics.SubscriptionMetrics().get_tgo_pivot('2025-01-01')
+    from_rollups = pivot[pivot['month'] < '2025-05']
+    assert {(row.month, row.kind, row.plan): row.count for row in from_rollups.itertuples()} == {
+        key: count for key, count in expected.items() if key[0] < '2025-05'}
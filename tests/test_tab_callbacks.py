@@ -0,0 +1,54 @@
+"""Pestañas del dashboard sin datos cargados (o con consultas que fallaron): dibujan gráficos vacíos."""
+import mongomock
+import pandas as pd
+import plotly.graph_objs as go
+import pytest
+import subs_metrics
+from callbacks import tab_callbacks
+
+
+class _CallbackRecorder:
+    """Reemplaza a la app de Dash: guarda las funciones de los callbacks por nombre."""
+    def __init__(self):
+        self.callbacks = {}
+
+    def callback(self, *args, **kwargs):
+        def register(function):
+            self.callbacks[function.__name__] = function
+            return function
+        return register
+
+
+@pytest.fixture
+def callbacks(use_client, monkeypatch):
+    use_client(mongomock.MongoClient(), subs_metrics)
+    monkeypatch.setattr(subs_metrics.ars_rates, 'monthly_rates',
+                        lambda months: pd.Series(1000.0, index=months.index))
+    recorder = _CallbackRecorder()
+    tab_callbacks.register_tab_callbacks(recorder)
+    return recorder.callbacks
+
+
+def test_empty_datasets_keep_their_columns():
+    for name in tab_callbacks.MONGO_DATASETS:
+        df = tab_callbacks._empty_dataset(name)
+        assert df.empty and list(df.columns) == list(tab_callbacks.DATASET_SCHEMAS[name])
+
+
+@pytest.mark.parametrize('callback, args', [
+    ('render_overview_tab', ('tab-overview', None, None)),
+    ('render_stripe_tab', ('tab-stripe', None)),
+    ('render_mp_tab', ('tab-mp', None, None)),
+    # Ids que no son str (un dcc.Store de una versión anterior) cuentan como datasets que no existen
+    ('render_overview_tab', ('tab-overview', {'subs_data': []}, ['a'])),
+    ('render_stripe_tab', ('tab-stripe', 42)),
+    ('render_mp_tab', ('tab-mp', ['a'], {'mp': []})),
+])
+def test_tabs_render_without_datasets(callbacks, callback, args):
+    assert callbacks[callback](*args) is not None
+
+
+@pytest.mark.parametrize('dataset_id', [None, 'vencido', {'records': []}])
+def test_revenue_recovery_charts_without_dataset(callbacks, dataset_id):
+    figures = callbacks['render_revenue_recovery_content'](dataset_id)
+    assert len(figures) == 3 and all(isinstance(figure, go.Figure) for figure in figures)